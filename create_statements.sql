@@ -1,5 +1,5 @@
 CREATE TABLE wort
-            (id INTEGER PRIMARY KEY, name TEXT, ganzes_wort TEXT, artikel TEXT, wortart TEXT, haeufigkeit INTEGER, worttrennung TEXT, alternative_worttrennung TEXT, herkunft TEXT, verwandte_form TEXT, alternative_schreibweise TEXT, zeichen TEXT, kurzform TEXT, kurzform_fuer TEXT, fun_fact TEXT, url TEXT
+            (id INTEGER PRIMARY KEY, name TEXT, ganzes_wort TEXT, artikel TEXT, wortart TEXT, haeufigkeit INTEGER, worttrennung TEXT, alternative_worttrennung TEXT, herkunft TEXT, verwandte_form TEXT, alternative_schreibweise TEXT, zeichen TEXT, kurzform TEXT, kurzform_fuer TEXT, fun_fact TEXT, url TEXT, etag TEXT, last_modified TEXT, content_hash TEXT, geprueft_am TEXT
             
              );
 
@@ -47,3 +47,40 @@ CREATE TABLE antonyme
             (id INTEGER PRIMARY KEY, antonyme TEXT, wort_id INTEGER
             ,FOREIGN KEY (wort_id) REFERENCES wort(id)
             ON DELETE CASCADE );
+
+CREATE TABLE wort_verbindungen
+            (id INTEGER PRIMARY KEY, relation TEXT, wort_id INTEGER, ziel_id INTEGER
+            ,FOREIGN KEY (wort_id) REFERENCES wort(id) ON DELETE CASCADE
+            ,FOREIGN KEY (ziel_id) REFERENCES wort(id) ON DELETE CASCADE );
+
+CREATE UNIQUE INDEX idx_wort_url ON wort (url);
+
+CREATE INDEX idx_wort_name ON wort (name);
+
+CREATE INDEX idx_synonyme_wort_id ON synonyme (wort_id);
+
+CREATE INDEX idx_antonyme_wort_id ON antonyme (wort_id);
+
+CREATE INDEX idx_bedeutungen_wort_id ON bedeutungen (wort_id);
+
+CREATE INDEX idx_beispiele_bedeutungen_id ON beispiele (bedeutungen_id);
+
+CREATE INDEX idx_wendungen_redensarten_sprichwoerter_bedeutungen_id ON wendungen_redensarten_sprichwoerter (bedeutungen_id);
+
+CREATE INDEX idx_gebrauch_bedeutungen_id ON gebrauch (bedeutungen_id);
+
+CREATE INDEX idx_synonyme_links_wort_id ON synonyme_links (wort_id);
+
+CREATE INDEX idx_antonyme_links_wort_id ON antonyme_links (wort_id);
+
+CREATE INDEX idx_typische_verbindungen_links_wort_id ON typische_verbindungen_links (wort_id);
+
+CREATE INDEX idx_wort_verbindungen_relation_wort_id ON wort_verbindungen (relation, wort_id);
+
+CREATE INDEX idx_wort_verbindungen_ziel_id ON wort_verbindungen (ziel_id);
+
+CREATE VIEW wort_text AS SELECT t.id, t.name, t.ganzes_wort, t.artikel, t.wortart, t.haeufigkeit, t.worttrennung, t.alternative_worttrennung, t.herkunft, t.verwandte_form, t.alternative_schreibweise, t.zeichen, t.kurzform, t.kurzform_fuer, t.fun_fact, t.url, t.etag, t.last_modified, t.content_hash FROM wort t ;
+
+CREATE VIEW bedeutungen_text AS SELECT t.id, t.bedeutung, t.grammatik, t.wort_id FROM bedeutungen t ;
+
+CREATE VIEW gebrauch_text AS SELECT t.id, t.gebrauch, t.bedeutungen_id FROM gebrauch t ;
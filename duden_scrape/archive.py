@@ -0,0 +1,182 @@
+import os
+import gzip
+import json
+import struct
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from collections import namedtuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ArchivedPage = namedtuple("ArchivedPage", ["url", "status", "headers", "fetched_at", "text"])
+
+# record layout in a segment file: meta length, body length, meta (json), compressed body
+RECORD_HEADER = struct.Struct(">IQ")
+
+
+def _compress(data, compression):
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+def _decompress(data, compression):
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageArchive():
+    """Append-only archive of raw Duden responses keyed by url.
+
+    Pages are appended compressed to segment files (segment-00000.dat, ...)
+    and located through a small sqlite index (index.sqlite) in the same directory.
+    Storing a url again appends a new record; the index points to the newest one.
+    An archive can be shared by threads, its methods run one at a time.
+    """
+    def __init__(self, directory, compression=None, segment_size=256 * 1024 * 1024):
+        """
+        compression: "zstd" (needs the zstandard package) or "gzip",
+                     defaults to zstd if available
+        segment_size: size in bytes after which a new segment file is started
+        """
+        if compression is None:
+            compression = "zstd" if zstandard else "gzip"
+        if compression == "zstd" and not zstandard:
+            raise ImportError("zstd compression requires the zstandard package")
+        self.directory = directory
+        self.compression = compression
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self.index = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        with self.index:
+            self.index.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages
+                (url TEXT PRIMARY KEY, segment INTEGER, offset INTEGER, length INTEGER,
+                status INTEGER, fetched_at TEXT);
+                """
+            )
+        self._segment = self._last_segment()
+
+    def __del__(self):
+        self.index.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.index.execute("SELECT count(*) FROM pages").fetchone()[0]
+
+    def __contains__(self, url):
+        with self._lock:
+            return self.index.execute("SELECT 1 FROM pages WHERE url = ?", (url,)).fetchone() is not None
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:05d}.dat")
+
+    def _segments(self):
+        return sorted(int(filename[8:13]) for filename in os.listdir(self.directory)
+                      if filename.startswith("segment-") and filename.endswith(".dat"))
+
+    def _last_segment(self):
+        segments = self._segments()
+        return segments[-1] if segments else 0
+
+    def put(self, url, text, status, headers=None, fetched_at=None):
+        """Append a response to the archive
+        """
+        fetched_at = fetched_at or datetime.now().isoformat(timespec="seconds")
+        meta = json.dumps({"url": url, "status": status, "headers": dict(headers or {}),
+                           "fetched_at": fetched_at, "compression": self.compression}).encode("utf-8")
+        body = _compress(text.encode("utf-8"), self.compression)
+        record = RECORD_HEADER.pack(len(meta), len(body)) + meta + body
+
+        with self._lock:
+            path = self._segment_path(self._segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(record) > self.segment_size:
+                self._segment += 1
+                path = self._segment_path(self._segment)
+            with open(path, "ab") as segment_file:
+                offset = segment_file.tell()
+                segment_file.write(record)
+
+            with self.index:
+                self.index.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                                   (url, self._segment, offset, len(record), status, fetched_at))
+
+    def _read_record(self, segment_file, offset):
+        """Raises an Exception if the record is cut off or its meta data is damaged
+        """
+        segment_file.seek(offset)
+        header = segment_file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            raise Exception(f"record at {offset} is cut off")
+        meta_length, body_length = RECORD_HEADER.unpack(header)
+        meta = segment_file.read(meta_length)
+        body = segment_file.read(body_length)
+        if len(meta) < meta_length or len(body) < body_length:
+            raise Exception(f"record at {offset} is cut off")
+        return json.loads(meta), body
+
+    def get(self, url):
+        """Return the newest ArchivedPage for url or None,
+        also None if its record is damaged
+        """
+        with self._lock:
+            location = self.index.execute(
+                "SELECT segment, offset FROM pages WHERE url = ?", (url,)).fetchone()
+        if location is None:
+            return None
+        segment, offset = location
+        try:
+            with open(self._segment_path(segment), "rb") as segment_file:
+                meta, body = self._read_record(segment_file, offset)
+            text = _decompress(body, meta["compression"]).decode("utf-8")
+        except Exception as e:
+            logger.error(f"Archived page of {url} in segment {segment} is damaged: {e!r}")
+            return None
+        return ArchivedPage(meta["url"], meta["status"], meta["headers"], meta["fetched_at"], text)
+
+    def urls(self, status=200):
+        """All archived urls with the given response status, in segment order
+        """
+        with self._lock:
+            return [url for url, in self.index.execute(
+                "SELECT url FROM pages WHERE status = ? ORDER BY segment, offset", (status,))]
+
+    def rebuild_index(self):
+        """Recreate the index by scanning all segment files.
+        A segment is read up to its first damaged record. The last segment
+        is cut off there (usually a record of a crash during put), so new
+        records are appended behind the good ones.
+        """
+        segments = self._segments()
+        with self._lock, self.index:
+            self.index.execute("DELETE FROM pages")
+            for segment in segments:
+                path = self._segment_path(segment)
+                size = os.path.getsize(path)
+                with open(path, "rb") as segment_file:
+                    offset = 0
+                    while offset < size:
+                        try:
+                            meta, body = self._read_record(segment_file, offset)
+                            url, status, fetched_at = meta["url"], meta["status"], meta["fetched_at"]
+                        except Exception as e:
+                            logger.warning(f"Segment {segment} is damaged, skipped its last {size - offset} "
+                                           f"bytes: {e!r}")
+                            break
+                        length = segment_file.tell() - offset
+                        self.index.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                                           (url, segment, offset, length, status, fetched_at))
+                        offset += length
+                if offset < size and segment == segments[-1]:
+                    os.truncate(path, offset)
+        logger.info(f"Rebuilt archive index with {len(self)} pages")
@@ -0,0 +1,143 @@
+import random
+import asyncio
+import logging
+import weakref
+import threading
+from time import monotonic, perf_counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from duden_scrape.utils import HEADERS, fetch, make_session, parse_word
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket():
+    """Rate limiter shared by all fetch tasks.
+
+    Tokens are added with rate per second up to capacity; every request takes one.
+    On top of that every request start waits abs(normal(0, wait_variance)) seconds,
+    the same jitter main.py sleeps between words.
+
+    A request takes its token before it waits, the tokens go below zero then and
+    the next request waits behind it. Nothing is awaited between reading and
+    taking the tokens, so no lock is needed, the jitter of one request doesn't
+    hold up the others and the bucket isn't bound to an event loop.
+    """
+    def __init__(self, rate, capacity=1, wait_variance=0):
+        self.rate = rate
+        self.capacity = capacity
+        self.wait_variance = wait_variance
+        self._tokens = capacity
+        self._updated = monotonic()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        self._refill()
+        self._tokens -= 1
+        seconds = -self._tokens / self.rate if self._tokens < 0 else 0
+        if self.wait_variance:
+            seconds += abs(np.random.normal(0, self.wait_variance))
+        if seconds:
+            await asyncio.sleep(seconds)
+
+
+class AsyncFetcher():
+    """Fetch several Duden pages at once.
+
+    The requests run on a thread pool with one session per thread, so they keep
+    the Retry (429/5xx with backoff) and TimeoutHTTPAdapter settings of utils.http.
+    At most concurrency requests are in flight and all of them share one TokenBucket.
+    With a RateController the bucket follows the rate of the controller.
+    """
+    def __init__(self, concurrency=4, rate=0.5, wait_variance=0, base_url="https://www.duden.de",
+                 archive=None, rate_controller=None):
+        self.base_url = base_url
+        self.archive = archive
+        self.concurrency = concurrency
+        self.rate = rate
+        self.wait_variance = wait_variance
+        self.rate_controller = rate_controller
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._sessions = threading.local()
+        # {event loop: semaphore}, a semaphore can only be used in one loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        # one token: the requests start one after another at the rate, never as a burst
+        self.limiter = TokenBucket(rate_controller.rate if rate_controller else rate, capacity=1,
+                                   wait_variance=wait_variance)
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    def _record(self, **outcome):
+        if self.rate_controller is not None:
+            self.rate_controller.record(**outcome)
+            self.limiter.rate = self.rate_controller.rate
+
+    def _get(self, url, headers):
+        if not hasattr(self._sessions, "session"):
+            self._sessions.session = make_session()
+        return fetch(url, headers, self._sessions.session)
+
+    async def load_word(self, word_url, headers=None):
+        """async equivalent of utils.load_word
+        """
+        url = self.base_url + word_url
+        async with self._semaphore():
+            await self.limiter.acquire()
+            loop = asyncio.get_running_loop()
+            started = perf_counter()
+            try:
+                source = await loop.run_in_executor(self._executor, self._get, url,
+                                                    headers or random.choice(HEADERS))
+            except requests.exceptions.RetryError:
+                self._record(status=429)
+                raise
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                self._record(timeout=True)
+                raise
+            self._record(latency=perf_counter() - started, status=source.status_code)
+        loop = asyncio.get_running_loop()
+        if self.archive is not None:
+            # compressing and writing the index would stall the other requests
+            await loop.run_in_executor(self._executor, self.archive.put, url, source.text, source.status_code,
+                                       source.headers)
+        if source.status_code != 200:
+            raise Exception(f"Unexpected response code: {source.status_code}")
+        # parse off the event loop so other requests keep going
+        return await loop.run_in_executor(
+            self._executor, parse_word, source.text, url, source.headers)
+
+    async def load_words(self, word_urls):
+        """Load all word_urls concurrently.
+
+        Returns:
+            list -- (word_url, Word or the raised exception) in the order of word_urls
+        """
+        words = await asyncio.gather(*(self.load_word(word_url) for word_url in word_urls),
+                                     return_exceptions=True)
+        for word_url, word in zip(word_urls, words):
+            if isinstance(word, Exception):
+                logger.error(f"Loading {word_url} failed: {word}")
+        return list(zip(word_urls, words))
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def load_words(word_urls, concurrency=4, rate=0.5, wait_variance=0, base_url="https://www.duden.de",
+               archive=None, rate_controller=None):
+    """Blocking helper: load word_urls with an AsyncFetcher
+    """
+    fetcher = AsyncFetcher(concurrency, rate, wait_variance, base_url, archive, rate_controller)
+    try:
+        return asyncio.run(fetcher.load_words(word_urls))
+    finally:
+        fetcher.close()
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import timeit
+import argparse
+import platform
+import tempfile
+from time import perf_counter
+from statistics import median
+from duden_scrape.database import DatabaseManager
+from duden_scrape.fixtures import SAVED_DIRECTORY, fixture_pages
+from duden_scrape.models import Word
+from duden_scrape.utils import PARSER, add_full_word_db, create_tables, find_next_word, make_soup, parse_word
+
+BASE_URL = "https://www.duden.de"
+PROPERTIES = ["name", "full_word", "article", "part_of_speech", "frequency", "hyphenation", "alt_hyphenation",
+              "origin", "related_form", "alternative_spelling", "sign", "short_form", "short_form_of", "meaning",
+              "synonyms", "antonyms", "synonym_links", "antonym_links", "typical_connections",
+              "typical_connections_links", "fun_fact"]
+PARSERS = ["sections", "lxml"]
+
+
+def _seconds(function, repeat, number):
+    """Median seconds of one call"""
+    return median(timeit.repeat(function, repeat=repeat, number=number)) / number
+
+def benchmark_parse(pages, repeat=5, number=20):
+    """Seconds to build the soup of every page with each parser
+    """
+    return {url: {parser: _seconds(lambda: make_soup(text, parser), repeat, number) for parser in PARSERS}
+            for url, text in pages.items()}
+
+def benchmark_properties(pages, repeat=5, number=50):
+    """Seconds per Word property, averaged over the pages.
+    Every call gets a new Word, so no value is served from the tuple cache of a previous call.
+    """
+    soups = {url: make_soup(text) for url, text in pages.items()}
+    results = {}
+    for name in PROPERTIES + ["get_next_word"]:
+        seconds = []
+        for url, soup in soups.items():
+            if name == "get_next_word":
+                function = lambda: Word(soup, BASE_URL + url).get_next_word()
+            else:
+                function = lambda: getattr(Word(soup, BASE_URL + url), name)
+            seconds.append(_seconds(function, repeat, number))
+        results[name] = sum(seconds) / len(seconds)
+    return results
+
+def benchmark_database(pages, words=300):
+    """Seconds per add_full_word_db call on a new database (extraction included)
+    """
+    soups = [(url, make_soup(text)) for url, text in pages.items()]
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "Duden"))
+        create_tables(db)
+        start = perf_counter()
+        for i in range(words):
+            path, soup = soups[i % len(soups)]
+            url = f"{BASE_URL}{path}_{i}"
+            add_full_word_db(Word(soup, url), url, db)
+        seconds = perf_counter() - start
+        db.connection.close()
+    return {"words": words, "seconds_per_word": seconds / words}
+
+def benchmark_crawl(pages, words=300):
+    """Pages per second of the crawl loop without the network:
+    parse, find the next url and write every page.
+    """
+    pages = list(pages.items())
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "Duden"))
+        create_tables(db)
+        start = perf_counter()
+        for i in range(words):
+            path, text = pages[i % len(pages)]
+            url = f"{BASE_URL}{path}_{i}"
+            word = parse_word(text, url)
+            find_next_word(text, url)
+            add_full_word_db(word, url, db)
+        seconds = perf_counter() - start
+        db.connection.close()
+    return {"pages": words, "seconds": seconds, "pages_per_second": words / seconds}
+
+def run_benchmarks(directory=SAVED_DIRECTORY, repeat=5, words=300):
+    """Run all benchmarks on the saved pages in directory.
+    meta lists the size in bytes of every page.
+
+    Returns:
+        dict -- results in seconds (pages_per_second for the crawl), ready for json.dump
+    """
+    pages = fixture_pages(directory)
+    if not pages:
+        raise Exception(f"No saved pages in {directory}, download them with python -m duden_scrape.fixtures")
+    return {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "parser": PARSER,
+                 "pages": {url: len(text.encode("utf-8")) for url, text in pages.items()},
+                 "fixtures": directory,
+                 "repeat": repeat},
+        "parse": benchmark_parse(pages, repeat),
+        "properties": benchmark_properties(pages, repeat),
+        "add_full_word_db": benchmark_database(pages, words),
+        "crawl": benchmark_crawl(pages, words),
+    }
+
+def _flatten(results, prefix=""):
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, float):
+            values[prefix + key] = value
+    return values
+
+def compare(results, baseline, tolerance=0.25):
+    """Metrics that are more than tolerance (relative) worse than in baseline.
+
+    Returns:
+        list -- (metric, baseline value, current value)
+    """
+    current = _flatten(results)
+    regressions = []
+    for metric, old in _flatten({key: value for key, value in baseline.items() if key != "meta"}).items():
+        new = current.get(metric)
+        if new is None or not old:
+            continue
+        # everything is measured in seconds except the throughput
+        worse = new < old * (1 - tolerance) if metric.endswith("per_second") else new > old * (1 + tolerance)
+        if worse:
+            regressions.append((metric, old, new))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the parser and the database writes on saved pages")
+    parser.add_argument("--fixtures", default=SAVED_DIRECTORY,
+                        help="directory of the saved pages (duden_scrape/fixtures for the hand-made ones)")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown that counts as regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--words", type=int, default=300, help="words written in the database benchmarks")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.fixtures, args.repeat, args.words)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for metric, old, new in regressions:
+            print(f"{metric}: {old:.6g} -> {new:.6g}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -1,25 +1,100 @@
 import sqlite3
 import logging
+from time import perf_counter
+from functools import lru_cache
+from contextlib import contextmanager
+from duden_scrape.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# pragmas set once per connection
+PROFILES = {
+    # the rollback journal of the original setup with a larger cache
+    "default": {"foreign_keys": "ON", "cache_size": -64000, "mmap_size": 268435456, "temp_store": "MEMORY",
+                "busy_timeout": 10000},
+    # WAL lets readers query the database while the crawler writes; the journal mode
+    # stays with the database file, so only the crawlers switch to it
+    "crawl": {"foreign_keys": "ON", "journal_mode": "WAL", "synchronous": "NORMAL",
+              "cache_size": -64000, "mmap_size": 268435456, "temp_store": "MEMORY",
+              "busy_timeout": 10000},
+    # rebuilding a database that can be recreated from the archive
+    "bulk": {"foreign_keys": "ON", "journal_mode": "WAL", "synchronous": "OFF",
+             "cache_size": -256000, "mmap_size": 1073741824, "temp_store": "MEMORY"},
+    # rollback journal like the original setup
+    "compatible": {"foreign_keys": "ON"},
+}
 
-class DatabaseManager():
-    def __init__(self, database_filename):
-        self.connection = sqlite3.connect(database_filename)
-        
 
+# lookup tables of dictionary encoded columns: {name}_werte (id, wert UNIQUE);
+# a column {column}_id referencing one takes the value given as {column}
+LOOKUP_SUFFIX = "_werte"
+
+
+@lru_cache(maxsize=256)
+def insert_statement(table_name, columns):
+    return f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))});"
+
+@lru_cache(maxsize=256)
+def select_statement(column_name, table_name, criteria_columns, order_by, limit):
+    query = f'SELECT {column_name} FROM {table_name}'
+    if criteria_columns:
+        query += ' WHERE ' + ' AND '.join(f'{column} = ?' for column in criteria_columns)
+    if order_by:
+        query += f' ORDER BY {order_by}'
+    if limit:
+        query += f" LIMIT {limit}"
+    return query
+
+@lru_cache(maxsize=256)
+def update_statement(table_name, columns, criteria_columns):
+    return (f"UPDATE {table_name} SET {', '.join(f'{column} = ?' for column in columns)} "
+            f"WHERE {' AND '.join(f'{column} = ?' for column in criteria_columns)};")
+
+@lru_cache(maxsize=256)
+def delete_statement(table_name, criteria_columns):
+    return f"DELETE FROM {table_name} WHERE {' AND '.join(f'{column} = ?' for column in criteria_columns)};"
+
+
+class DatabaseManager():
+    def __init__(self, database_filename, profile="default"):
+        """
+        profile: name of one of the PROFILES or a dict with {pragma: value}
+        """
+        self.connection = sqlite3.connect(database_filename, cached_statements=256)
+        pragmas = PROFILES[profile] if isinstance(profile, str) else profile
+        for pragma, value in pragmas.items():
+            self.connection.execute(f"PRAGMA {pragma} = {value}")
+        self.dictionary = Dictionary()
+        # number of open batch() contexts on this connection
+        self._batches = 0
 
     def __del__(self):
-        self.connection.close()
+        # __init__ may have failed before the connection was opened
+        connection = getattr(self, "connection", None)
+        if connection is not None:
+            connection.close()
 
     def _execute(self, statement, values=None):
-        with self.connection:
-            self.connection.execute("PRAGMA foreign_keys = ON")
-            cursor = self.connection.cursor()
-            logger.debug(f"data: {statement}", exc_info=True)
+        """Run one statement in its own transaction, or as part of the
+        open batch if there is one (it is committed with the batch then)
+        """
+        cursor = self.connection.cursor()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"data: {statement}")
+        if self._batches:
+            return cursor.execute(statement, values or [])
+        try:
             cursor.execute(statement, values or [])
-            return cursor
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+        return cursor
+
+    def execute(self, statement, values=None):
+        """Run a statement that the helpers below don't cover
+        """
+        return self._execute(statement, values)
 
     def create_table(self, table_name, columns, references={}, cascade_delete=False):
         """
@@ -30,23 +105,57 @@ class DatabaseManager():
             f"{column_name} {data_type}"
             for column_name, data_type in columns.items()
         ]
-        foreign_keys = [
-            f",FOREIGN KEY ({foreign_key}) REFERENCES {reference}"
-            for foreign_key, reference in references.items()
-        ]
         if cascade_delete:
             cascade_delete = "ON DELETE CASCADE"
         else:
             cascade_delete = ""
+        foreign_keys = [
+            f",FOREIGN KEY ({foreign_key}) REFERENCES {reference} {cascade_delete}"
+            for foreign_key, reference in references.items()
+        ]
         self._execute(
             f"""
             CREATE TABLE IF NOT EXISTS {table_name}
             ({", ".join(columns_with_types)}
-            {" ".join(foreign_keys)}
-            {cascade_delete} );
+            {" ".join(foreign_keys)} );
             """
         )
     
+    def create_index(self, table_name, columns, unique=False, where=None):
+        """
+        columns: list of column names the index is built on
+        where: condition of a partial index, e.g. "column IS NOT NULL"
+        """
+        index_name = f"idx_{table_name}_{'_'.join(columns)}"
+        unique = "UNIQUE" if unique else ""
+        where = f"WHERE {where}" if where else ""
+        self._execute(
+            f"""
+            CREATE {unique} INDEX IF NOT EXISTS {index_name}
+            ON {table_name} ({", ".join(columns)}) {where};
+            """
+        )
+
+    def add_columns(self, table_name, columns):
+        """Add the columns that don't exist yet to an existing table
+        columns: dict with {column_name: data_type}
+        """
+        existing = [row[1] for row in self._execute(f"PRAGMA table_info({table_name});")]
+        for column_name, data_type in columns.items():
+            if column_name not in existing:
+                self._execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {data_type};")
+
+    def delete_duplicates(self, table_name, column_name):
+        """Delete all but the newest row (highest id) for every value of column_name
+        """
+        self._execute(
+            f"""
+            DELETE FROM {table_name}
+            WHERE {column_name} IS NOT NULL AND id NOT IN
+            (SELECT max(id) FROM {table_name} GROUP BY {column_name});
+            """
+        )
+
     def drop_table(self, table_name):
         try:
             self._execute(f"DROP TABLE {table_name};")
@@ -54,50 +163,53 @@ class DatabaseManager():
         except sqlite3.OperationalError:
             print(f"Table {table_name} does not exist and could not be dropped")
 
+    @contextmanager
+    def batch(self):
+        """Unit of work: all writes made through the yielded Batch are
+        committed in a single transaction or rolled back together.
+        A batch opened within another one, and statements run through
+        execute/select/add/delete meanwhile, are part of the outer batch.
+        """
+        cursor = self.connection.cursor()
+        self._batches += 1
+        try:
+            yield Batch(cursor, self.dictionary)
+        except BaseException:
+            if self._batches == 1:
+                self.connection.rollback()
+                # the ids of values interned in this transaction are gone
+                self.dictionary.clear()
+            raise
+        else:
+            if self._batches == 1:
+                started = perf_counter()
+                self.connection.commit()
+                metrics.observe("db_commit_seconds", perf_counter() - started)
+        finally:
+            self._batches -= 1
+            cursor.close()
+
     def add(self, table_name, data):
-        logger.debug(f"data: {data}", exc_info=True)
-        placeholders = ", ".join("?" * len(data))
-        column_names = ", ".join(data.keys())
-        column_values = tuple(data.values())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"data: {data}")
+        with self.batch() as batch:
+            return batch.add(table_name, data)
 
-        self._execute(
-            f"""
-            INSERT INTO {table_name}
-            ({column_names})
-            VALUES ({placeholders});
-            """,
-            column_values
-        )
+    def add_many(self, table_name, rows):
+        with self.batch() as batch:
+            batch.add_many(table_name, rows)
 
     def select(self, column_name, table_name, criteria=None, order_by=None, limit=None):
             criteria = criteria or {}
 
-            query = f'SELECT {column_name} FROM {table_name}'
-
-            if criteria:
-                placeholders = [f'{column} = ?' for column in criteria.keys()]
-                select_criteria = ' AND '.join(placeholders)
-                query += f' WHERE {select_criteria}'
-
-            if order_by:
-                query += f' ORDER BY {order_by}'
-
-            if limit:
-                query += f" LIMIT {limit}"
-
             return self._execute(
-                query,
+                select_statement(column_name, table_name, tuple(criteria), order_by, limit),
                 tuple(criteria.values()),
             )
 
     def delete(self, table_name, criteria):
-        placeholders = [f'{column} = ?' for column in criteria.keys()]
-        delete_criteria = ' AND '.join(placeholders)
         self._execute(
-            f'''
-            DELETE FROM {table_name}
-            WHERE {delete_criteria};
-            ''',
+            delete_statement(table_name, tuple(criteria)),
             tuple(criteria.values()),
         )
 
@@ -106,4 +218,105 @@ class DatabaseManager():
         
     
     def get_max_id(self, table_name):
-        return self.select("id", table_name, criteria={"id": self.select("id", table_name, order_by="id desc", limit="1").fetchone()[0]}).fetchone()[0]
\ No newline at end of file
+        return self.select("id", table_name, criteria={"id": self.select("id", table_name, order_by="id desc", limit="1").fetchone()[0]}).fetchone()[0]
+
+
+class Dictionary():
+    """In-process intern cache of the lookup tables of one connection.
+
+    Which columns of a table are dictionary encoded is read from its foreign
+    keys on the first write; tables without them are passed through.
+    """
+    def __init__(self):
+        self.encoded = {}
+        self.ids = {}
+
+    def clear(self):
+        self.ids = {}
+
+    def reset(self):
+        """Forget the encoded columns too, after the schema changed
+        """
+        self.encoded = {}
+        self.ids = {}
+
+    def encoded_columns(self, cursor, table_name):
+        """[(column, lookup table)] of the dictionary encoded columns of table_name
+        """
+        if table_name not in self.encoded:
+            self.encoded[table_name] = [
+                (row[3][:-3], row[2]) for row in cursor.execute(f"PRAGMA foreign_key_list({table_name});")
+                if row[2].endswith(LOOKUP_SUFFIX) and row[3].endswith("_id")]
+        return self.encoded[table_name]
+
+    def intern(self, cursor, lookup_table, value):
+        """Id of value in lookup_table, inserted if it is new
+        """
+        if value is None:
+            return None
+        ids = self.ids.setdefault(lookup_table, {})
+        value_id = ids.get(value)
+        if value_id is None:
+            cursor.execute(f"INSERT OR IGNORE INTO {lookup_table} (wert) VALUES (?);", (value,))
+            value_id = ids[value] = cursor.execute(f"SELECT id FROM {lookup_table} WHERE wert = ?;",
+                                                   (value,)).fetchone()[0]
+        return value_id
+
+    def encode(self, cursor, table_name, data):
+        """data with the values of encoded columns replaced by their ids
+        """
+        columns = self.encoded_columns(cursor, table_name)
+        if not columns:
+            return data
+        data = dict(data)
+        for column_name, lookup_table in columns:
+            if column_name in data:
+                data[f"{column_name}_id"] = self.intern(cursor, lookup_table, data.pop(column_name))
+        return data
+
+
+class Batch():
+    """Writes of one unit of work, executed on the cursor of an open transaction
+    """
+    def __init__(self, cursor, dictionary=None):
+        self.cursor = cursor
+        self.dictionary = dictionary or Dictionary()
+
+    def execute(self, statement, values=None):
+        return self.cursor.execute(statement, values or [])
+
+    def add(self, table_name, data):
+        """Insert one row and return its id
+        """
+        started = perf_counter()
+        data = self.dictionary.encode(self.cursor, table_name, data)
+        self.cursor.execute(insert_statement(table_name, tuple(data)), tuple(data.values()))
+        metrics.observe("db_write_seconds", perf_counter() - started, table=table_name)
+        return self.cursor.lastrowid
+
+    def add_many(self, table_name, rows):
+        """Insert several rows with the same columns using executemany
+        """
+        if not rows:
+            return
+        started = perf_counter()
+        if self.dictionary.encoded_columns(self.cursor, table_name):
+            rows = [self.dictionary.encode(self.cursor, table_name, row) for row in rows]
+        columns = tuple(rows[0])
+        self.cursor.executemany(insert_statement(table_name, columns),
+                                [tuple(row[column] for column in columns) for row in rows])
+        metrics.observe("db_write_seconds", perf_counter() - started, table=table_name)
+
+    def update(self, table_name, data, criteria):
+        """Set the columns of data in the rows that match criteria
+        """
+        started = perf_counter()
+        data = self.dictionary.encode(self.cursor, table_name, data)
+        self.cursor.execute(update_statement(table_name, tuple(data), tuple(criteria)),
+                            tuple(data.values()) + tuple(criteria.values()))
+        metrics.observe("db_write_seconds", perf_counter() - started, table=table_name)
+
+    def delete(self, table_name, criteria):
+        started = perf_counter()
+        self.cursor.execute(delete_statement(table_name, tuple(criteria)), tuple(criteria.values()))
+        metrics.observe("db_delete_seconds", perf_counter() - started, table=table_name)
@@ -0,0 +1,109 @@
+import os
+import sys
+import logging
+import argparse
+from duden_scrape.database import LOOKUP_SUFFIX, DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# {table: {column: lookup table}} of the low cardinality columns that can be dictionary encoded
+ENCODED_COLUMNS = {"wort": {"artikel": "artikel" + LOOKUP_SUFFIX, "wortart": "wortart" + LOOKUP_SUFFIX},
+                   "bedeutungen": {"grammatik": "grammatik" + LOOKUP_SUFFIX},
+                   "gebrauch": {"gebrauch": "gebrauch" + LOOKUP_SUFFIX}}
+# {table: view} with the plain column names, whichever way the table is stored.
+# Filters on the views use the indexes of the id columns; group by the id column for
+# speed, e.g. SELECT v.wert, count(*) FROM wort JOIN wortart_werte v ON v.id = wortart_id GROUP BY wortart_id
+TEXT_VIEWS = {"wort": "wort_text", "bedeutungen": "bedeutungen_text", "gebrauch": "gebrauch_text"}
+
+
+def _columns(db, table_name):
+    """db: a DatabaseManager or a Batch
+    """
+    return [row[1] for row in db.execute(f"PRAGMA table_info({table_name});")]
+
+def is_normalized(db):
+    """True if the columns of ENCODED_COLUMNS are stored as ids
+    """
+    return all(f"{column_name}_id" in _columns(db, table_name)
+               for table_name, columns in ENCODED_COLUMNS.items() for column_name in columns)
+
+def create_text_views(db):
+    """(Re)create the TEXT_VIEWS: every column of the table, with the encoded
+    columns joined back to their values under the plain column names
+    """
+    for table_name, view_name in TEXT_VIEWS.items():
+        encoded = {f"{column_name}_id": (column_name, lookup_table)
+                   for column_name, lookup_table in ENCODED_COLUMNS[table_name].items()}
+        selected, joins = [], []
+        for column_name in _columns(db, table_name):
+            if column_name in encoded:
+                value_name, lookup_table = encoded[column_name]
+                selected.append(f"{value_name}.wert AS {value_name}")
+                joins.append(f"LEFT JOIN {lookup_table} {value_name} ON {value_name}.id = t.{column_name}")
+            else:
+                selected.append(f"t.{column_name}")
+        db.execute(f"DROP VIEW IF EXISTS {view_name};")
+        db.execute(f"CREATE VIEW {view_name} AS SELECT {', '.join(selected)} FROM {table_name} t {' '.join(joins)};")
+
+def normalize(db):
+    """Convert the ENCODED_COLUMNS of a plain database to lookup tables with
+    integer foreign keys. Safe to run repeatedly; new databases are created
+    plain by create_tables and converted here while they are still empty.
+
+    Values are numbered by frequency, so the common ones get the small ids.
+    After the conversion Batch.add and add_many intern the values of new rows.
+    """
+    for view_name in TEXT_VIEWS.values():
+        db.execute(f"DROP VIEW IF EXISTS {view_name};")
+    with db.batch() as batch:
+        for table_name, columns in ENCODED_COLUMNS.items():
+            existing = _columns(batch, table_name)
+            for column_name, lookup_table in columns.items():
+                batch.execute(f"CREATE TABLE IF NOT EXISTS {lookup_table} "
+                              f"(id INTEGER PRIMARY KEY, wert TEXT NOT NULL UNIQUE);")
+                if f"{column_name}_id" in existing:
+                    continue
+                batch.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {lookup_table} (wert)
+                    SELECT {column_name} FROM {table_name} WHERE {column_name} IS NOT NULL
+                    GROUP BY {column_name} ORDER BY count(*) DESC, {column_name};
+                    """)
+                batch.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name}_id INTEGER "
+                              f"REFERENCES {lookup_table}(id);")
+                batch.execute(
+                    f"""
+                    UPDATE {table_name} SET {column_name}_id =
+                    (SELECT id FROM {lookup_table} WHERE wert = {table_name}.{column_name})
+                    WHERE {column_name} IS NOT NULL;
+                    """)
+                batch.execute(f"ALTER TABLE {table_name} DROP COLUMN {column_name};")
+                logger.info(f"{table_name}.{column_name} encoded in {lookup_table}")
+    for table_name, columns in ENCODED_COLUMNS.items():
+        for column_name in columns:
+            # most meanings have no grammatik, the NULLs are left out
+            db.create_index(table_name, [f"{column_name}_id"], where=f"{column_name}_id IS NOT NULL")
+    db.dictionary.reset()
+    create_text_views(db)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store the low cardinality columns in lookup tables")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--no-vacuum", action="store_true", help="don't rebuild the file to release the space")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db = DatabaseManager(args.database)
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    size = os.path.getsize(args.database)
+    normalize(db)
+    if not args.no_vacuum:
+        db.execute("VACUUM;")
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    print(f"{args.database}: {size / 1e6:.1f} MB -> {os.path.getsize(args.database) / 1e6:.1f} MB")
+    for table_name, columns in ENCODED_COLUMNS.items():
+        for lookup_table in columns.values():
+            count = db.execute(f"SELECT count(*) FROM {lookup_table};").fetchone()[0]
+            print(f"{lookup_table}: {count} values")
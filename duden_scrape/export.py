@@ -0,0 +1,144 @@
+import sys
+import json
+import logging
+import argparse
+from collections import defaultdict
+from duden_scrape.database import DatabaseManager
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# {key in the record: (table, value column)} of the lists that hang off a word
+WORD_LISTS = {"synonyme": ("synonyme", "synonyme"), "antonyme": ("antonyme", "antonyme"),
+              "synonyme_links": ("synonyme_links", "synonym_url"),
+              "antonyme_links": ("antonyme_links", "antonym_url"),
+              "typische_verbindungen_links": ("typische_verbindungen_links", "typische_verbindung_url")}
+# the same for the lists that hang off a meaning
+MEANING_LISTS = {"beispiele": ("beispiele", "beispiel"),
+                 "wendungen_redensarten_sprichwoerter": ("wendungen_redensarten_sprichwoerter",
+                                                         "wendung_redensart_sprichwort"),
+                 "gebrauch": ("gebrauch_text", "gebrauch")}
+
+
+def _word_lists(db, table_name, column_name, first_id, last_id):
+    values = defaultdict(list)
+    for wort_id, value in db.execute(
+            f"SELECT wort_id, {column_name} FROM {table_name} WHERE wort_id BETWEEN ? AND ? ORDER BY id",
+            (first_id, last_id)):
+        values[wort_id].append(value)
+    return values
+
+def _meaning_lists(db, table_name, column_name, first_id, last_id):
+    values = defaultdict(list)
+    for bedeutungen_id, value in db.execute(
+            f"""
+            SELECT t.bedeutungen_id, t.{column_name} FROM {table_name} t
+            JOIN bedeutungen b ON b.id = t.bedeutungen_id
+            WHERE b.wort_id BETWEEN ? AND ? ORDER BY t.id
+            """, (first_id, last_id)):
+        values[bedeutungen_id].append(value)
+    return values
+
+def iter_records(db, since=0, chunk_size=1000):
+    """Yield one denormalized dict per word with id > since, in id order.
+
+    Words are read in chunks of chunk_size ids (keyset pagination), and every
+    child table is read once per chunk, so memory depends on chunk_size only.
+    """
+    last_id = since
+    while True:
+        cursor = db.execute("SELECT * FROM wort_text WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size))
+        columns = [description[0] for description in cursor.description]
+        words = [dict(zip(columns, row)) for row in cursor]
+        if not words:
+            return
+        first_id, last_id = words[0]["id"], words[-1]["id"]
+
+        word_lists = {key: _word_lists(db, table_name, column_name, first_id, last_id)
+                      for key, (table_name, column_name) in WORD_LISTS.items()}
+        meaning_lists = {key: _meaning_lists(db, table_name, column_name, first_id, last_id)
+                         for key, (table_name, column_name) in MEANING_LISTS.items()}
+        meanings = defaultdict(list)
+        for bedeutungen_id, wort_id, bedeutung, grammatik in db.execute(
+                "SELECT id, wort_id, bedeutung, grammatik FROM bedeutungen_text WHERE wort_id BETWEEN ? AND ? "
+                "ORDER BY id",
+                (first_id, last_id)):
+            meaning = {"bedeutung": bedeutung, "grammatik": grammatik}
+            for key, values in meaning_lists.items():
+                meaning[key] = values.get(bedeutungen_id, [])
+            meanings[wort_id].append(meaning)
+
+        for word in words:
+            for key, values in word_lists.items():
+                word[key] = values.get(word["id"], [])
+            word["bedeutungen"] = meanings.get(word["id"], [])
+            yield word
+
+def export_jsonl(db, path, since=0, chunk_size=1000):
+    """Write one JSON object per line and word. Returns the number of words
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as output:
+        for record in iter_records(db, since, chunk_size):
+            output.write(json.dumps(record, ensure_ascii=False))
+            output.write("\n")
+            count += 1
+    return count
+
+def parquet_schema(db):
+    """Arrow schema of the records: the wort columns plus the nested lists
+    """
+    fields = [(name, pa.int64() if data_type.upper() == "INTEGER" else pa.string())
+              for _, name, data_type, *_ in db.execute("PRAGMA table_info(wort_text)")]
+    fields += [(key, pa.list_(pa.string())) for key in WORD_LISTS]
+    meaning = pa.struct([("bedeutung", pa.string()), ("grammatik", pa.string())] +
+                        [(key, pa.list_(pa.string())) for key in MEANING_LISTS])
+    fields.append(("bedeutungen", pa.list_(meaning)))
+    return pa.schema(fields)
+
+def export_parquet(db, path, since=0, row_group_size=10000, chunk_size=1000):
+    """Write the records to a Parquet file in row groups of row_group_size words.
+    Returns the number of words
+    """
+    if pa is None:
+        raise ImportError("The Parquet export requires the pyarrow package")
+    schema = parquet_schema(db)
+    count = 0
+    rows = []
+    with pq.ParquetWriter(path, schema) as writer:
+        for record in iter_records(db, since, chunk_size):
+            rows.append(record)
+            if len(rows) == row_group_size:
+                writer.write_table(pa.Table.from_pylist(rows, schema), row_group_size=row_group_size)
+                count += len(rows)
+                rows = []
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema), row_group_size=row_group_size)
+            count += len(rows)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export one denormalized record per word")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None,
+                        help="default: from the file extension")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--since", type=int, default=0, help="only words with a larger id")
+    parser.add_argument("--row-group-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    export_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    db = DatabaseManager(args.database)
+    if export_format == "parquet":
+        count = export_parquet(db, args.output, args.since, args.row_group_size)
+    else:
+        count = export_jsonl(db, args.output, args.since)
+    print(f"{count} words exported to {args.output}")
@@ -0,0 +1,73 @@
+import os
+import time
+import logging
+from duden_scrape.utils import fetch
+
+logger = logging.getLogger(__name__)
+
+# small hand-made pages in Duden's markup, stored under their url path in this package
+# (duden_scrape/fixtures/rechtschreibung/Haus.html), so the mock server and the benchmark
+# find them wherever duden_scrape is installed
+FIXTURE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# pages downloaded from duden.de with python -m duden_scrape.fixtures, same layout
+SAVED_DIRECTORY = os.path.join(FIXTURE_DIRECTORY, "saved")
+# the words of tests/scrape_tests.py
+SAVED_PAGES = ["/rechtschreibung/Haus", "/rechtschreibung/Heber", "/rechtschreibung/Hausflur",
+               "/rechtschreibung/Hausarrest", "/rechtschreibung/Hausbibliothek", "/rechtschreibung/Hauserin",
+               "/rechtschreibung/Haussa_Sprache_Afrika", "/rechtschreibung/H_Dur",
+               "/rechtschreibung/Haute_Couture", "/rechtschreibung/Abbau",
+               "/rechtschreibung/d_Korrekturzeichen_fuer_tilgen", "/rechtschreibung/Hebewerk",
+               "/rechtschreibung/billig"]
+
+
+def fixture_pages(directory=FIXTURE_DIRECTORY):
+    """Read the saved pages.
+    The downloaded pages in SAVED_DIRECTORY are not part of the hand-made ones.
+
+    Returns:
+        dict -- {url path (e.g. /rechtschreibung/Haus): html}, sorted by path
+    """
+    pages = {}
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [name for name in dirnames if os.path.join(root, name) != SAVED_DIRECTORY]
+        for filename in filenames:
+            if filename.endswith(".html"):
+                path = os.path.join(root, filename)
+                url = "/" + os.path.relpath(path, directory)[:-len(".html")].replace(os.sep, "/")
+                with open(path, encoding="utf-8") as page:
+                    pages[url] = page.read()
+    return dict(sorted(pages.items()))
+
+def saved_pages():
+    """Read the downloaded pages, empty if none were downloaded yet.
+
+    Returns:
+        dict -- {url path: html}, sorted by path
+    """
+    return fixture_pages(SAVED_DIRECTORY)
+
+def download_pages(urls=SAVED_PAGES, directory=SAVED_DIRECTORY, base_url="https://www.duden.de",
+                   delay=1.0, overwrite=False):
+    """Save the pages of urls from the site under their url path in directory.
+    Pages that are already saved are kept unless overwrite is set.
+
+    Returns:
+        list -- url paths that were downloaded
+    """
+    downloaded = []
+    for url in urls:
+        path = os.path.join(directory, *url.strip("/").split("/")) + ".html"
+        if os.path.exists(path) and not overwrite:
+            logger.info(f"{url} is already saved")
+            continue
+        if downloaded:
+            time.sleep(delay)
+        source = fetch(base_url + url)
+        if source.status_code != 200:
+            raise Exception(f"{url} returned status {source.status_code}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as page:
+            page.write(source.text)
+        logger.info(f"saved {url} ({len(source.content)} bytes)")
+        downloaded.append(url)
+    return downloaded
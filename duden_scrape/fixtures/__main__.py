@@ -0,0 +1,18 @@
+import sys
+import logging
+import argparse
+from duden_scrape.fixtures import SAVED_DIRECTORY, SAVED_PAGES, download_pages
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the pages the scrape tests and the benchmark run on")
+    parser.add_argument("urls", nargs="*", default=SAVED_PAGES, help="url paths, e.g. /rechtschreibung/Haus")
+    parser.add_argument("--directory", default=SAVED_DIRECTORY, help="directory of the saved pages")
+    parser.add_argument("--base-url", default="https://www.duden.de")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds between two requests")
+    parser.add_argument("--overwrite", action="store_true", help="download pages that are already saved again")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    downloaded = download_pages(args.urls, args.directory, args.base_url, args.delay, args.overwrite)
+    print(f"Downloaded {len(downloaded)} pages to {args.directory}")
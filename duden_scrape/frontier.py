@@ -0,0 +1,232 @@
+import sys
+import logging
+import argparse
+import sqlite3
+import threading
+from time import perf_counter
+from bisect import bisect_left
+from datetime import datetime
+import requests
+from duden_scrape.archive import PageArchive
+from duden_scrape.database import DatabaseManager
+from duden_scrape.ratecontrol import MAX_RATE_BY_HOUR, RateController
+from duden_scrape.utils import (FIRST_WORD, RangeDict, add_word_entries_db, create_tables, extract_record, load_word,
+                                make_session)
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+IN_FLIGHT = "in-flight"
+DONE = "done"
+FAILED = "failed"
+
+LINK_TABLES = {"synonyme_links": "synonym_url", "antonyme_links": "antonym_url",
+               "typische_verbindungen_links": "typische_verbindung_url"}
+
+
+class Frontier():
+    """Persistent set of word urls (of the form "/rechtschreibung/{word}")
+    with their crawl state: pending, in-flight, done or failed.
+    The table lives in the crawl database, so a word and its state change
+    are committed together.
+    """
+    def __init__(self, db, base_url="https://www.duden.de", max_attempts=3):
+        self.db = db
+        self.base_url = base_url
+        self.max_attempts = max_attempts
+        db.create_table("frontier", {"url": "TEXT PRIMARY KEY", "state": "TEXT", "cursor": "INTEGER",
+                                     "attempts": "INTEGER DEFAULT 0", "updated_at": "TEXT"})
+        db.create_index("frontier", ["state"])
+
+    def seed(self, urls):
+        """Add urls as pending unless they are known already
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.db.batch() as batch:
+            batch.cursor.executemany(
+                "INSERT OR IGNORE INTO frontier (url, state, updated_at) VALUES (?, ?, ?);",
+                [(url, PENDING, now) for url in urls])
+
+    def seed_from_db(self):
+        """Mark all words in wort as done and add the urls of
+        synonyme_links, antonyme_links and typische_verbindungen_links as pending
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        prefix_length = len(self.base_url) + 1
+        with self.db.batch() as batch:
+            batch.execute(
+                f"""
+                INSERT INTO frontier (url, state, updated_at)
+                SELECT substr(url, {prefix_length}), ?, ? FROM wort WHERE url IS NOT NULL
+                ON CONFLICT (url) DO UPDATE SET state = excluded.state;
+                """, (DONE, now))
+            for table_name, column_name in LINK_TABLES.items():
+                batch.execute(
+                    f"""
+                    INSERT OR IGNORE INTO frontier (url, state, updated_at)
+                    SELECT DISTINCT substr({column_name}, {prefix_length}), ?, ? FROM {table_name};
+                    """, (PENDING, now))
+
+    def reset_in_flight(self):
+        """Return urls of cursors that didn't finish (e.g. after a crash) to pending
+        """
+        self.db.execute("UPDATE frontier SET state = ? WHERE state = ?;", (PENDING, IN_FLIGHT))
+
+    def claim(self, url, cursor):
+        """Mark url as in-flight for cursor. Returns False if the url is
+        done, in flight at another cursor or failed too often.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.db.batch() as batch:
+            batch.execute("INSERT OR IGNORE INTO frontier (url, state, updated_at) VALUES (?, ?, ?);",
+                          (url, PENDING, now))
+            claimed = batch.execute(
+                """
+                UPDATE frontier SET state = ?, cursor = ?, updated_at = ?
+                WHERE url = ? AND (state = ? OR (state = ? AND attempts < ?));
+                """, (IN_FLIGHT, cursor, now, url, PENDING, FAILED, self.max_attempts)).rowcount
+        return claimed == 1
+
+    def _pending_urls(self, retry_failed=False):
+        if retry_failed:
+            rows = self.db.execute(
+                "SELECT url FROM frontier WHERE state = ? OR (state = ? AND attempts < ?) ORDER BY url;",
+                (PENDING, FAILED, self.max_attempts))
+        else:
+            rows = self.db.execute("SELECT url FROM frontier WHERE state = ? ORDER BY url;", (PENDING,))
+        return [url for url, in rows]
+
+    def next_pending(self):
+        """Url of a pending (or retryable failed) word away from the other cursors or None.
+
+        A cursor works on the urls after the one it claimed, so the urls are split
+        at the claimed urls into stretches and the middle of the longest one is taken,
+        like spread_seeds spreads the first cursors.
+        """
+        urls = self._pending_urls(retry_failed=True)
+        if not urls:
+            return None
+        claimed = [url for url, in self.db.execute("SELECT url FROM frontier WHERE state = ?;", (IN_FLIGHT,))]
+        bounds = [0] + sorted(bisect_left(urls, url) for url in claimed) + [len(urls)]
+        start, end = max(zip(bounds, bounds[1:]), key=lambda stretch: stretch[1] - stretch[0])
+        return urls[(start + end) // 2]
+
+    def mark_done(self, batch, url):
+        """Mark url as done within the batch that writes the word
+        """
+        batch.execute("UPDATE frontier SET state = ?, updated_at = ? WHERE url = ?;",
+                      (DONE, datetime.now().isoformat(timespec="seconds"), url))
+
+    def mark_failed(self, url):
+        self.db.execute("UPDATE frontier SET state = ?, attempts = attempts + 1, updated_at = ? WHERE url = ?;",
+                        (FAILED, datetime.now().isoformat(timespec="seconds"), url))
+
+    def spread_seeds(self, number):
+        """Pick number pending urls evenly spaced over the alphabet
+        """
+        if number <= 0:
+            return []
+        urls = self._pending_urls()
+        if len(urls) <= number:
+            return urls
+        step = len(urls) / number
+        return [urls[int(i * step)] for i in range(number)]
+
+    def counts(self):
+        return dict(self.db.execute("SELECT state, count(*) FROM frontier GROUP BY state;").fetchall())
+
+
+def crawl_cursor(cursor, start_url, database_filename="Duden", base_url="https://www.duden.de",
+                 rate_controller=None, archive=None, cursors=1):
+    """Follow "Im Alphabet danach" from start_url until a url is reached that is done
+    or claimed by another cursor, then continue with the next pending url.
+    Runs until the frontier has no pending urls left.
+
+    rate_controller is shared by the cursors crawling at the same time, cursors
+    is their number; every cursor waits cursors times the delay of the controller.
+    """
+    db = DatabaseManager(database_filename, profile="crawl")
+    frontier = Frontier(db, base_url)
+    rate_controller = rate_controller or RateController(ceilings=MAX_RATE_BY_HOUR)
+    # requests sessions are not thread safe, every cursor has its own
+    session = make_session()
+    url = start_url
+    words = 0
+    while True:
+        if url is None or not frontier.claim(url, cursor):
+            url = frontier.next_pending()
+            if url is None:
+                break
+            continue
+        started = perf_counter()
+        try:
+            word = load_word(url, base_url=base_url, archive=archive, session=session)
+            rate_controller.record(latency=perf_counter() - started)
+            record = extract_record(word)
+            next_url = record.next_word
+            with db.batch() as batch:
+                add_word_entries_db(*record.entries(), batch)
+                frontier.mark_done(batch, url)
+            words += 1
+            logger.info(f"cursor {cursor}: {url}")
+            url = next_url
+        except Exception as e:
+            if isinstance(e, requests.exceptions.RetryError):
+                rate_controller.record(status=429)
+            elif isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                rate_controller.record(timeout=True)
+            logger.error(f"cursor {cursor}: {url} failed: {e}")
+            try:
+                frontier.mark_failed(url)
+            except sqlite3.Error as e:
+                # the url stays in flight until reset_in_flight on the next start
+                logger.error(f"cursor {cursor}: {url} could not be marked as failed: {e}")
+            url = None
+        rate_controller.wait(elapsed=perf_counter() - started, shares=cursors)
+    logger.info(f"cursor {cursor} finished after {words} words")
+    return words
+
+def crawl(start_urls, database_filename="Duden", base_url="https://www.duden.de", rate_controller=None,
+          archive=None):
+    """Run one cursor thread per start url on the shared frontier.
+    All cursors share one rate controller (default: MAX_RATE_BY_HOUR), so
+    together they keep to the rate of a single crawler and a 429 or timeout
+    seen by one of them slows down all.
+    """
+    rate_controller = rate_controller or RateController(ceilings=MAX_RATE_BY_HOUR)
+    threads = [threading.Thread(target=crawl_cursor, name=f"cursor-{cursor}",
+                                args=(cursor, start_url, database_filename, base_url, rate_controller, archive,
+                                      len(start_urls)))
+               for cursor, start_url in enumerate(start_urls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl Duden with several cursors on a persistent frontier")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--base-url", default="https://www.duden.de")
+    parser.add_argument("--cursors", type=int, default=4)
+    parser.add_argument("--seed", action="append", default=[],
+                        help="start url, can be given several times")
+    parser.add_argument("--max-rate", type=float, default=None,
+                        help="requests per second of all cursors together at any hour "
+                             "instead of the time of day ceilings")
+    parser.add_argument("--archive", default=None, help="directory of the page archive")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db = DatabaseManager(args.database, profile="crawl")
+    create_tables(db)
+    frontier = Frontier(db, args.base_url)
+    frontier.reset_in_flight()
+    frontier.seed(args.seed or [FIRST_WORD])
+    frontier.seed_from_db()
+    starts = args.seed + frontier.spread_seeds(max(0, args.cursors - len(args.seed)))
+    ceilings = RangeDict({range(0, 24): args.max_rate}) if args.max_rate else MAX_RATE_BY_HOUR
+    crawl(starts[:args.cursors], args.database, args.base_url, RateController(ceilings=ceilings),
+          PageArchive(args.archive) if args.archive else None)
+    print(frontier.counts())
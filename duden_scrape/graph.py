@@ -0,0 +1,182 @@
+import os
+import sys
+import logging
+import argparse
+import numpy as np
+from duden_scrape.database import DatabaseManager
+from duden_scrape.utils import create_tables
+
+logger = logging.getLogger(__name__)
+
+# relation -> (link table, url column)
+RELATIONS = {"synonym": ("synonyme_links", "synonym_url"),
+             "antonym": ("antonyme_links", "antonym_url"),
+             "typische_verbindung": ("typische_verbindungen_links", "typische_verbindung_url")}
+
+
+def resolve_links(db):
+    """Map the link urls to the ids of the scraped words and store them as edges
+    in wort_verbindungen. Links to words that are not in the database are left out.
+    The table is rebuilt on every call, so run it after a crawl or a merge.
+
+    Returns:
+        dict -- {relation: (resolved links, unresolved links)}
+    """
+    stats = {}
+    with db.batch() as batch:
+        batch.execute("DELETE FROM wort_verbindungen;")
+        for relation, (table_name, column_name) in RELATIONS.items():
+            batch.execute(
+                f"""
+                INSERT INTO wort_verbindungen (relation, wort_id, ziel_id)
+                SELECT DISTINCT ?, l.wort_id, w.id FROM {table_name} l JOIN wort w ON w.url = l.{column_name}
+                ORDER BY l.wort_id, w.id;
+                """, (relation,))
+            resolved = batch.execute("SELECT count(*) FROM wort_verbindungen WHERE relation = ?;",
+                                     (relation,)).fetchone()[0]
+            links = batch.execute(f"SELECT count(DISTINCT wort_id || ' ' || {column_name}) FROM {table_name};"
+                                  ).fetchone()[0]
+            stats[relation] = (resolved, links - resolved)
+    return stats
+
+def build_graph(db, directory, relation):
+    """Write the edges of one relation as CSR arrays to directory.
+
+    Nodes are numbered in wort.id order; the ids are stored in {relation}.ids.npy,
+    the neighbors of node i are indices[indptr[i]:indptr[i + 1]].
+    """
+    os.makedirs(directory, exist_ok=True)
+    ids = np.fromiter((wort_id for wort_id, in db.execute("SELECT id FROM wort ORDER BY id")), dtype=np.int64)
+    edges = np.array(db.execute("SELECT wort_id, ziel_id FROM wort_verbindungen WHERE relation = ? "
+                                "ORDER BY wort_id, ziel_id", (relation,)).fetchall(),
+                     dtype=np.int64).reshape(-1, 2)
+    sources = np.searchsorted(ids, edges[:, 0])
+    indices = np.searchsorted(ids, edges[:, 1]).astype(np.int32)
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(ids)), out=indptr[1:])
+
+    np.save(os.path.join(directory, f"{relation}.ids.npy"), ids)
+    np.save(os.path.join(directory, f"{relation}.indptr.npy"), indptr)
+    np.save(os.path.join(directory, f"{relation}.indices.npy"), indices)
+    logger.info(f"{relation}: {len(ids)} words, {len(indices)} edges written to {directory}")
+    return WordGraph.load(directory, relation)
+
+
+class WordGraph():
+    """Adjacency of one relation in CSR form.
+
+    The arrays are memory-mapped, so loading is instant and several processes
+    share the pages. Queries take and return wort ids; edges are directed as
+    on Duden (word -> linked word), components treat them as undirected.
+    """
+    def __init__(self, ids, indptr, indices):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def load(cls, directory, relation):
+        return cls(*(np.load(os.path.join(directory, f"{relation}.{name}.npy"), mmap_mode="r")
+                     for name in ("ids", "indptr", "indices")))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def node(self, wort_id):
+        """Position of wort_id in the arrays
+        """
+        position = int(np.searchsorted(self.ids, wort_id))
+        if position == len(self.ids) or self.ids[position] != wort_id:
+            raise KeyError(wort_id)
+        return position
+
+    def _neighbors(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def neighbors(self, wort_id):
+        return self.ids[self._neighbors(self.node(wort_id))]
+
+    def _search(self, start, max_depth=None, target=None):
+        """Level by level breadth first search, each level is one vectorized step.
+        Returns the depth and the parent of every node, -1 where not reached
+        """
+        depths = np.full(len(self.ids), -1, dtype=np.int32)
+        parents = np.full(len(self.ids), -1, dtype=np.int64)
+        depths[start] = 0
+        frontier = np.array([start])
+        depth = 0
+        while len(frontier) and (max_depth is None or depth < max_depth) and \
+                (target is None or depths[target] < 0):
+            starts = self.indptr[frontier]
+            counts = self.indptr[frontier + 1] - starts
+            # positions of all neighbors of the frontier in indices
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            neighbors = self.indices[positions]
+            origins = np.repeat(frontier, counts)
+            unseen = depths[neighbors] < 0
+            neighbors, first = np.unique(neighbors[unseen], return_index=True)
+            depth += 1
+            depths[neighbors] = depth
+            parents[neighbors] = origins[unseen][first]
+            frontier = neighbors
+        return depths, parents
+
+    def bfs(self, wort_id, max_depth=None):
+        """Breadth first search from wort_id.
+
+        Returns:
+            dict -- {wort id: depth} of all reached words
+        """
+        depths, _ = self._search(self.node(wort_id), max_depth)
+        reached = np.flatnonzero(depths >= 0)
+        return dict(zip(self.ids[reached].tolist(), depths[reached].tolist()))
+
+    def shortest_path(self, source_id, target_id):
+        """Shortest path as list of wort ids from source_id to target_id, None if there is none
+        """
+        source, target = self.node(source_id), self.node(target_id)
+        depths, parents = self._search(source, target=target)
+        if depths[target] < 0:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(parents[path[-1]])
+        return self.ids[path[::-1]].tolist()
+
+    def components(self):
+        """Connected components, ignoring the direction of the edges.
+
+        Returns:
+            numpy.ndarray -- component label per node (the smallest node of the component),
+                             aligned with self.ids
+        """
+        sources = np.repeat(np.arange(len(self.ids)), np.diff(self.indptr))
+        targets = np.asarray(self.indices)
+        labels = np.arange(len(self.ids))
+        while True:
+            previous = labels.copy()
+            np.minimum.at(labels, sources, labels[targets])
+            np.minimum.at(labels, targets, labels[sources])
+            # every label is a node of the same component, so following them is safe
+            labels = labels[labels]
+            if np.array_equal(labels, previous):
+                return labels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve the links and write the word graphs")
+    parser.add_argument("directory", help="directory for the CSR arrays")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--relation", choices=list(RELATIONS), action="append",
+                        help="default: all relations")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db = DatabaseManager(args.database)
+    create_tables(db)
+    for relation, (resolved, unresolved) in resolve_links(db).items():
+        print(f"{relation}: {resolved} links resolved, {unresolved} point to words that are not scraped")
+    for relation in args.relation or RELATIONS:
+        graph = build_graph(db, args.directory, relation)
+        print(f"{relation}: {len(np.unique(graph.components()))} components")
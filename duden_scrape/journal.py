@@ -0,0 +1,108 @@
+import logging
+from datetime import datetime
+from duden_scrape.models import WordRecord
+from duden_scrape.utils import add_word_entries_db
+
+logger = logging.getLogger(__name__)
+
+RETRY = "retry"
+DEAD = "dead"
+
+
+class CrawlJournal():
+    """Crawl state kept in the crawl database.
+
+    crawl_state holds the url to scrape next. It is written in the same
+    transaction as the word it follows, so after a crash or restart the crawl
+    continues right there without fetching anything again.
+    failed_urls collects urls that raised an error with their number of attempts;
+    after max_attempts they are dead letters and stay there for inspection.
+    """
+    def __init__(self, db, max_attempts=3):
+        self.db = db
+        self.max_attempts = max_attempts
+        db.create_table("crawl_state", {"id": "INTEGER PRIMARY KEY CHECK (id = 1)", "next_url": "TEXT",
+                                        "updated_at": "TEXT"})
+        db.create_table("failed_urls", {"url": "TEXT PRIMARY KEY", "attempts": "INTEGER", "state": "TEXT",
+                                        "error": "TEXT", "updated_at": "TEXT"})
+
+    def next_url(self):
+        row = self.db.select("next_url", "crawl_state", {"id": 1}).fetchone()
+        return row[0] if row else None
+
+    def advance(self, batch, next_url):
+        """Store the next url within the batch that writes the current word
+        """
+        batch.execute("INSERT OR REPLACE INTO crawl_state (id, next_url, updated_at) VALUES (1, ?, ?);",
+                      (next_url, datetime.now().isoformat(timespec="seconds")))
+
+    def resolve(self, batch, url):
+        """Remove url from failed_urls once it was scraped
+        """
+        batch.delete("failed_urls", {"url": url})
+
+    def record_failure(self, url, error):
+        """Count a failed attempt for url.
+
+        Returns:
+            bool -- True if url may be tried again, False if it is a dead letter now
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.db.batch() as batch:
+            batch.execute(
+                """
+                INSERT INTO failed_urls (url, attempts, state, error, updated_at) VALUES (?, 1, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET attempts = attempts + 1, error = excluded.error,
+                updated_at = excluded.updated_at;
+                """, (url, RETRY, error, now))
+            attempts = batch.execute("SELECT attempts FROM failed_urls WHERE url = ?;", (url,)).fetchone()[0]
+            if attempts >= self.max_attempts:
+                batch.execute("UPDATE failed_urls SET state = ? WHERE url = ?;", (DEAD, url))
+        return attempts < self.max_attempts
+
+    def retry_urls(self):
+        """Urls that failed but may be tried again
+        """
+        return [url for url, in self.db.select("url", "failed_urls", {"state": RETRY})]
+
+    def retry_failed(self, load_record):
+        """Try the retry_urls again until every one was scraped or is a dead letter.
+        load_record(url) returns the WordRecord of url; the word is written and
+        removed from failed_urls in one transaction. crawl_state is not changed.
+
+        Returns:
+            dict -- number of words scraped and of urls that became dead letters
+        """
+        scraped, dead = 0, 0
+        urls = self.retry_urls()
+        while urls:
+            for url in urls:
+                try:
+                    record = load_record(url)
+                    with self.db.batch() as batch:
+                        add_word_entries_db(*record.entries(), batch)
+                        self.resolve(batch, url)
+                    scraped += 1
+                except Exception as e:
+                    logger.error(f"Retrying {url} failed: {e}")
+                    if not self.record_failure(url, repr(e)):
+                        dead += 1
+            urls = self.retry_urls()
+        return {"scraped": scraped, "dead": dead}
+
+
+def skip_failed_word(word, url, db, journal):
+    """Move the journal past a word that could be fetched but not stored.
+    word is the loaded Word or its WordRecord.
+    Returns the next url or None if the word has no readable next url.
+    """
+    try:
+        next_url = word.next_word if isinstance(word, WordRecord) else word.get_next_word()
+    except Exception:
+        return None
+    if next_url is None:
+        return None
+    with db.batch() as batch:
+        journal.advance(batch, next_url)
+    logger.warning(f"{url} was skipped and stays in failed_urls, continuing with {next_url}")
+    return next_url
@@ -0,0 +1,243 @@
+import os
+import sys
+import logging
+import argparse
+import unicodedata
+from time import perf_counter
+from collections import deque
+import numpy as np
+from duden_scrape.database import DatabaseManager
+from duden_scrape.snapshot import StringColumn, load_array, save_array, save_strings
+
+logger = logging.getLogger(__name__)
+
+
+def fold(text, case=True, umlauts=True):
+    """Key of text for the comparisons: lower case if case, and without
+    umlauts and other diacritics ("ä" -> "a", "é" -> "e", "ß" -> "ss") if umlauts
+    """
+    if umlauts:
+        text = text.replace("ß", "ss").replace("ẞ", "SS")
+        text = "".join(character for character in unicodedata.normalize("NFKD", text)
+                       if not unicodedata.combining(character))
+    return text.lower() if case else text
+
+def edit_distance(first, second):
+    """Levenshtein distance where swapping two neighboring characters is one edit
+    """
+    before, previous = None, list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        row = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (first[i - 1] != second[j - 1]))
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        before, previous = previous, row
+    return previous[-1]
+
+
+def build_index(db, directory, name="lemmas"):
+    """Compile all wort.name values into a trie over their folded keys (fold)
+    and write it as .npy files to directory.
+
+    The nodes are numbered breadth first, so the children of node n are the
+    nodes first_child[n] to first_child[n + 1], sorted by label. The entries
+    (name, wort id, haeufigkeit) are sorted by key: the words below node n are
+    the entries entry_start[n] to entry_end[n], the first up to exact_end[n]
+    have the key of the node itself.
+
+    Returns:
+        LemmaIndex -- the written index, memory-mapped
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries = sorted((fold(lemma), lemma, wort_id, haeufigkeit or 0) for wort_id, lemma, haeufigkeit in
+                     db.execute("SELECT id, name, haeufigkeit FROM wort_text WHERE name IS NOT NULL;"))
+    keys = [entry[0] for entry in entries]
+
+    labels, first_child, entry_start, exact_end, entry_end = [0], [], [], [], []
+    queue = deque([(0, 0, len(keys))])
+    nodes = 1
+    while queue:
+        depth, start, end = queue.popleft()
+        exact = start
+        while exact < end and len(keys[exact]) == depth:
+            exact += 1
+        entry_start.append(start)
+        exact_end.append(exact)
+        entry_end.append(end)
+        first_child.append(nodes)
+        position = exact
+        while position < end:
+            label = keys[position][depth]
+            group_end = position + 1
+            while group_end < end and keys[group_end][depth] == label:
+                group_end += 1
+            labels.append(ord(label))
+            queue.append((depth + 1, position, group_end))
+            nodes += 1
+            position = group_end
+    first_child.append(nodes)
+
+    for array_name, values, dtype in (("labels", labels, np.int32), ("first_child", first_child, np.int32),
+                                      ("entry_start", entry_start, np.int32), ("exact_end", exact_end, np.int32),
+                                      ("entry_end", entry_end, np.int32),
+                                      ("ids", [entry[2] for entry in entries], np.int64),
+                                      ("frequency", [entry[3] for entry in entries], np.int8)):
+        save_array(directory, f"{name}.{array_name}", np.array(values, dtype=dtype))
+    save_strings(directory, f"{name}.names", [entry[1] for entry in entries])
+    logger.info(f"{len(entries)} lemmas in {nodes} nodes written to {directory}")
+    return LemmaIndex.load(directory, name)
+
+
+class LemmaIndex():
+    """Exact, prefix and fuzzy lookup of lemmas in the trie written by build_index.
+
+    The arrays are memory-mapped, so loading is instant and several processes
+    share the pages. The trie holds the fully folded keys; with fold_case or
+    fold_umlauts set to False the matches are checked again with less folding.
+    Results are (name, wort id) tuples, fuzzy results have the distance as third item.
+    """
+    def __init__(self, labels, first_child, entry_start, exact_end, entry_end, ids, frequency, names):
+        self.labels = labels
+        self.first_child = first_child
+        self.entry_start = entry_start
+        self.exact_end = exact_end
+        self.entry_end = entry_end
+        self.ids = ids
+        self.frequency = frequency
+        self.names = names
+
+    @classmethod
+    def load(cls, directory, name="lemmas"):
+        arrays = [load_array(directory, f"{name}.{array_name}") for array_name in
+                  ("labels", "first_child", "entry_start", "exact_end", "entry_end", "ids", "frequency")]
+        names = StringColumn(load_array(directory, f"{name}.names.offsets"),
+                             load_array(directory, f"{name}.names.bytes"))
+        return cls(*arrays, names)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _children(self, node):
+        return int(self.first_child[node]), int(self.first_child[node + 1])
+
+    def _node(self, key):
+        """Node of key or None
+        """
+        node = 0
+        for character in key:
+            first, last = self._children(node)
+            position = first + int(np.searchsorted(self.labels[first:last], ord(character)))
+            if position == last or self.labels[position] != ord(character):
+                return None
+            node = position
+        return node
+
+    def _entry(self, position):
+        return self.names[position], int(self.ids[position])
+
+    def _matches(self, positions, word, fold_case, fold_umlauts, test):
+        """Entries at positions whose name passes test(folded name, folded word)
+        with the requested folding (all do with full folding)
+        """
+        if fold_case and fold_umlauts:
+            return [self._entry(position) for position in positions]
+        key = fold(word, fold_case, fold_umlauts)
+        return [entry for entry in map(self._entry, positions) if test(fold(entry[0], fold_case, fold_umlauts), key)]
+
+    def lookup(self, word, fold_case=True, fold_umlauts=True):
+        """All lemmas equal to word, e.g. both entries of "Bank"
+        """
+        node = self._node(fold(word))
+        if node is None:
+            return []
+        return self._matches(range(self.entry_start[node], self.exact_end[node]), word, fold_case, fold_umlauts,
+                             lambda name, key: name == key)
+
+    def complete(self, prefix, limit=10, fold_case=True, fold_umlauts=True):
+        """Lemmas starting with prefix, the most frequent (haeufigkeit) first
+        """
+        node = self._node(fold(prefix))
+        if node is None:
+            return []
+        start, end = int(self.entry_start[node]), int(self.entry_end[node])
+        order = start + np.argsort(-self.frequency[start:end].astype(np.int16), kind="stable")
+        results = []
+        # the ordered candidates are checked in chunks until limit of them matched
+        for chunk_start in range(0, len(order), max(limit, 1) * 4):
+            results += self._matches(order[chunk_start:chunk_start + max(limit, 1) * 4], prefix, fold_case,
+                                     fold_umlauts, lambda name, key: name.startswith(key))
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def fuzzy(self, word, max_distance=1, limit=10, fold_case=True, fold_umlauts=True):
+        """Lemmas within max_distance edits of word (insertions, deletions,
+        substitutions and swaps of neighboring characters), nearest and most frequent first
+        """
+        key = fold(word)
+        found = {}
+        # depth first over the trie with one row of the edit distance table per node
+        stack = [(0, list(range(len(key) + 1)), None, None)]
+        while stack:
+            node, row, previous_row, previous_label = stack.pop()
+            first, last = self._children(node)
+            for child, label in zip(range(first, last), self.labels[first:last].tolist()):
+                character = chr(label)
+                child_row = [row[0] + 1]
+                for j in range(1, len(key) + 1):
+                    distance = min(row[j] + 1, child_row[j - 1] + 1, row[j - 1] + (key[j - 1] != character))
+                    if previous_row and j > 1 and character == key[j - 2] and previous_label == key[j - 1]:
+                        distance = min(distance, previous_row[j - 2] + 1)
+                    child_row.append(distance)
+                if child_row[-1] <= max_distance:
+                    for position in range(self.entry_start[child], self.exact_end[child]):
+                        found[position] = child_row[-1]
+                if min(child_row) <= max_distance:
+                    stack.append((child, child_row, row, character))
+
+        if fold_case and fold_umlauts:
+            results = [(*self._entry(position), distance) for position, distance in found.items()]
+        else:
+            key = fold(word, fold_case, fold_umlauts)
+            results = [(name, wort_id, edit_distance(fold(name, fold_case, fold_umlauts), key))
+                       for name, wort_id in map(self._entry, found)]
+            results = [result for result in results if result[2] <= max_distance]
+        frequency = {int(self.ids[position]): int(self.frequency[position]) for position in found}
+        results.sort(key=lambda result: (result[2], -frequency[result[1]], result[0]))
+        return results[:limit]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the lemma index or query it")
+    parser.add_argument("directory", help="directory for the arrays")
+    parser.add_argument("--database", default="Duden", help="build the index from this database")
+    parser.add_argument("--lookup", default=None)
+    parser.add_argument("--complete", default=None)
+    parser.add_argument("--fuzzy", default=None)
+    parser.add_argument("--max-distance", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--exact-case", action="store_true", help="don't fold the case")
+    parser.add_argument("--exact-umlauts", action="store_true", help="don't fold umlauts and diacritics")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    folding = {"fold_case": not args.exact_case, "fold_umlauts": not args.exact_umlauts}
+    queries = [(query, method) for query, method in ((args.lookup, "lookup"), (args.complete, "complete"),
+                                                     (args.fuzzy, "fuzzy")) if query is not None]
+    if queries:
+        index = LemmaIndex.load(args.directory)
+    else:
+        start = perf_counter()
+        index = build_index(DatabaseManager(args.database), args.directory)
+        print(f"{len(index)} lemmas indexed in {perf_counter() - start:.1f}s")
+    for query, method in queries:
+        start = perf_counter()
+        if method == "lookup":
+            results = index.lookup(query, **folding)
+        elif method == "complete":
+            results = index.complete(query, args.limit, **folding)
+        else:
+            results = index.fuzzy(query, args.max_distance, args.limit, **folding)
+        print(f"{method} {query!r} ({(perf_counter() - start) * 1e6:.0f}µs): {results}")
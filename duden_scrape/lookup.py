@@ -0,0 +1,104 @@
+import sys
+import json
+import argparse
+from functools import lru_cache
+from collections import defaultdict
+from duden_scrape.database import DatabaseManager
+from duden_scrape.export import MEANING_LISTS, WORD_LISTS
+
+
+class WordLookup():
+    """Read complete words from the database.
+
+    A word is assembled in four indexed queries however many meanings and
+    lists it has: the wort rows, all word lists (UNION ALL), the meanings and
+    all meaning lists (UNION ALL). Results are kept in a bounded LRU cache;
+    they are shared between callers and must not be modified.
+    The records have the same layout as the export records.
+    """
+    def __init__(self, db, cache_size=10000):
+        self.db = db
+        self._cached_query = lru_cache(maxsize=cache_size)(self._query)
+
+    def lookup(self, name):
+        """All words with the given lemma (e.g. both entries for "Bank")
+
+        Returns:
+            tuple -- records in id order, empty if the word is unknown
+        """
+        return self._cached_query("name", name)
+
+    def lookup_url(self, url):
+        """The word scraped from url or None
+        """
+        records = self._cached_query("url", url)
+        return records[0] if records else None
+
+    def stats(self):
+        info = self._cached_query.cache_info()
+        requests = info.hits + info.misses
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize,
+                "hit_rate": round(info.hits / requests, 4) if requests else 0.0}
+
+    def clear_cache(self):
+        """Drop cached words, e.g. after the crawler changed the database
+        """
+        self._cached_query.cache_clear()
+
+    def _query(self, column_name, value):
+        cursor = self.db.execute(f"SELECT * FROM wort_text WHERE {column_name} = ? ORDER BY id", (value,))
+        columns = [description[0] for description in cursor.description]
+        words = [dict(zip(columns, row)) for row in cursor]
+        if not words:
+            return ()
+        ids = [word["id"] for word in words]
+        marks = ", ".join("?" * len(ids))
+
+        word_lists = defaultdict(lambda: defaultdict(list))
+        query = " UNION ALL ".join(
+            f"SELECT '{key}', wort_id, id, {list_column} FROM {table_name} WHERE wort_id IN ({marks})"
+            for key, (table_name, list_column) in WORD_LISTS.items())
+        for key, wort_id, _, list_value in self.db.execute(query + " ORDER BY 1, 3", ids * len(WORD_LISTS)):
+            word_lists[wort_id][key].append(list_value)
+
+        meaning_lists = defaultdict(lambda: defaultdict(list))
+        query = " UNION ALL ".join(
+            f"""SELECT '{key}', t.bedeutungen_id, t.id, t.{list_column} FROM {table_name} t
+                JOIN bedeutungen b ON b.id = t.bedeutungen_id WHERE b.wort_id IN ({marks})"""
+            for key, (table_name, list_column) in MEANING_LISTS.items())
+        for key, bedeutungen_id, _, list_value in self.db.execute(query + " ORDER BY 1, 3",
+                                                                  ids * len(MEANING_LISTS)):
+            meaning_lists[bedeutungen_id][key].append(list_value)
+
+        meanings = defaultdict(list)
+        for bedeutungen_id, wort_id, bedeutung, grammatik in self.db.execute(
+                f"SELECT id, wort_id, bedeutung, grammatik FROM bedeutungen_text WHERE wort_id IN ({marks}) "
+                "ORDER BY id",
+                ids):
+            meaning = {"bedeutung": bedeutung, "grammatik": grammatik}
+            for key in MEANING_LISTS:
+                meaning[key] = meaning_lists[bedeutungen_id][key]
+            meanings[wort_id].append(meaning)
+
+        for word in words:
+            for key in WORD_LISTS:
+                word[key] = word_lists[word["id"]][key]
+            word["bedeutungen"] = meanings[word["id"]]
+        return tuple(words)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the complete entries of a word")
+    parser.add_argument("word", help="lemma or url")
+    parser.add_argument("--database", default="Duden")
+    args = parser.parse_args()
+
+    word_lookup = WordLookup(DatabaseManager(args.database))
+    if args.word.startswith("http"):
+        records = [record for record in [word_lookup.lookup_url(args.word)] if record]
+    else:
+        records = word_lookup.lookup(args.word)
+    if not records:
+        sys.exit(f"{args.word} not found")
+    for record in records:
+        print(json.dumps(record, ensure_ascii=False, indent=2))
@@ -1,11 +1,16 @@
 import sys
 import logging
-from time import sleep
-import numpy as np
-from datetime import datetime
+import argparse
+from time import perf_counter
 from .utils import load_word
 from duden_scrape.database import DatabaseManager
-from duden_scrape.utils import RangeDict, add_full_word_db, add_link_entries_db, add_meanings_db, add_word_db, create_tables, increase_variance
+from duden_scrape.archive import PageArchive
+from duden_scrape.graph import resolve_links
+from duden_scrape.journal import CrawlJournal, skip_failed_word
+from duden_scrape.metrics import add_metrics_arguments, report_metrics
+from duden_scrape.ratecontrol import MAX_RATE_BY_HOUR, RateController
+from duden_scrape.utils import (FIRST_WORD, LAST_WORD, RangeDict, add_word_entries_db, create_tables, extract_record,
+                                next_word_url)
 import requests
 import OpenSSL
 from urllib3.exceptions import ReadTimeoutError
@@ -13,103 +18,154 @@ import sqlite3
 
 # logger properties
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
-fh = logging.FileHandler('duden_scrape.log')
-fh.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.ERROR)
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-fh.setFormatter(formatter)
-ch.setFormatter(formatter)
-logger.addHandler(fh)
-logger.addHandler(ch)
 
-
-LAST_WORD = "/rechtschreibung/24_Stunden_Rennen"
-word_entry = None
-db = DatabaseManager("Duden")
-
-create_tables(db)
-first_word = "/rechtschreibung/d_Korrekturzeichen_fuer_tilgen"
-url = first_word
-recover = False
-wait_variance = 5
-
-min_wait_variance_by_hour = RangeDict(
-    {range(0, 7): 0.5, range(7, 21): 5, range(21, 24): 2.5})
+# directory to keep the raw pages in (e.g. "Duden_pages"), None to disable the archive
+archive_directory = None
+first_word = FIRST_WORD
+last_word = LAST_WORD
+# a local stand-in such as duden_scrape.mockserver can be crawled instead of the site
+base_url = "https://www.duden.de"
 
 
 if __name__ == "__main__":
-    time_hour = datetime.now().hour
-    wait_variance = min_wait_variance_by_hour[time_hour]
-    if not db.is_empty("wort"):
-        old_url = db.select("url", "wort", order_by="id desc", limit="1").fetchone()[
-            0].replace("https://www.duden.de", "")
-        word = load_word(old_url)
-        url = word.get_next_word()
-
-    while True:
-        try:
-            if recover and not db.is_empty("wort"):
-                # if there was an unhandled excpetion delete the last scraped word
-                # to make sure the word information wasn't just partially scraped
-                # and start scraping that word again
-                sleep(wait_variance**2)
-                db.delete("wort", {"id": db.get_max_id("wort")})
-                max_url = db.select("url", "wort", order_by="id desc", limit="1").fetchone()[
-                    0].replace("https://www.duden.de", "")
-                word = load_word(max_url)
-                url = word.get_next_word()
-                recover = False
-
-            word = load_word(url)
-            wort_id, word_entry = add_full_word_db(word, url, db)
+    parser = argparse.ArgumentParser(description="Scrape all words of Duden one after another")
+    parser.add_argument("--base-url", default=base_url)
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--start", default=first_word, help="url of the first word of a new crawl")
+    parser.add_argument("--last", default=last_word, help="url of the last word")
+    parser.add_argument("--archive", default=archive_directory, help="directory of the page archive")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="only try the urls in failed_urls again instead of following the chain")
+    parser.add_argument("--max-rate", type=float, default=None,
+                        help="requests per second at any hour instead of the time of day ceilings")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    # only a crawl writes the log, importing this module doesn't
+    logger.setLevel(logging.DEBUG)
+    fh = logging.FileHandler('duden_scrape.log')
+    fh.setLevel(logging.DEBUG)
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.ERROR)
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    fh.setFormatter(formatter)
+    ch.setFormatter(formatter)
+    logger.addHandler(fh)
+    logger.addHandler(ch)
+
+    reporter = report_metrics(args)
+    base_url, first_word, last_word = args.base_url, args.start, args.last
+    db = DatabaseManager(args.database, profile="crawl")
+    create_tables(db)
+    journal = CrawlJournal(db)
+    archive = PageArchive(args.archive) if args.archive else None
+    if args.max_rate:
+        rate_controller = RateController(ceilings=RangeDict({range(0, 24): args.max_rate}))
+    else:
+        # the time of day ceilings are the policy, the controller finds the rate below them
+        rate_controller = RateController(ceilings=MAX_RATE_BY_HOUR)
+
+    if args.retry_failed:
+        # only the failed urls below, the chain is left where it is
+        url = None
+    else:
+        url = journal.next_url()
+        if url is None and not db.is_empty("wort"):
+            # databases from before the journal: find the next url once from the last word
+            old_url = db.select("url", "wort", order_by="id desc", limit="1").fetchone()[
+                0].replace(base_url, "")
+            word = load_word(old_url, base_url=base_url, archive=archive, mode="cache-first")
+            url = word.get_next_word()
+        url = url or first_word
 
+    words = 0
+    crawl_start = perf_counter()
+    while url:
+        word, record = None, None
+        try:
+            started = perf_counter()
+            word = load_word(url, base_url=base_url, archive=archive)
+            rate_controller.record(latency=perf_counter() - started)
+            record = extract_record(word)
+            # the record has everything, the soup is freed before the write and the wait
+            word = None
+            next_url = next_word_url(record, url, last_word)
+
+            # the word and the next url are committed together
+            with db.batch() as batch:
+                wort_id = add_word_entries_db(*record.entries(), batch)
+                journal.advance(batch, next_url)
+                journal.resolve(batch, url)
+
+            words += 1
             logger.info(
-                f"{url}, wait_variance: {round(wait_variance,3)}, wort_id: {wort_id}")
-
-            if url == LAST_WORD:
-                sys.exit(1)
-            url = word.get_next_word()
+                f"{url}, rate: {round(rate_controller.rate,3)}, wort_id: {wort_id}")
 
-            sleep(abs(np.random.normal(0, wait_variance)))
+            if url == last_word:
+                logger.info("The last word was scraped and the program quit")
+            url = next_url
 
-            time_hour = datetime.now().hour
-            wait_variance = max(wait_variance-0.01,
-                                min_wait_variance_by_hour[time_hour])
+            rate_controller.wait()
 
         except KeyboardInterrupt:
+            # a word is written in one transaction, so nothing partial is left behind
             logger.debug("KEYBOARD INTERRUPTION")
-            max_id = db.get_max_id("wort")
-            max_url = db.select("url", "wort", order_by="id desc", limit="1").fetchone()[
-                0].replace("https://www.duden.de", "")
-            db.delete("wort", {"id": max_id})
-            logger.warning(f"{max_url} with id {max_id} was deleted")
+            reporter.stop()
             sys.exit(1)
+        except requests.exceptions.RetryError as e:
+            # the retries for 429/5xx responses were used up
+            logger.error(
+                f"The requests for {url} were throttled with rate {round(rate_controller.rate,3)}: \n {e}")
+            rate_controller.record(status=429)
+            rate_controller.wait()
         except (requests.exceptions.Timeout, requests.exceptions.ConnectTimeout, ReadTimeoutError, requests.exceptions.ConnectionError) as e:
             logger.error(
-                f"The requests for {url} timed out with wait_variance {round(wait_variance,3)}: \n {e}")
-            wait_variance = increase_variance(wait_variance)
-            sleep(300)
+                f"The requests for {url} timed out with rate {round(rate_controller.rate,3)}: \n {e}")
+            rate_controller.record(timeout=True)
+            rate_controller.wait()
         except OSError as e:
             logger.error(
-                f"The request for {url} with {round(wait_variance,3)} failed with an OSError: \n {e}")
-            wait_variance = increase_variance(wait_variance)
-            sleep(300)
+                f"The request for {url} with {round(rate_controller.rate,3)} failed with an OSError: \n {e}")
+            rate_controller.record(timeout=True)
+            rate_controller.wait()
         except sqlite3.OperationalError as e:
             logger.error(f"There was an error with sqlite3: \n {e}")
-            recover = True
-        except:
-            if url == LAST_WORD:
-                logger.info("The last word was scraped and the program quit")
-                sys.exit(1)
+            rate_controller.wait()
+        except Exception as e:
             logger.error(
-                f"There was an error with {url} \n and word_entry {word_entry} \n with wait_variance {round(wait_variance,3)} ", exc_info=True)
-            recover = True
-            wait_variance = increase_variance(wait_variance)
+                f"There was an error with {url} \n with rate {round(rate_controller.rate,3)} ", exc_info=True)
+            retry = journal.record_failure(url, repr(e))
+            loaded = record if record is not None else word
+            next_url = skip_failed_word(loaded, url, db, journal) if loaded is not None else None
+            if next_url:
+                url = next_url
+            elif not retry:
+                logger.error(f"{url} failed too often and has no next word, see failed_urls")
+                sys.exit(1)
+            rate_controller.wait()
+
+    def load_record(url):
+        rate_controller.wait()
+        started = perf_counter()
+        word = load_word(url, base_url=base_url, archive=archive)
+        rate_controller.record(latency=perf_counter() - started)
+        return extract_record(word)
+
+    # the words that were skipped on the way get their remaining attempts
+    retried = journal.retry_failed(load_record)
+    logger.info(f"failed urls: {retried['scraped']} scraped now, {retried['dead']} dead letters")
+
+    minutes = (perf_counter() - crawl_start) / 60
+    words += retried["scraped"]
+    logger.info(f"{words} words in {minutes:.1f} minutes ({words / minutes if minutes else 0:.1f} words/minute), "
+                f"rate controller: {rate_controller.stats()}")
+    reporter.stop()
+
+    # all words are scraped, join the links to the wort table
+    for relation, (resolved, unresolved) in resolve_links(db).items():
+        logger.info(f"{relation}: {resolved} links resolved, {unresolved} unresolved")
 
 
 # @TODO: create new ER_diagram with fun_facts and alt_hyphenation
-# @TODO: create link tables with added words (not just the links) -> join to wort table
@@ -0,0 +1,246 @@
+import os
+import json
+import bisect
+import logging
+import threading
+from time import perf_counter, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the histogram buckets
+SECONDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+           120, 300)
+BYTES = (1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000, 5000000)
+COUNTS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram():
+    """Counts of observed values per bucket plus count, sum, min and max
+    """
+    def __init__(self, buckets=SECONDS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate from the buckets (linear within the bucket), None without observations
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for position, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[position - 1] if position else self.min
+                upper = self.buckets[position] if position < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "mean": round(self.sum / self.count, 6) if self.count else None,
+                "min": self.min, "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "max": self.max}
+
+
+def _series(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics():
+    """Thread safe registry of histograms, counters and gauges.
+
+    Every series is a name plus labels, e.g.
+        metrics.observe("db_write_seconds", 0.002, table="wort")
+        metrics.increment("fetch_responses_total", status=200)
+        with metrics.timer("parse_soup_seconds"): ...
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started = time()
+
+    def observe(self, name, value, buckets=SECONDS, **labels):
+        key = _series(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, value=1, **labels):
+        key = _series(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_series(name, labels)] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - started, **labels)
+
+    def observe_timings(self, name, timings, label):
+        """Observe a dict {label value: seconds}, e.g. the property timings of a Word
+        """
+        for value, seconds in timings.items():
+            self.observe(name, seconds, **{label: value})
+
+    def reset(self):
+        with self._lock:
+            self.histograms, self.counters, self.gauges = {}, {}, {}
+            self.started = time()
+
+    def summary(self):
+        """All series as a JSON serializable dict
+        """
+        def entries(series, value):
+            result = {}
+            for (name, labels), data in series.items():
+                result.setdefault(name, []).append(dict(labels, **value(data)))
+            return result
+
+        with self._lock:
+            return {"started": self.started, "seconds": round(time() - self.started, 3),
+                    "histograms": entries(self.histograms, Histogram.summary),
+                    "counters": entries(self.counters, lambda value: {"value": value}),
+                    "gauges": entries(self.gauges, lambda value: {"value": value})}
+
+    def prometheus(self):
+        """All series in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE duden_{name} {kind}")
+                    for (series_name, labels), value in sorted(series.items(), key=str):
+                        if series_name == name:
+                            lines.append(f"duden_{name}{_label_text(labels)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE duden_{name} histogram")
+                for (series_name, labels), histogram in sorted(self.histograms.items(), key=str):
+                    if series_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"duden_{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"duden_{name}_sum{_label_text(labels)} {histogram.sum}")
+                    lines.append(f"duden_{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path=None, prometheus_path=None):
+        """Write the JSON summary and/or the Prometheus text file (atomically, for the node exporter)
+        """
+        for path, content in ((json_path, lambda: json.dumps(self.summary(), indent=2)),
+                              (prometheus_path, self.prometheus)):
+            if path:
+                with open(path + ".tmp", "w") as output:
+                    output.write(content())
+                os.replace(path + ".tmp", path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /metrics.json in a background thread.
+        Returns the server, call shutdown() to stop it.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.summary()), "application/json"
+                elif self.path == "/metrics":
+                    body, content_type = registry.prometheus(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+
+class MetricsReporter():
+    """Write the metrics every interval seconds from a background thread
+    (and once more on stop)
+    """
+    def __init__(self, registry, json_path=None, prometheus_path=None, interval=60):
+        self.registry = registry
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def report(self):
+        try:
+            self.registry.write(self.json_path, self.prometheus_path)
+        except OSError:
+            logger.error("Writing the metrics failed", exc_info=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.report()
+
+
+# the registry the crawler modules report to
+metrics = Metrics()
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-json", default=None, help="file for the periodic JSON summary")
+    parser.add_argument("--metrics-prometheus", default=None, help="file for the Prometheus text format")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve /metrics on this port")
+    parser.add_argument("--metrics-interval", type=float, default=60, help="seconds between the reports")
+
+def report_metrics(args, registry=metrics):
+    """Start the exports requested on the command line (see add_metrics_arguments).
+    Returns the started MetricsReporter, stop() it at the end for a last report.
+    """
+    if args.metrics_port:
+        registry.serve(args.metrics_port)
+    return MetricsReporter(registry, args.metrics_json, args.metrics_prometheus, args.metrics_interval).start()
@@ -0,0 +1,210 @@
+import re
+import sys
+import socket
+import struct
+import random
+import logging
+import argparse
+import threading
+from time import sleep
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from duden_scrape.fixtures import fixture_pages
+from duden_scrape.utils import content_hash
+
+logger = logging.getLogger(__name__)
+
+NEXT_WORD_LIST = re.compile(r'(<h3 class="hookup__title">Im Alphabet danach</h3>)<ul class="hookup__group">.*?</ul>',
+                            re.S)
+
+
+class MockDuden():
+    """Local stand-in for duden.de.
+
+    Serves the fixture pages under their own urls and a synthetic chain of
+    chain_length words (/rechtschreibung/Wort_000000, ...) built from them,
+    whose "Im Alphabet danach" blocks link the following words (up to
+    next_words of them, like the site); the last word has no next word.
+    Pages carry an ETag and answer If-None-Match with 304. The paths in
+    missing are answered with 404.
+
+    Faults are drawn per request with the given rates (0 to 1):
+    reset_rate closes the connection without a response (TCP reset),
+    timeout_rate stalls for stall seconds and then closes it,
+    throttle_rate and unavailable_rate answer 429 and 503 with Retry-After.
+    Every other request is answered after latency seconds (+- latency_jitter).
+
+        with MockDuden(chain_length=500, throttle_rate=0.05) as server:
+            load_word(server.first_url, base_url=server.base_url)
+    """
+    def __init__(self, chain_length=100, latency=0.0, latency_jitter=0.0, throttle_rate=0.0,
+                 unavailable_rate=0.0, timeout_rate=0.0, reset_rate=0.0, stall=15.0, retry_after=1,
+                 host="127.0.0.1", port=0, pages=None, seed=None, next_words=3, missing=()):
+        self.chain_length = chain_length
+        self.next_words = next_words
+        self.missing = set(missing)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.throttle_rate = throttle_rate
+        self.unavailable_rate = unavailable_rate
+        self.timeout_rate = timeout_rate
+        self.reset_rate = reset_rate
+        self.stall = stall
+        self.retry_after = retry_after
+        self.pages = pages or fixture_pages()
+        self._templates = list(self.pages.values())
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                mock._handle(self)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def first_url(self):
+        return self.chain_url(0)
+
+    @property
+    def last_url(self):
+        return self.chain_url(self.chain_length - 1)
+
+    def chain_url(self, position):
+        return f"/rechtschreibung/Wort_{position:06d}"
+
+    def page(self, path):
+        """Html of the page at path or None
+        """
+        if path in self.missing:
+            return None
+        if path in self.pages:
+            return self.pages[path]
+        match = re.fullmatch(r"/rechtschreibung/Wort_(\d{6})", path)
+        if not match or int(match.group(1)) >= self.chain_length:
+            return None
+        position = int(match.group(1))
+        next_words = "".join(
+            f'<li><a class="hookup__link" href="{self.chain_url(following)}">Wort_{following:06d}</a></li>'
+            for following in range(position + 1, min(position + 1 + self.next_words, self.chain_length)))
+        template = self._templates[position % len(self._templates)]
+        return NEXT_WORD_LIST.sub(lambda match: f'{match.group(1)}<ul class="hookup__group">{next_words}</ul>',
+                                  template, count=1)
+
+    def _fault(self):
+        with self._lock:
+            draw = self._random.random()
+            jitter = self._random.uniform(-self.latency_jitter, self.latency_jitter)
+        for fault, rate in (("reset", self.reset_rate), ("timeout", self.timeout_rate),
+                            ("throttled", self.throttle_rate), ("unavailable", self.unavailable_rate)):
+            if draw < rate:
+                return fault, 0
+            draw -= rate
+        return None, max(0.0, self.latency + jitter)
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _handle(self, request):
+        fault, latency = self._fault()
+        self._count("requests")
+        if fault:
+            self._count(fault)
+        if fault == "reset":
+            # SO_LINGER 0 makes close() send a RST instead of a FIN
+            request.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            request.connection.close()
+            request.close_connection = True
+            return
+        if fault == "timeout":
+            sleep(self.stall)
+            request.close_connection = True
+            return
+        if fault in ("throttled", "unavailable"):
+            request.send_response(429 if fault == "throttled" else 503)
+            request.send_header("Retry-After", str(self.retry_after))
+            request.send_header("Content-Length", "0")
+            request.end_headers()
+            return
+
+        sleep(latency)
+        text = self.page(request.path)
+        if text is None:
+            self._count("not_found")
+            request.send_error(404)
+            return
+        etag = f'"{content_hash(text)}"'
+        if request.headers.get("If-None-Match") == etag:
+            self._count("not_modified")
+            request.send_response(304)
+            request.send_header("ETag", etag)
+            request.end_headers()
+            return
+        body = text.encode("utf-8")
+        request.send_response(200)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(body)))
+        request.send_header("ETag", etag)
+        request.end_headers()
+        request.wfile.write(body)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-duden", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fixture pages as a local Duden with injected faults")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chain-length", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--unavailable-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of stalled requests")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="share of reset connections")
+    parser.add_argument("--stall", type=float, default=15.0, help="seconds a stalled request hangs")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = MockDuden(args.chain_length, args.latency, args.latency_jitter, args.throttle_rate,
+                       args.unavailable_rate, args.timeout_rate, args.reset_rate, args.stall,
+                       port=args.port, seed=args.seed)
+    print(f"Serving {server.base_url}, chain {server.first_url} .. {server.last_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.stats())
+        server.server.server_close()
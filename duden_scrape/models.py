@@ -1,36 +1,89 @@
 import re
+from functools import wraps
+from time import perf_counter
+
+
+def timed_property(getter):
+    """Property that adds its run time to the timings of the Word
+    """
+    @wraps(getter)
+    def timed_getter(self):
+        started = perf_counter()
+        try:
+            return getter(self)
+        finally:
+            self.timings[getter.__name__] = self.timings.get(getter.__name__, 0.0) + perf_counter() - started
+    return property(timed_getter)
+
 
 class Word():
     """Class for a single word of the german dictionary DUDEN
     """
-    def __init__(self, soup, url):
+    def __init__(self, soup, url, etag=None, last_modified=None, content_hash=None):
         self.soup = soup
         self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self._tuple_indexes = {}
+        self._tuple_values = {}
+        self._elements = {}
+        # seconds per property (and "soup" for building the tree), see duden_scrape.metrics
+        self.timings = {}
 
     
-    @property
+    @timed_property
     def name(self):
         """
         Word string (without article)
         """
         return self.soup.find("span", class_="breadcrumb__crumb").text.strip()
 
-    @property
+    @timed_property
     def full_word(self):
         """Get the full word (word plus article)
         """
         return self.soup.find("h1", class_=re.compile(r"lemma__title")).text.replace("\xa0", " ").strip()
         
+    def _find(self, name, **attrs):
+        """soup.find, searched once per Word for the elements several properties read
+        """
+        key = (name, tuple(sorted(attrs.items())))
+        if key not in self._elements:
+            self._elements[key] = self.soup.find(name, **attrs)
+        return self._elements[key]
+
+    def _get_tuple_index(self, element):
+        """Collect (tuple text, value) pairs of all dl.tuple elements in one walk.
+        The index is built lazily once per element and shared by all properties.
+        """
+        index = self._tuple_indexes.get(id(element))
+        if index is None:
+            index = []
+            for tup in element.find_all("dl", class_="tuple"):
+                value = tup.find("dd", class_="tuple__val")
+                index.append((tup.text, value.text.strip() if value else None))
+            self._tuple_indexes[id(element)] = index
+        return index
+
     def _get_tl_tuple(self, key, element=None):
         if not element:
             element = self.soup
-        tuples = element.find_all("dl", class_="tuple")
-        for tup in tuples:
-            if re.search(key, tup.text):
-                return tup.find("dd", class_="tuple__val").text.strip()
-        return None
-
-    @property
+        cache_key = (id(element), key)
+        if cache_key in self._tuple_values:
+            return self._tuple_values[cache_key]
+        for text, value in self._get_tuple_index(element):
+            if re.search(key, text):
+                if value is None:
+                    # same behaviour as before: a tuple without value raises
+                    raise AttributeError(f"tuple {key} has no value")
+                break
+        else:
+            value = None
+        self._tuple_values[cache_key] = value
+        return value
+
+    @timed_property
     def part_of_speech(self):
         """Get the part of speech (Wortart)
         """
@@ -39,7 +92,7 @@ class Word():
         except AttributeError:
             return None
 
-    @property
+    @timed_property
     def article(self):
         """Get article if the word is a noun
         """
@@ -48,7 +101,7 @@ class Word():
             return article.text
         return None
 
-    @property
+    @timed_property
     def frequency(self):
         """Get the word frequency:
         1: less than one in a million words
@@ -65,7 +118,7 @@ class Word():
             return len(freq.replace("░", ""))
         return None
         
-    @property
+    @timed_property
     def hyphenation(self):
         """Get the correct hyphenation of the word
         """
@@ -79,7 +132,7 @@ class Word():
         except AttributeError:
             return None
 
-    @property
+    @timed_property
     def alt_hyphenation(self):
         """Get alternative hyphenation of a word
         """
@@ -93,7 +146,7 @@ class Word():
         except AttributeError:
             return None 
 
-    @property
+    @timed_property
     def origin(self):
         """Get the origin of the word
         """
@@ -103,7 +156,7 @@ class Word():
         return None
 
 
-    @property
+    @timed_property
     def related_form(self):
         """Get the related form of a word (rare)
         """
@@ -113,7 +166,7 @@ class Word():
         return None
 
 
-    @property
+    @timed_property
     def alternative_spelling(self):
         """Some words have several ways of spelling them.
         Retrieve those spelling variants.
@@ -128,17 +181,17 @@ class Word():
             return dic["Alternative Schreibung"] # just return one value
         return None
 
-    @property
+    @timed_property
     def sign(self):
         """Some words have a sign that belongs to them.
         Retrieve that sign.
         """
-        sign = self._get_tl_tuple(key="Zeichen")
+        sign = self._get_tl_tuple(key=r"^\s*Zeichen") # not the "Wortart: Zeichen" tuple
         if sign:
             return sign.strip()
         return None
 
-    @property
+    @timed_property
     def short_form(self):
         """Get the short version of a word if it exists.
         """
@@ -147,7 +200,7 @@ class Word():
             return short.strip()
         return None
 
-    @property
+    @timed_property
     def short_form_of(self):
         """Get the long version of the word
         """
@@ -185,7 +238,7 @@ class Word():
         return res_list or None
         #return "; ".join(res for res in res_list) or None
 
-    @property
+    @timed_property
     def meaning(self):
         meanings = []
         dic = {}
@@ -227,53 +280,53 @@ class Word():
 
         return meanings
 
-    @property
+    @timed_property
     def synonyms(self):
         """Get the synonyms of the word
         """
-        synonyme = self.soup.find("div", id="synonyme")
+        synonyme = self._find("div", id="synonyme")
         if synonyme:
             synonyme = [synonym.text.strip() for synonym in synonyme.find_all("li")]
             synonyme = "; ".join(synonym for synonym in synonyme)
         return synonyme
 
-    @property
+    @timed_property
     def antonyms(self):
         """Get the antonyms of the word
         """
-        antonyme = self.soup.find("div", id="antonyme")
+        antonyme = self._find("div", id="antonyme")
         if antonyme:
             antonyme = [antonym.text.strip() for antonym in antonyme.find_all("li")]
             antonyme = "; ".join(antonym for antonym in antonyme)
         return antonyme
 
-    @property
+    @timed_property
     def synonym_links(self):
         """Get the duden links for the linked synonyms
         """
-        synonyme = self.soup.find("div", id="synonyme")
+        synonyme = self._find("div", id="synonyme")
         if synonyme:
             synonym_urls = synonyme.find("ul").find_all("a")
             synonym_urls = [synonym_url.get("href") for synonym_url in synonym_urls]
             return synonym_urls
         return None
 
-    @property
+    @timed_property
     def antonym_links(self):
         """Get the duden links for the linked antonyms
         """
-        antonyme = self.soup.find("div", id="antonyme")
+        antonyme = self._find("div", id="antonyme")
         if antonyme:
             antonym_urls = antonyme.find("ul").find_all("a")
             antonym_urls = [antonym_url.get("href") for antonym_url in antonym_urls]
             return antonym_urls
         return None
 
-    @property
+    @timed_property
     def typical_connections(self):
         """Get words that often appear together with this word
         """
-        element = self.soup.find("figure", class_="tag-cluster__cluster")
+        element = self._find("figure", class_="tag-cluster__cluster")
         if element:
             link_elements = element.find_all("a")
             if link_elements:
@@ -282,11 +335,11 @@ class Word():
             return related_words
         return None
 
-    @property
+    @timed_property
     def typical_connections_links(self):
         """Get words (links) that often appear together with this word
         """
-        element = self.soup.find("figure", class_="tag-cluster__cluster")
+        element = self._find("figure", class_="tag-cluster__cluster")
         if element:
             link_elements = element.find_all("a")
             if link_elements:
@@ -294,7 +347,7 @@ class Word():
             return related_word_urls
         return None
 
-    @property
+    @timed_property
     def fun_fact(self):
         """trivia info about the word"""
         element = self.soup.find("div", id="wussten_sie_schon")
@@ -321,6 +374,38 @@ class Word():
             return word_link.get("href")
         return None
 
+    def get_next_words(self):
+        """Get the urls of all following words, "Im Alphabet danach" lists several.
+        Empty if the page has no such block
+        """
+        title = self.soup.find("h3", class_="hookup__title", string="Im Alphabet danach")
+        if title is None:
+            return []
+        return [link.get("href") for link in title.next_sibling.find_all("a")]
+
+    def to_record(self):
+        """Extract every field once into an immutable WordRecord.
+        The record doesn't reference the soup, so the Word can be dropped afterwards.
+        next_word is None if the page has no "Im Alphabet danach" link, the crawl
+        loops decide whether that is an error.
+        """
+        try:
+            next_word = self.get_next_word()
+        except AttributeError:
+            # no "Im Alphabet danach" block at all
+            next_word = None
+        return WordRecord(
+            url=self.url, etag=self.etag, last_modified=self.last_modified, content_hash=self.content_hash,
+            name=self.name, full_word=self.full_word, article=self.article, part_of_speech=self.part_of_speech,
+            frequency=self.frequency, hyphenation=self.hyphenation, alt_hyphenation=self.alt_hyphenation,
+            origin=self.origin, related_form=self.related_form, alternative_spelling=self.alternative_spelling,
+            sign=self.sign, short_form=self.short_form, short_form_of=self.short_form_of,
+            synonyms=self.synonyms, antonyms=self.antonyms, fun_fact=self.fun_fact,
+            typical_connections=self.typical_connections,
+            meanings=tuple(MeaningRecord.from_dict(meaning) for meaning in self.meaning),
+            synonym_links=_freeze(self.synonym_links), antonym_links=_freeze(self.antonym_links),
+            typical_connections_links=_freeze(self.typical_connections_links),
+            next_word=next_word)
 
     def return_word_entry(self):
         dic_entry = {}
@@ -344,6 +429,9 @@ class Word():
         #dic_entry["typische_verbindungen"] = self.typical_connections
         dic_entry["fun_fact"] = self.fun_fact
         dic_entry["url"] = self.url
+        dic_entry["etag"] = self.etag
+        dic_entry["last_modified"] = self.last_modified
+        dic_entry["content_hash"] = self.content_hash
 
         return dic_entry
 
@@ -363,3 +451,88 @@ class Word():
 
         return dic_entry
 
+
+def _freeze(values):
+    return tuple(values) if values is not None else None
+
+def _thaw(values):
+    return list(values) if values is not None else None
+
+def _make_record(cls, values):
+    return cls(**dict(zip(cls.__slots__, values)))
+
+
+class Record():
+    """Immutable value object: the fields are the __slots__ of the subclass
+    """
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return _make_record, (type(self), tuple(getattr(self, name) for name in self.__slots__))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and \
+            all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class MeaningRecord(Record):
+    """One meaning of a WordRecord
+    """
+    __slots__ = ("meaning", "grammar", "usage", "examples", "idioms")
+
+    @classmethod
+    def from_dict(cls, meaning):
+        """From a dict of Word.meaning
+        """
+        return cls(meaning=meaning["Bedeutung"], grammar=meaning["grammatik"], usage=meaning["gebrauch"],
+                   examples=_freeze(meaning["beispiele"]),
+                   idioms=_freeze(meaning["wendungen_redensarten_sprichwoerter"]))
+
+    def to_dict(self):
+        return {"Bedeutung": self.meaning, "beispiele": _thaw(self.examples),
+                "wendungen_redensarten_sprichwoerter": _thaw(self.idioms), "gebrauch": self.usage,
+                "grammatik": self.grammar}
+
+
+class WordRecord(Record):
+    """All fields of a word, extracted once by Word.to_record
+    """
+    __slots__ = ("url", "etag", "last_modified", "content_hash", "name", "full_word", "article",
+                 "part_of_speech", "frequency", "hyphenation", "alt_hyphenation", "origin", "related_form",
+                 "alternative_spelling", "sign", "short_form", "short_form_of", "synonyms", "antonyms",
+                 "fun_fact", "typical_connections", "meanings", "synonym_links", "antonym_links",
+                 "typical_connections_links", "next_word")
+
+    def entries(self):
+        """New (word entry, meanings, links) dicts as returned by Word.return_word_entry,
+        return_meaning and return_links; the database functions may modify them
+        """
+        word_entry = {"name": self.name, "ganzes_wort": self.full_word, "artikel": self.article,
+                      "wortart": self.part_of_speech, "haeufigkeit": self.frequency,
+                      "worttrennung": self.hyphenation, "alternative_worttrennung": self.alt_hyphenation,
+                      "herkunft": self.origin, "verwandte_form": self.related_form,
+                      "alternative_schreibweise": self.alternative_spelling, "zeichen": self.sign,
+                      "kurzform": self.short_form, "kurzform_fuer": self.short_form_of,
+                      "synonyme": self.synonyms, "antonyme": self.antonyms, "fun_fact": self.fun_fact,
+                      "url": self.url, "etag": self.etag, "last_modified": self.last_modified,
+                      "content_hash": self.content_hash}
+        meanings = {"bedeutungen": [meaning.to_dict() for meaning in self.meanings]}
+        links = {"synonyme_links": _thaw(self.synonym_links), "antonyme_links": _thaw(self.antonym_links),
+                 "typische_verbindungen_links": _thaw(self.typical_connections_links)}
+        return word_entry, meanings, links
@@ -0,0 +1,256 @@
+import os
+import sys
+import queue
+import random
+import logging
+import argparse
+import threading
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import requests
+from duden_scrape.database import DatabaseManager
+from duden_scrape.journal import CrawlJournal
+from duden_scrape.metrics import COUNTS, add_metrics_arguments, metrics, report_metrics
+from duden_scrape.ratecontrol import MAX_RATE_BY_HOUR, RateController
+from duden_scrape.utils import (FIRST_WORD, HEADERS, LAST_WORD, RangeDict, add_word_entries_db, create_tables,
+                                fetch, find_next_words, parse_word)
+
+logger = logging.getLogger(__name__)
+
+# marks the end of the stream in the queues
+DONE = None
+
+
+def _extract_page(text, url, headers):
+    """Parse a page in a worker process and return the WordRecord
+    and the timings, the metrics of the worker are not seen by the crawler
+    """
+    word = parse_word(text, url, headers)
+    return word.to_record(), word.timings
+
+
+class CrawlPipeline():
+    """Crawl pipeline with three stages connected by bounded queues:
+
+    fetcher -> pages queue -> parse workers -> records queue -> db writer
+
+    The fetcher only does HTTP and the politeness delay; it reads the next url
+    from the raw html, so it never waits for parsing. Parse workers hand the
+    pages to a process pool. The writer commits several words per transaction.
+    Full queues block the stage before them (backpressure).
+    """
+    def __init__(self, database_filename="Duden", base_url="https://www.duden.de", archive=None,
+                 parse_workers=None, queue_size=32, commit_every=20, rate_controller=None,
+                 max_retries=5):
+        self.database_filename = database_filename
+        self.base_url = base_url
+        self.archive = archive
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.commit_every = commit_every
+        self.rate_controller = rate_controller or RateController(ceilings=MAX_RATE_BY_HOUR)
+        self.max_retries = max_retries
+
+        self.pages = queue.Queue(maxsize=queue_size)
+        self.records = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.fetched = 0
+        self.written = 0
+        self.failed = 0
+        self.failed_urls = []
+        self.error = None
+
+    def _fetch(self, url):
+        started = perf_counter()
+        try:
+            source = fetch(self.base_url + url, random.choice(HEADERS))
+        except requests.exceptions.RetryError:
+            self.rate_controller.record(status=429)
+            raise
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            self.rate_controller.record(timeout=True)
+            raise
+        self.rate_controller.record(latency=perf_counter() - started, status=source.status_code)
+        if self.archive is not None:
+            self.archive.put(self.base_url + url, source.text, source.status_code, source.headers)
+        if source.status_code != 200:
+            raise Exception(f"Unexpected response code: {source.status_code}")
+        return source.text, dict(source.headers)
+
+    def _fail(self, url, error):
+        self.failed += 1
+        self.failed_urls.append((url, error))
+
+    def fetcher(self, start_url, last_url, max_words):
+        url = start_url
+        # the other words the last page links as following, taken if url can't be fetched
+        alternatives = []
+        retries = 0
+        try:
+            while url and not self.stop.is_set():
+                started = perf_counter()
+                try:
+                    text, headers = self._fetch(url)
+                except Exception as e:
+                    retries += 1
+                    logger.error(f"Fetching {url} failed ({retries}/{self.max_retries}): {e}")
+                    if retries >= self.max_retries:
+                        self._fail(url, repr(e))
+                        url = alternatives.pop(0) if alternatives else None
+                        retries = 0
+                        logger.error(f"Skipped the word, continuing with {url}")
+                    self.rate_controller.wait()
+                    continue
+                retries = 0
+                self.pages.put((self.fetched, url, text, headers))
+                self.fetched += 1
+
+                if url == last_url or (max_words and self.fetched >= max_words):
+                    break
+                next_words = find_next_words(text, self.base_url + url)
+                if not next_words:
+                    self._fail(url, "no next word")
+                    next_words = alternatives
+                url, alternatives = (next_words[0] if next_words else None), next_words[1:]
+
+                # the delay counts from the start of the request, fetching is part of it
+                self.rate_controller.wait(elapsed=perf_counter() - started)
+        except Exception as e:
+            logger.error("The fetcher stopped", exc_info=True)
+            self.error = e
+            self.stop.set()
+        finally:
+            for _ in range(self.parse_workers):
+                self.pages.put(DONE)
+
+    def parser(self, executor):
+        while True:
+            item = self.pages.get()
+            if item is DONE:
+                self.records.put(DONE)
+                return
+            metrics.observe("queue_depth", self.pages.qsize(), buckets=COUNTS, queue="pages")
+            sequence, url, text, headers = item
+            try:
+                record, timings = executor.submit(_extract_page, text, self.base_url + url, headers).result()
+                metrics.observe_timings("parse_seconds", timings, "property")
+            except Exception as e:
+                record = None
+                self._fail(url, repr(e))
+                logger.error(f"Parsing {url} failed", exc_info=True)
+            # None keeps the place of a failed page for the ordered write
+            self.records.put((sequence, record))
+
+    def _write(self, db, group):
+        try:
+            with db.batch() as batch:
+                for record in group:
+                    add_word_entries_db(*record.entries(), batch)
+            self.written += len(group)
+        except Exception:
+            # write the words of the failed group one by one to keep the good ones
+            for record in group:
+                try:
+                    with db.batch() as batch:
+                        add_word_entries_db(*record.entries(), batch)
+                    self.written += 1
+                except Exception as e:
+                    self._fail(record.url.replace(self.base_url, "", 1), repr(e))
+                    logger.error(f"Writing {record.url} failed", exc_info=True)
+
+    def writer(self):
+        """Write the records in the order the pages were fetched, so wort.id follows
+        the alphabet like in main.py. The failed urls go to failed_urls at the end.
+        """
+        running = self.parse_workers
+        try:
+            db = DatabaseManager(self.database_filename, profile="crawl")
+            create_tables(db)
+            journal = CrawlJournal(db)
+            group, waiting, next_sequence = [], {}, 0
+            while running:
+                item = self.records.get()
+                metrics.observe("queue_depth", self.records.qsize(), buckets=COUNTS, queue="records")
+                if item is DONE:
+                    running -= 1
+                else:
+                    sequence, record = item
+                    waiting[sequence] = record
+                    while next_sequence in waiting:
+                        record = waiting.pop(next_sequence)
+                        next_sequence += 1
+                        if record is not None:
+                            group.append(record)
+                if group and (len(group) >= self.commit_every or not running or self.records.empty()):
+                    self._write(db, group)
+                    group = []
+                    logger.info(f"{self.written} words written, pages queue: {self.pages.qsize()}, "
+                                f"records queue: {self.records.qsize()}")
+            for url, error in self.failed_urls:
+                journal.record_failure(url, error)
+        except Exception as e:
+            logger.error("The writer stopped", exc_info=True)
+            self.error = e
+            self.stop.set()
+            # empty the queue until every parser is done, a full queue would block them
+            while running:
+                if self.records.get() is DONE:
+                    running -= 1
+
+    def run(self, start_url=FIRST_WORD, last_url=LAST_WORD, max_words=None):
+        """Crawl from start_url along "Im Alphabet danach" until last_url,
+        a page without next word or max_words pages. A url that can't be fetched
+        max_retries times is skipped for the next word its predecessor links.
+
+        Returns:
+            dict -- fetched, written and failed words, seconds and words per minute
+        Raises the error that stopped the fetcher or the writer, after all stages stopped.
+        """
+        start = perf_counter()
+        with ProcessPoolExecutor(self.parse_workers) as executor:
+            threads = [threading.Thread(target=self.fetcher, args=(start_url, last_url, max_words),
+                                        name="fetcher"),
+                       threading.Thread(target=self.writer, name="writer")]
+            threads += [threading.Thread(target=self.parser, args=(executor,), name=f"parser-{i}")
+                        for i in range(self.parse_workers)]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    thread.join()
+            except KeyboardInterrupt:
+                logger.warning("Stopping pipeline, writing the pages in flight")
+                self.stop.set()
+                for thread in threads:
+                    thread.join()
+        if self.error is not None:
+            raise self.error
+
+        seconds = perf_counter() - start
+        return {"fetched": self.fetched, "written": self.written, "failed": self.failed,
+                "seconds": round(seconds, 2),
+                "words_per_minute": round(self.written / seconds * 60, 1) if seconds else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl Duden with a fetch/parse/write pipeline")
+    parser.add_argument("--start", default=FIRST_WORD, help="url of the first word")
+    parser.add_argument("--last", default=LAST_WORD, help="url of the last word")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--base-url", default="https://www.duden.de")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    parser.add_argument("--max-rate", type=float, default=None,
+                        help="requests per second at any hour instead of the time of day ceilings")
+    parser.add_argument("--max-words", type=int, default=None)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    ceilings = RangeDict({range(0, 24): args.max_rate}) if args.max_rate else MAX_RATE_BY_HOUR
+    pipeline = CrawlPipeline(args.database, args.base_url, parse_workers=args.workers,
+                             rate_controller=RateController(ceilings=ceilings))
+    reporter = report_metrics(args)
+    try:
+        print(pipeline.run(args.start, args.last, args.max_words))
+    finally:
+        reporter.stop()
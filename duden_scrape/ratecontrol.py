@@ -0,0 +1,100 @@
+import math
+import threading
+from time import monotonic, sleep
+from datetime import datetime
+from collections import deque
+import numpy as np
+from duden_scrape.metrics import metrics
+from duden_scrape.utils import RangeDict
+
+# upper limit of requests per second by hour of the day,
+# the rates main.py used to get with its minimum wait_variance (0.5, 5 and 2.5)
+MAX_RATE_BY_HOUR = RangeDict({range(0, 7): 2.5, range(7, 21): 0.25, range(21, 24): 0.5})
+
+# retry statuses that mean the server wants fewer requests
+THROTTLE_STATUS = (429, 503)
+
+
+class RateController():
+    """Additive increase / multiplicative decrease of the request rate.
+
+    Every successful response (2xx or 304) below latency_target raises the rate
+    by increase (requests per second). A 429/503, a timeout or a response slower than
+    latency_target multiplies it by decrease, at most once per request interval,
+    so a burst of failures of requests that were in flight together counts once.
+    The rate always stays between min_rate and the ceiling for the current hour
+    and starts at that ceiling unless a start rate is given.
+
+    record() is thread safe, so one controller can serve the sync loop in main.py
+    as well as concurrent fetchers. Crawlers that share a controller pass their
+    number as shares to wait(), so together they keep to the rate.
+    """
+    def __init__(self, rate=None, min_rate=0.01, increase=0.005, decrease=0.5, latency_target=2.0,
+                 ceilings=MAX_RATE_BY_HOUR, window=100):
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.ceilings = ceilings
+        self._rate = rate or min(self.ceiling(), 0.25 if ceilings is None else math.inf)
+        self._last_decrease = 0
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.throttled = 0
+        self.timeouts = 0
+
+    def ceiling(self, hour=None):
+        if self.ceilings is None:
+            return math.inf
+        return self.ceilings[datetime.now().hour if hour is None else hour]
+
+    @property
+    def rate(self):
+        """Current request rate (requests per second)
+        """
+        return max(self.min_rate, min(self._rate, self.ceiling()))
+
+    def record(self, latency=None, status=200, timeout=False):
+        """Feed the outcome of one request into the controller
+        """
+        with self._lock:
+            self.requests += 1
+            if latency is not None:
+                self.latencies.append(latency)
+            if timeout:
+                self.timeouts += 1
+            if status in THROTTLE_STATUS:
+                self.throttled += 1
+
+            congested = timeout or status in THROTTLE_STATUS or \
+                (latency is not None and latency > self.latency_target)
+            now = monotonic()
+            if congested:
+                if now - self._last_decrease > 1 / self.rate:
+                    self._rate = max(self.min_rate, self.rate * self.decrease)
+                    self._last_decrease = now
+            elif 200 <= status < 300 or status == 304:
+                self._rate = min(self.rate + self.increase, self.ceiling())
+        metrics.set("request_rate", self.rate)
+
+    def delay(self, shares=1):
+        """Jittered delay in seconds before the next request.
+        Drawn like before as abs(normal(0, variance)), with the variance
+        chosen so the mean delay is shares / rate.
+        """
+        variance = shares / self.rate / math.sqrt(2 / math.pi)
+        return abs(np.random.normal(0, variance))
+
+    def wait(self, elapsed=0, shares=1):
+        """Sleep for the next delay, less the elapsed seconds since the request started.
+        shares: number of crawlers that use the controller at the same time
+        """
+        seconds = max(0, self.delay(shares) - elapsed)
+        metrics.observe("sleep_seconds", seconds)
+        sleep(seconds)
+
+    def stats(self):
+        return {"rate": round(self.rate, 4), "requests": self.requests, "throttled": self.throttled,
+                "timeouts": self.timeouts,
+                "mean_latency": round(sum(self.latencies) / len(self.latencies), 3) if self.latencies else None}
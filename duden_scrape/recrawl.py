@@ -0,0 +1,99 @@
+import sys
+import random
+import logging
+import argparse
+from time import perf_counter
+from datetime import datetime
+import requests
+from duden_scrape.database import DatabaseManager
+from duden_scrape.graph import resolve_links
+from duden_scrape.ratecontrol import MAX_RATE_BY_HOUR, RateController
+from duden_scrape.utils import (HEADERS, content_hash, create_tables, extract_record, fetch, parse_word,
+                                update_word_entries_db)
+
+logger = logging.getLogger(__name__)
+
+
+def conditional_headers(etag, last_modified):
+    headers = dict(random.choice(HEADERS))
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+def recrawl(database_filename="Duden", rate_controller=None, archive=None, since_id=0, limit=None):
+    """Refresh the words already in the database.
+
+    Every page is requested with If-None-Match/If-Modified-Since from the stored
+    ETag/Last-Modified. A 304 or a page with the stored content hash is not
+    parsed; only the new ETag/Last-Modified and geprueft_am are stored.
+    Changed pages, and pages of words without a stored hash, are parsed and
+    replace the old entry in one transaction, keeping its wort.id; their hash
+    is stored with them. wort_verbindungen is rebuilt if any word changed.
+
+    Returns:
+        dict -- number of unchanged, changed and failed words
+    """
+    rate_controller = rate_controller or RateController(ceilings=MAX_RATE_BY_HOUR)
+    db = DatabaseManager(database_filename, profile="crawl")
+    create_tables(db)
+
+    query = "SELECT id, url, etag, last_modified, content_hash FROM wort WHERE id > ? ORDER BY id"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    rows = db.execute(query, (since_id,)).fetchall()
+
+    stats = {"unchanged": 0, "changed": 0, "failed": 0}
+    for wort_id, url, etag, last_modified, stored_hash in rows:
+        started = perf_counter()
+        try:
+            source = fetch(url, conditional_headers(etag, last_modified))
+            rate_controller.record(latency=perf_counter() - started, status=source.status_code)
+            if archive is not None and source.status_code == 200:
+                archive.put(url, source.text, source.status_code, source.headers)
+
+            checked = datetime.now().isoformat(timespec="seconds")
+            # only hashed here, a crawl stores no hash and its words count as changed once
+            page_hash = content_hash(source.text) if source.status_code == 200 else None
+            if source.status_code == 304 or (page_hash is not None and page_hash == stored_hash):
+                # the server may hand out new validators for the same page
+                db.execute("UPDATE wort SET etag = coalesce(?, etag), last_modified = coalesce(?, last_modified), "
+                           "geprueft_am = ? WHERE id = ?;",
+                           (source.headers.get("ETag"), source.headers.get("Last-Modified"), checked, wort_id))
+                stats["unchanged"] += 1
+            elif source.status_code == 200:
+                word_entry, meanings, link_entries = extract_record(
+                    parse_word(source.text, url, source.headers)).entries()
+                word_entry["content_hash"] = page_hash
+                word_entry["geprueft_am"] = checked
+                with db.batch() as batch:
+                    update_word_entries_db(wort_id, word_entry, meanings, link_entries, batch)
+                stats["changed"] += 1
+                logger.info(f"{url} changed")
+            else:
+                raise Exception(f"Unexpected response code: {source.status_code}")
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            rate_controller.record(timeout=True)
+            stats["failed"] += 1
+            logger.error(f"The request for {url} timed out: {e}")
+        except Exception:
+            stats["failed"] += 1
+            logger.error(f"Recrawling {url} (id {wort_id}) failed", exc_info=True)
+        rate_controller.wait()
+
+    if stats["changed"]:
+        resolve_links(db)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the words in the database with conditional requests")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--since", type=int, default=0, help="only words with a larger id")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print(recrawl(args.database, since_id=args.since, limit=args.limit))
@@ -0,0 +1,126 @@
+import os
+import sys
+import logging
+import sqlite3
+import argparse
+from time import perf_counter
+from itertools import islice
+from multiprocessing import Pool
+from duden_scrape.archive import PageArchive
+from duden_scrape.database import DatabaseManager
+from duden_scrape.utils import add_word_entries_db, create_tables, parse_word
+
+logger = logging.getLogger(__name__)
+
+_archive = None
+
+
+def _init_worker(archive_directory):
+    global _archive
+    _archive = PageArchive(archive_directory)
+
+def _parse_page(url):
+    """Parse one archived page in a worker process.
+    Returns the url, the WordRecord (or None) and the error (or None)
+    """
+    try:
+        page = _archive.get(url)
+        if page is None:
+            raise Exception("the archived page is damaged")
+        return url, parse_word(page.text, url, page.headers).to_record(), None
+    except Exception as e:
+        return url, None, repr(e)
+
+def _remove_sidecars(database_filename):
+    for suffix in ("-wal", "-shm", "-journal"):
+        if os.path.exists(database_filename + suffix):
+            os.remove(database_filename + suffix)
+
+def release_database(database_filename):
+    """Fold the WAL of database_filename into the file and switch it back
+    to the rollback journal, so no -wal or -shm file is left that sqlite
+    would apply to a file moved in its place.
+    Raises an Exception if another connection still has the database open
+    in WAL mode or is reading or writing it.
+    """
+    if not os.path.exists(database_filename):
+        return
+    connection = sqlite3.connect(database_filename, timeout=0)
+    try:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        # leaving WAL fails while another connection has the database open
+        connection.execute("PRAGMA journal_mode = DELETE")
+        connection.execute("BEGIN EXCLUSIVE")
+        connection.rollback()
+    except sqlite3.OperationalError as e:
+        raise Exception(f"{database_filename} is still in use by another connection, "
+                        f"close it before the rebuild replaces it") from e
+    finally:
+        connection.close()
+    _remove_sidecars(database_filename)
+
+def rebuild_database(archive_directory, database_filename="Duden", processes=None,
+                     commit_every=500, chunksize=16):
+    """Rebuild the database from all archived pages (status 200).
+
+    Pages are parsed on a process pool, the calling process is the only writer
+    and commits every commit_every words. The database is built next to the
+    target and replaces it when done, unless another connection still uses the target.
+
+    Returns:
+        dict -- number of words, failed pages, seconds and pages per second
+    """
+    processes = processes or os.cpu_count()
+    urls = PageArchive(archive_directory).urls()
+    rebuild_filename = database_filename + ".rebuild"
+    if os.path.exists(rebuild_filename):
+        os.remove(rebuild_filename)
+    _remove_sidecars(rebuild_filename)
+
+    words, failed = 0, 0
+    start = perf_counter()
+    with Pool(processes, initializer=_init_worker, initargs=(archive_directory,)) as pool:
+        # connect after the workers are started, a forked sqlite connection breaks the WAL cleanup
+        db = DatabaseManager(rebuild_filename, profile="bulk")
+        create_tables(db)
+        results = pool.imap(_parse_page, urls, chunksize=chunksize)
+        while True:
+            chunk = list(islice(results, commit_every))
+            if not chunk:
+                break
+            with db.batch() as batch:
+                for url, record, error in chunk:
+                    if error:
+                        failed += 1
+                        logger.error(f"Could not parse {url}: {error}")
+                        continue
+                    add_word_entries_db(*record.entries(), batch)
+                    words += 1
+            logger.info(f"{words + failed}/{len(urls)} pages, "
+                        f"{(words + failed) / (perf_counter() - start):.1f} pages/s")
+
+    # fold the WAL into the database file before it is moved
+    db.execute("PRAGMA journal_mode = DELETE")
+    db.connection.close()
+    release_database(database_filename)
+    os.replace(rebuild_filename, database_filename)
+
+    seconds = perf_counter() - start
+    return {"words": words, "failed": failed, "seconds": round(seconds, 2),
+            "pages_per_second": round((words + failed) / seconds, 1) if seconds else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the Duden database from archived pages")
+    parser.add_argument("archive", help="directory of the PageArchive")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="parser processes (default: number of cores)")
+    parser.add_argument("--commit-every", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stats = rebuild_database(args.archive, args.database, args.processes, args.commit_every)
+    print(f"{stats['words']} words ({stats['failed']} failed) in {stats['seconds']} s, "
+          f"{stats['pages_per_second']} pages/s")
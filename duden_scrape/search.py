@@ -0,0 +1,122 @@
+import re
+import sys
+import argparse
+from duden_scrape.database import DatabaseManager
+
+# indexed texts: kind -> (table, text column, expression for the wort id, rowid offset)
+# the rowid of an entry is id * 4 + offset, so a deleted row finds its entry by rowid
+SOURCES = {
+    "bedeutung": ("bedeutungen", "bedeutung", "{row}.wort_id", 1),
+    "beispiel": ("beispiele", "beispiel",
+                 "(SELECT wort_id FROM bedeutungen WHERE id = {row}.bedeutungen_id)", 2),
+    "wendung": ("wendungen_redensarten_sprichwoerter", "wendung_redensart_sprichwort",
+                "(SELECT wort_id FROM bedeutungen WHERE id = {row}.bedeutungen_id)", 3),
+}
+
+# unicode61 folds case and umlauts (ä -> a); ß is expanded in the query instead
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+
+def enable_search(db):
+    """Create the FTS5 table volltext and the triggers that keep it in sync with
+    bedeutungen, beispiele and wendungen_redensarten_sprichwoerter.
+    Fills the index if it is empty. Safe to run repeatedly.
+    """
+    db.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS volltext
+        USING fts5(text, kind UNINDEXED, wort_id UNINDEXED, tokenize = "{TOKENIZER}");
+        """)
+    for kind, (table_name, column_name, wort_id, offset) in SOURCES.items():
+        db.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS volltext_{table_name}_insert AFTER INSERT ON {table_name}
+            WHEN new.{column_name} IS NOT NULL BEGIN
+                INSERT INTO volltext (rowid, text, kind, wort_id)
+                VALUES (new.id * 4 + {offset}, new.{column_name}, '{kind}', {wort_id.format(row="new")});
+            END;
+            """)
+        db.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS volltext_{table_name}_delete AFTER DELETE ON {table_name} BEGIN
+                DELETE FROM volltext WHERE rowid = old.id * 4 + {offset};
+            END;
+            """)
+    if db.is_empty("volltext"):
+        rebuild_index(db)
+
+def rebuild_index(db):
+    """Fill volltext from scratch, e.g. after bulk loads without triggers
+    """
+    with db.batch() as batch:
+        batch.execute("DELETE FROM volltext;")
+        for kind, (table_name, column_name, wort_id, offset) in SOURCES.items():
+            batch.execute(
+                f"""
+                INSERT INTO volltext (rowid, text, kind, wort_id)
+                SELECT id * 4 + {offset}, {column_name}, '{kind}', {wort_id.format(row=table_name)}
+                FROM {table_name} WHERE {column_name} IS NOT NULL;
+                """)
+    db.execute("INSERT INTO volltext (volltext) VALUES ('optimize');")
+
+def match_expression(query):
+    """FTS5 expression that matches all words of the query.
+    Words are quoted, a trailing * keeps prefix search and ß/ss match each other.
+    """
+    terms = []
+    for word in re.findall(r"[\w*]+", query):
+        prefix = "*" if word.endswith("*") else ""
+        word = word.rstrip("*").lower()
+        if not word:
+            continue
+        variants = {word, word.replace("ß", "ss"), word.replace("ss", "ß")}
+        terms.append("(" + " OR ".join(f'"{variant}"{prefix}' for variant in sorted(variants)) + ")")
+    return " AND ".join(terms)
+
+def search(db, query, limit=20, snippets_per_word=3):
+    """Full text search over meanings, examples and idioms.
+
+    Returns:
+        list -- dicts with wort_id, name, url, score and snippets [(kind, snippet)],
+                best match (lowest bm25) first, one dict per word
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    rows = db.execute(
+        """
+        SELECT v.wort_id, w.name, w.url, v.kind, snippet(volltext, 0, '[', ']', '…', 12), bm25(volltext)
+        FROM volltext v JOIN wort w ON w.id = v.wort_id
+        WHERE volltext MATCH ? ORDER BY bm25(volltext) LIMIT ?;
+        """, (expression, limit * snippets_per_word * 2))
+
+    results = {}
+    for wort_id, name, url, kind, snippet, score in rows:
+        if wort_id not in results:
+            if len(results) == limit:
+                continue
+            results[wort_id] = {"wort_id": wort_id, "name": name, "url": url, "score": score, "snippets": []}
+        if len(results[wort_id]["snippets"]) < snippets_per_word:
+            results[wort_id]["snippets"].append((kind, snippet))
+    return list(results.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full text search over the Duden database")
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index first")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.database)
+    enable_search(db)
+    if args.rebuild:
+        rebuild_index(db)
+    if args.query:
+        for result in search(db, args.query, args.limit):
+            print(f"{result['name']} ({result['url']})")
+            for kind, snippet in result["snippets"]:
+                print(f"    {kind}: {snippet}")
+    else:
+        print("search index ready", file=sys.stderr)
@@ -0,0 +1,283 @@
+import os
+import sys
+import logging
+import argparse
+from time import perf_counter
+from multiprocessing import Pool
+import requests
+from duden_scrape.archive import PageArchive
+from duden_scrape.database import DatabaseManager
+from duden_scrape.dictionary import ENCODED_COLUMNS, TEXT_VIEWS
+from duden_scrape.graph import resolve_links
+from duden_scrape.journal import CrawlJournal, skip_failed_word
+from duden_scrape.ratecontrol import MAX_RATE_BY_HOUR, RateController
+from duden_scrape.utils import (FIRST_WORD, LAST_WORD, RangeDict, add_word_entries_db, create_tables, extract_record,
+                                load_word, next_word_url)
+
+logger = logging.getLogger(__name__)
+
+# tables below wort and bedeutungen, with the foreign key that is remapped on a merge
+WORD_TABLES = {"synonyme": "wort_id", "antonyme": "wort_id", "synonyme_links": "wort_id",
+               "antonyme_links": "wort_id", "typische_verbindungen_links": "wort_id"}
+MEANING_TABLES = {"beispiele": "bedeutungen_id", "wendungen_redensarten_sprichwoerter": "bedeutungen_id",
+                  "gebrauch": "bedeutungen_id"}
+
+
+def shard_filename(database_filename, shard):
+    return f"{database_filename}.shard{shard}"
+
+def spread_starts(db, number, base_url="https://www.duden.de"):
+    """Pick number urls evenly spaced over the crawl order (wort.id) of an
+    existing database, e.g. an earlier crawl, as start urls of the shards
+    """
+    urls = [url[len(base_url):] for url, in db.execute("SELECT url FROM wort WHERE url IS NOT NULL ORDER BY id;")]
+    if len(urls) <= number:
+        return urls
+    step = len(urls) / number
+    return [urls[int(i * step)] for i in range(number)]
+
+
+def shard_ceilings(max_rate=None, shards=1):
+    """Rate ceilings by hour of one of shards shards that crawl at the same time:
+    their share of max_rate at any hour, or of MAX_RATE_BY_HOUR
+    """
+    ceilings = RangeDict({range(0, 24): max_rate}) if max_rate else MAX_RATE_BY_HOUR
+    return RangeDict({hours: rate / shards for hours, rate in ceilings.items()})
+
+
+def crawl_shard(shard, start_url, stop_urls=(), database_filename="Duden", base_url="https://www.duden.de",
+                max_rate=None, archive_directory=None, last_url=LAST_WORD, shards=1):
+    """Follow "Im Alphabet danach" from start_url into the shard database until
+    one of stop_urls (the starts of the other shards) or last_url is reached.
+
+    The shard has the schema of create_tables and its own CrawlJournal,
+    so a shard that is started again continues where it stopped.
+    Failing words are skipped like in main.py (skip_failed_word); a url that
+    can't be loaded at all is skipped for the next word its predecessor lists
+    once it is a dead letter.
+    Every shard has its own rate controller with a 1/shards share of max_rate
+    (or of MAX_RATE_BY_HOUR), so all shards together keep to the limit.
+
+    Returns:
+        dict -- shard, filename, words and failed urls
+    """
+    filename = shard_filename(database_filename, shard)
+    db = DatabaseManager(filename, profile="crawl")
+    create_tables(db)
+    journal = CrawlJournal(db)
+    archive = PageArchive(archive_directory) if archive_directory else None
+    rate_controller = RateController(ceilings=shard_ceilings(max_rate, shards))
+
+    # no crawl_state yet: a new shard, a stored None: the shard is finished
+    url = start_url if db.is_empty("crawl_state") else journal.next_url()
+    stop_urls = set(stop_urls) - {start_url}
+    # the other following words of the page before url, for a url that can't be loaded
+    alternatives = []
+    words, failed = 0, 0
+    while url and url not in stop_urls:
+        word = None
+        try:
+            started = perf_counter()
+            word = load_word(url, base_url=base_url, archive=archive)
+            rate_controller.record(latency=perf_counter() - started)
+            record = extract_record(word)
+            next_url = next_word_url(record, url, last_url)
+            with db.batch() as batch:
+                add_word_entries_db(*record.entries(), batch)
+                journal.advance(batch, next_url)
+                journal.resolve(batch, url)
+            words += 1
+            logger.info(f"shard {shard}: {url}")
+            alternatives = [following for following in word.get_next_words() if following != next_url]
+            url = next_url
+        except requests.exceptions.RetryError as e:
+            logger.error(f"shard {shard}: the requests for {url} were throttled: {e}")
+            rate_controller.record(status=429)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            logger.error(f"shard {shard}: the request for {url} timed out: {e}")
+            rate_controller.record(timeout=True)
+        except Exception as e:
+            logger.error(f"shard {shard}: {url} failed: {e}")
+            retry = journal.record_failure(url, repr(e))
+            if not retry:
+                failed += 1
+            # like main.py: a loaded word is skipped at once and stays in failed_urls
+            next_url = skip_failed_word(word, url, db, journal) if word is not None else None
+            if next_url is None and not retry and alternatives:
+                next_url = alternatives.pop(0)
+                with db.batch() as batch:
+                    journal.advance(batch, next_url)
+                logger.warning(f"shard {shard}: {url} is a dead letter, continuing with {next_url}")
+            if next_url:
+                url = next_url
+            elif not retry:
+                logger.error(f"shard {shard}: {url} failed too often and has no next word, the shard stops here")
+                break
+        rate_controller.wait()
+    logger.info(f"shard {shard} finished after {words} words")
+    db.connection.close()
+    return {"shard": shard, "filename": filename, "words": words, "failed": failed}
+
+def _crawl_shard(arguments):
+    return crawl_shard(*arguments)
+
+def crawl_shards(start_urls, database_filename="Duden", base_url="https://www.duden.de", max_rate=None,
+                 archive_directory=None, last_url=LAST_WORD):
+    """Crawl the stretches between the start urls in one process per shard.
+    max_rate (default MAX_RATE_BY_HOUR) is the rate of all shards together.
+
+    Returns:
+        list -- the results of crawl_shard, in the order of start_urls
+    """
+    arguments = [(shard, start_url, start_urls, database_filename, base_url, max_rate, archive_directory, last_url,
+                  len(start_urls))
+                 for shard, start_url in enumerate(start_urls)]
+    with Pool(len(arguments)) as pool:
+        return pool.map(_crawl_shard, arguments)
+
+
+def _columns(batch, schema, table_name):
+    return [row[1] for row in batch.execute(f"PRAGMA {schema}.table_info({table_name});")]
+
+def _copy(batch, table_name, expressions, keep_ids):
+    """INSERT ... SELECT all rows of a table of the attached shard into main.
+    expressions: {column: SQL expression on the shard row} for the remapped keys
+
+    Dictionary encoded columns are read as values from the text view of the
+    shard and interned into the lookup tables of main if main encodes them,
+    so shards and main don't need the same storage.
+    """
+    source = f"shard.{table_name}"
+    view_name = TEXT_VIEWS.get(table_name)
+    if view_name and batch.execute("SELECT 1 FROM shard.sqlite_master WHERE type = 'view' AND name = ?;",
+                                   (view_name,)).fetchone():
+        source = f"shard.{view_name}"
+    source_columns = set(_columns(batch, "shard", source.split(".")[1]))
+    main_columns = _columns(batch, "main", table_name)
+    expressions = dict(expressions)
+    for column_name, lookup_table in ENCODED_COLUMNS.get(table_name, {}).items():
+        if f"{column_name}_id" in main_columns and column_name in source_columns:
+            batch.execute(f"INSERT OR IGNORE INTO main.{lookup_table} (wert) "
+                          f"SELECT DISTINCT {column_name} FROM {source} WHERE {column_name} IS NOT NULL;")
+            expressions[f"{column_name}_id"] = f"(SELECT id FROM main.{lookup_table} WHERE wert = {column_name})"
+            source_columns.add(f"{column_name}_id")
+    columns = [column for column in main_columns
+               if column in source_columns and (keep_ids or column != "id")]
+    selected = [expressions.get(column, column) for column in columns]
+    return batch.execute(
+        f"""
+        INSERT INTO main.{table_name} ({", ".join(columns)})
+        SELECT {", ".join(selected)} FROM {source} ORDER BY id;
+        """).rowcount
+
+def merge_shard(db, filename):
+    """Add all words of one shard database to db in one transaction.
+
+    Words whose url is already in db are replaced by the shard entry,
+    the failed_urls of the shard are added to those of db.
+    wort.id and bedeutungen.id of the shard are shifted past the largest ids
+    in db and the foreign keys of the dependent tables are shifted with them,
+    so every table is copied with a single INSERT ... SELECT.
+
+    Returns:
+        dict -- number of words added, of words that replaced an older entry and of failed urls
+    """
+    db.execute("ATTACH DATABASE ? AS shard;", (filename,))
+    try:
+        with db.batch() as batch:
+            # ON DELETE CASCADE removes the meanings and links of the replaced words
+            replaced = batch.execute(
+                "DELETE FROM main.wort WHERE url IN (SELECT url FROM shard.wort WHERE url IS NOT NULL);").rowcount
+            word_offset = batch.execute("SELECT coalesce(max(id), 0) FROM main.wort;").fetchone()[0]
+            meaning_offset = batch.execute("SELECT coalesce(max(id), 0) FROM main.bedeutungen;").fetchone()[0]
+
+            words = _copy(batch, "wort", {"id": f"id + {word_offset}"}, keep_ids=True)
+            _copy(batch, "bedeutungen", {"id": f"id + {meaning_offset}",
+                                         "wort_id": f"wort_id + {word_offset}"}, keep_ids=True)
+            for table_name, column_name in WORD_TABLES.items():
+                _copy(batch, table_name, {column_name: f"{column_name} + {word_offset}"}, keep_ids=False)
+            for table_name, column_name in MEANING_TABLES.items():
+                _copy(batch, table_name, {column_name: f"{column_name} + {meaning_offset}"}, keep_ids=False)
+
+            # the failures of the shard stay visible, with the newer entry for a url in both
+            failed = 0
+            if batch.execute("SELECT 1 FROM shard.sqlite_master WHERE type = 'table' AND name = 'failed_urls';"
+                             ).fetchone():
+                failed = batch.execute(
+                    """
+                    INSERT INTO main.failed_urls (url, attempts, state, error, updated_at)
+                    SELECT url, attempts, state, error, updated_at FROM shard.failed_urls WHERE true
+                    ON CONFLICT (url) DO UPDATE SET attempts = excluded.attempts, state = excluded.state,
+                    error = excluded.error, updated_at = excluded.updated_at;
+                    """).rowcount
+    finally:
+        db.execute("DETACH DATABASE shard;")
+    return {"words": words, "replaced": replaced, "failed": failed}
+
+def merge_shards(database_filename, filenames):
+    """Merge the shard databases one after another into database_filename
+    (created if needed); with duplicate urls the later shard wins.
+    wort_verbindungen is rebuilt from the merged links at the end.
+
+    Returns:
+        dict -- words added, words replaced, failed urls and seconds
+    """
+    start = perf_counter()
+    # the main database is no scratch file, it keeps the default (synchronous) profile
+    db = DatabaseManager(database_filename)
+    create_tables(db)
+    # creates failed_urls
+    CrawlJournal(db)
+    words, replaced, failed = 0, 0, 0
+    for filename in filenames:
+        if not os.path.exists(filename):
+            raise Exception(f"There is no shard {filename}")
+        result = merge_shard(db, filename)
+        words += result["words"]
+        replaced += result["replaced"]
+        failed += result["failed"]
+        logger.info(f"{filename}: {result['words']} words merged, {result['replaced']} replaced, "
+                    f"{result['failed']} failed urls")
+    resolve_links(db)
+    db.connection.close()
+    return {"words": words, "replaced": replaced, "failed": failed, "seconds": round(perf_counter() - start, 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl Duden in shards with one process and database each, "
+                                                 "and merge the shards")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl_parser = subparsers.add_parser("crawl", help="crawl one shard per start url")
+    crawl_parser.add_argument("--database", default="Duden", help="the shards are DATABASE.shard0, ...")
+    crawl_parser.add_argument("--base-url", default="https://www.duden.de")
+    crawl_parser.add_argument("--last", default=LAST_WORD, help="url of the last word")
+    crawl_parser.add_argument("--start", action="append", default=[],
+                              help="start url of a shard, can be given several times")
+    crawl_parser.add_argument("--starts-from", default=None,
+                              help="pick the start urls evenly from the words of this database")
+    crawl_parser.add_argument("--shards", type=int, default=4, help="number of shards with --starts-from")
+    crawl_parser.add_argument("--max-rate", type=float, default=None,
+                              help="requests per second of all shards together")
+    crawl_parser.add_argument("--archive", default=None, help="directory of the page archive")
+    crawl_parser.add_argument("--merge", action="store_true", help="merge the shards into DATABASE when done")
+
+    merge_parser = subparsers.add_parser("merge", help="merge shard databases into the main database")
+    merge_parser.add_argument("shards", nargs="+", help="shard database files")
+    merge_parser.add_argument("--database", default="Duden")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.command == "crawl":
+        starts = args.start
+        if args.starts_from:
+            starts = starts + spread_starts(DatabaseManager(args.starts_from), args.shards, args.base_url)
+        starts = list(dict.fromkeys(starts or [FIRST_WORD]))
+        results = crawl_shards(starts, args.database, args.base_url, args.max_rate, args.archive, args.last)
+        for result in results:
+            print(result)
+        if args.merge:
+            print(merge_shards(args.database, [result["filename"] for result in results]))
+    else:
+        print(merge_shards(args.database, args.shards))
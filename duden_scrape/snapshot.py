@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+from time import perf_counter, time, time_ns
+import numpy as np
+from duden_scrape.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# {table: [(column, kind)]} written to the snapshot, read from the text views;
+# kind: "int" (NULL is stored as -1), "category" (codes into a list of values) or "string"
+COLUMNS = {"wort": [("id", "int"), ("name", "string"), ("artikel", "category"), ("wortart", "category"),
+                    ("haeufigkeit", "int"), ("worttrennung", "string")],
+           "bedeutungen": [("id", "int"), ("wort_id", "int"), ("grammatik", "category"), ("bedeutung", "string")]}
+NULL = -1
+
+
+def save_array(directory, name, array):
+    # a new file replaces the old one, processes that mapped the old one keep reading it
+    path = os.path.join(directory, f"{name}.npy")
+    with open(path + ".tmp", "wb") as output:
+        np.save(output, array)
+    os.replace(path + ".tmp", path)
+
+def load_array(directory, name):
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+def save_strings(directory, name, values):
+    encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    save_array(directory, f"{name}.offsets", offsets)
+    save_array(directory, f"{name}.bytes", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+def read_tables(db):
+    """Rows of the COLUMNS of wort and bedeutungen in id order, both read
+    in one transaction, so a crawl writing meanwhile can't add meanings
+    of words that are not in the wort rows.
+
+    Returns:
+        dict -- {table: rows}
+    """
+    tables = {}
+    with db.batch() as batch:
+        if not db.connection.in_transaction:
+            batch.execute("BEGIN;")
+        for table_name, columns in COLUMNS.items():
+            names = [column_name for column_name, _ in columns]
+            tables[table_name] = batch.execute(
+                f"SELECT {', '.join(names)} FROM {table_name}_text ORDER BY id;").fetchall()
+    return tables
+
+def publish(directory, version):
+    """Make the symlink directory point to the directory version in one rename
+    and remove the version it pointed to before. A snapshot that was written
+    into directory itself (before snapshots were versioned) is removed first.
+    """
+    previous = os.path.realpath(directory) if os.path.islink(directory) else None
+    if previous is None and os.path.isdir(directory):
+        if not os.path.exists(os.path.join(directory, "snapshot.json")):
+            raise Exception(f"{directory} is a directory but not a snapshot")
+        shutil.rmtree(directory)
+    link = f"{version}.link"
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, directory)
+    if previous is not None and previous != version:
+        # processes that mapped the old arrays keep reading them
+        shutil.rmtree(previous, ignore_errors=True)
+
+def write_snapshot(db, directory):
+    """Write the COLUMNS of wort and bedeutungen as .npy files, in id order.
+    bedeutungen gets the column wort_row: the position of its word in the
+    wort arrays. snapshot.json describes the columns.
+
+    The files go to a new directory next to directory, which is then
+    published as the symlink directory, so Snapshot.load sees either the old
+    or the new snapshot, never a mix of both.
+
+    Returns:
+        Snapshot -- the written snapshot, memory-mapped
+    """
+    directory = os.path.abspath(directory)
+    tables = read_tables(db)
+    version = f"{directory}.{time_ns()}"
+    os.makedirs(version)
+    try:
+        meta = {"created": time(), "tables": {}}
+        for table_name, columns in COLUMNS.items():
+            rows = tables[table_name]
+            meta["tables"][table_name] = {"rows": len(rows), "columns": dict(columns)}
+            for position, (column_name, kind) in enumerate(columns):
+                name = f"{table_name}.{column_name}"
+                values = [row[position] for row in rows]
+                if kind == "int":
+                    save_array(version, name, np.array([NULL if value is None else value for value in values],
+                                                       dtype=np.int64))
+                elif kind == "category":
+                    codes = {}
+                    for value in values:
+                        if value is not None and value not in codes:
+                            codes[value] = len(codes)
+                    save_array(version, f"{name}.codes", np.array([codes.get(value, NULL) for value in values],
+                                                                  dtype=np.int32))
+                    save_strings(version, f"{name}.values", list(codes))
+                else:
+                    save_strings(version, name, values)
+        wort_ids, meaning_wort_ids = load_array(version, "wort.id"), load_array(version, "bedeutungen.wort_id")
+        positions = np.searchsorted(wort_ids, meaning_wort_ids)
+        if np.any(positions == len(wort_ids)) or not np.array_equal(wort_ids[positions], meaning_wort_ids):
+            raise Exception("bedeutungen refers to words that are not in wort")
+        save_array(version, "bedeutungen.wort_row", positions.astype(np.int32))
+        meta["tables"]["bedeutungen"]["columns"]["wort_row"] = "int"
+
+        with open(os.path.join(version, "snapshot.json"), "w") as output:
+            json.dump(meta, output, indent=2)
+    except BaseException:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+    publish(directory, version)
+    logger.info(f"{meta['tables']['wort']['rows']} words and {meta['tables']['bedeutungen']['rows']} meanings "
+                f"written to {version}")
+    return Snapshot.load(directory)
+
+
+class StringColumn():
+    """Strings as one UTF-8 buffer plus offsets: value i is data[offsets[i]:offsets[i + 1]].
+    NULL is stored as the empty string.
+    """
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return bytes(self.data[self.offsets[position]:self.offsets[position + 1]]).decode("utf-8")
+
+    def decode(self, positions):
+        return [self[position] for position in positions]
+
+    def byte_lengths(self):
+        return np.diff(self.offsets)
+
+    def _per_value(self, mask):
+        """Number of True bytes of mask per value
+        """
+        sums = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        return sums[self.offsets[1:]] - sums[self.offsets[:-1]]
+
+    def lengths(self):
+        """Length in characters: the bytes that don't continue a UTF-8 sequence
+        """
+        return self._per_value((np.asarray(self.data) & 0xC0) != 0x80)
+
+    def count(self, character):
+        """Occurrences of a single byte character per value, e.g. count("|")
+        """
+        return self._per_value(np.asarray(self.data) == ord(character))
+
+    def equals(self, value):
+        """Mask of the values equal to value
+        """
+        encoded = np.frombuffer(value.encode("utf-8"), dtype=np.uint8)
+        mask = self.byte_lengths() == len(encoded)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) and len(encoded):
+            # the bytes of all values of the same length, one row per value
+            starts = np.asarray(self.offsets)[candidates]
+            window = np.asarray(self.data)[starts[:, None] + np.arange(len(encoded))]
+            mask[candidates] = (window == encoded).all(axis=1)
+        return mask
+
+
+class CategoryColumn():
+    """Codes into values, NULL where the value is NULL
+    """
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, position):
+        code = self.codes[position]
+        return self.values[code] if code != NULL else None
+
+    def decode(self, positions):
+        return [self[position] for position in positions]
+
+    def equals(self, value):
+        if value not in self.values:
+            return np.zeros(len(self.codes), dtype=bool)
+        return np.asarray(self.codes) == self.values.index(value)
+
+
+class Table():
+    """Columns of one table in the snapshot, all aligned by row.
+    Int columns are plain arrays, NULL is -1.
+
+        verbs = table["wortart"].equals("Verb")
+        table.count_by("haeufigkeit", verbs)
+    """
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, column_name):
+        return self.columns[column_name]
+
+    def count_by(self, column_name, mask=None):
+        """{value: number of rows} of the rows in mask (default all), most frequent first
+        """
+        column = self.columns[column_name]
+        if isinstance(column, CategoryColumn):
+            codes = np.asarray(column.codes) if mask is None else column.codes[mask]
+            counts = np.bincount(codes + 1, minlength=len(column.values) + 1)
+            result = {None if code == 0 else column.values[code - 1]: int(count)
+                      for code, count in enumerate(counts) if count}
+        else:
+            if isinstance(column, StringColumn):
+                raise Exception(f"{column_name} is a string column, count a derived array instead")
+            values, counts = np.unique(column if mask is None else column[mask], return_counts=True)
+            result = {None if value == NULL else int(value): int(count) for value, count in zip(values, counts)}
+        return dict(sorted(result.items(), key=lambda item: -item[1]))
+
+    def select(self, mask, column_names=None, limit=None):
+        """Decoded rows of mask as dicts (for the few rows a query found)
+        """
+        positions = np.flatnonzero(mask)[:limit]
+        result = [{} for _ in positions]
+        for column_name in column_names or self.columns:
+            column = self.columns[column_name]
+            if isinstance(column, (StringColumn, CategoryColumn)):
+                values = column.decode(positions)
+            else:
+                values = [None if value == NULL else int(value) for value in column[positions]]
+            for row, value in zip(result, values):
+                row[column_name] = value
+        return result
+
+
+class Snapshot():
+    """Memory-mapped snapshot written by write_snapshot.
+
+    Loading maps the files without reading them, and processes that load
+    the same snapshot share the pages through the page cache.
+    """
+    def __init__(self, tables, meta):
+        self.tables = tables
+        self.meta = meta
+
+    @classmethod
+    def load(cls, directory):
+        # resolve the symlink once, all arrays are of the same version
+        directory = os.path.realpath(directory)
+        with open(os.path.join(directory, "snapshot.json")) as meta_file:
+            meta = json.load(meta_file)
+        tables = {}
+        for table_name, table in meta["tables"].items():
+            columns = {}
+            for column_name, kind in table["columns"].items():
+                name = f"{table_name}.{column_name}"
+                if kind == "int":
+                    columns[column_name] = load_array(directory, name)
+                elif kind == "category":
+                    values = StringColumn(load_array(directory, f"{name}.values.offsets"),
+                                          load_array(directory, f"{name}.values.bytes"))
+                    columns[column_name] = CategoryColumn(load_array(directory, f"{name}.codes"),
+                                                          values.decode(range(len(values))))
+                else:
+                    columns[column_name] = StringColumn(load_array(directory, f"{name}.offsets"),
+                                                        load_array(directory, f"{name}.bytes"))
+            tables[table_name] = Table(columns, table["rows"])
+        return cls(tables, meta)
+
+    @property
+    def wort(self):
+        return self.tables["wort"]
+
+    @property
+    def bedeutungen(self):
+        return self.tables["bedeutungen"]
+
+    def meanings_per_word(self, mask=None):
+        """Number of meanings of every word (aligned with wort),
+        only of the meanings in mask if given
+        """
+        rows = self.bedeutungen["wort_row"]
+        return np.bincount(rows if mask is None else rows[mask], minlength=len(self.wort))
+
+    def syllables(self):
+        """Number of syllables of every word from worttrennung ("Haus|ar|rest"), 0 without it
+        """
+        hyphenation = self.wort["worttrennung"]
+        return np.where(hyphenation.byte_lengths() > 0, hyphenation.count("|") + 1, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a memory-mapped snapshot of wort and bedeutungen "
+                                                 "and print some statistics")
+    parser.add_argument("directory", help="directory for the arrays")
+    parser.add_argument("--database", default="Duden")
+    parser.add_argument("--no-write", action="store_true", help="only read an existing snapshot")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    start = perf_counter()
+    if args.no_write:
+        snapshot = Snapshot.load(args.directory)
+    else:
+        snapshot = write_snapshot(DatabaseManager(args.database), args.directory)
+    print(f"snapshot ready after {perf_counter() - start:.3f}s")
+
+    start = perf_counter()
+    meanings = snapshot.meanings_per_word()
+    print(f"words: {len(snapshot.wort)}, meanings: {len(snapshot.bedeutungen)}, "
+          f"meanings per word: {meanings.mean() if len(meanings) else 0:.2f}")
+    print(f"haeufigkeit: {snapshot.wort.count_by('haeufigkeit')}")
+    print(f"wortart: {dict(list(snapshot.wort.count_by('wortart').items())[:10])}")
+    syllables, counts = np.unique(snapshot.syllables(), return_counts=True)
+    print(f"silben: {dict(zip(syllables.tolist(), counts.tolist()))}")
+    print(f"statistics computed in {(perf_counter() - start) * 1000:.1f}ms")
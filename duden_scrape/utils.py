@@ -1,9 +1,21 @@
+import re
+import socket
+import hashlib
 import logging
 import random
 import requests
+from time import perf_counter
+from html import unescape
 from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from bs4 import BeautifulSoup
+import lxml.html
 from requests.packages.urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from .dictionary import create_text_views, normalize
+from .metrics import BYTES, COUNTS, metrics
 from .models import Word
 
 logger = logging.getLogger(__name__)
@@ -24,6 +36,87 @@ HEADERS = [{"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_4), "\
             {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/78.0.3904.108 Safari/537.36"}
             ]
 
+FIRST_WORD = "/rechtschreibung/d_Korrekturzeichen_fuer_tilgen"
+LAST_WORD = "/rechtschreibung/24_Stunden_Rennen"
+
+NEXT_WORD_BLOCK = re.compile(r'>Im Alphabet danach</h3>(.*?)</(?:ul|div|section)>', re.S)
+LINK_HREF = re.compile(r'<a\s[^>]*href="([^"]*)"')
+# the parts of a page that Word reads; the top-most matches are kept
+WORD_SECTIONS = lxml.html.etree.XPath(
+    "//span[contains(concat(' ', normalize-space(@class), ' '), ' breadcrumb__crumb ')]"
+    " | //h1[contains(@class, 'lemma__title')]"
+    " | //span[contains(concat(' ', normalize-space(@class), ' '), ' lemma__determiner ')]"
+    " | //dl"
+    " | //div[@id='bedeutung' or @id='bedeutungen' or @id='synonyme' or @id='antonyme'"
+    " or @id='herkunft' or @id='wussten_sie_schon']"
+    " | //figure[contains(concat(' ', normalize-space(@class), ' '), ' tag-cluster__cluster ')]"
+    " | //h3[contains(concat(' ', normalize-space(@class), ' '), ' hookup__title ')]"
+    "[string(.) = 'Im Alphabet danach']")
+# "sections": parse only WORD_SECTIONS, any other value is passed to BeautifulSoup as tree builder
+PARSER = "sections"
+# parts of a page that change without the entry changing
+VOLATILE_HTML = re.compile(r'<script.*?</script>|<style.*?</style>|<!--.*?-->', re.S | re.I)
+WHITESPACE = re.compile(r'\s+')
+
+class TimedConnection():
+    """Connection that reports the DNS, TCP connect and TLS handshake times.
+    The host is resolved here and the addresses are tried in order, like
+    urllib3 does it, so the resolution can be timed on its own.
+    _new_conn and _dns_host are private to urllib3 (1.26 and 2.x); without
+    _dns_host the connection is timed as a whole.
+    """
+    def _new_conn(self):
+        if not hasattr(self, "_dns_host"):
+            started = perf_counter()
+            sock = super()._new_conn()
+            self._socket_seconds = perf_counter() - started
+            metrics.observe("fetch_connect_seconds", self._socket_seconds)
+            metrics.increment("fetch_connections_total")
+            return sock
+        host = self._dns_host
+        started = perf_counter()
+        try:
+            addresses = [info[4][0] for info in socket.getaddrinfo(host, self.port, type=socket.SOCK_STREAM)]
+        except socket.gaierror:
+            # urllib3 raises the proper NameResolutionError
+            addresses = [host]
+        resolved = perf_counter()
+        metrics.observe("fetch_dns_seconds", resolved - started)
+        try:
+            for position, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except ConnectTimeoutError:
+                    if position == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+        self._socket_seconds = perf_counter() - started
+        metrics.observe("fetch_connect_seconds", perf_counter() - resolved)
+        metrics.increment("fetch_connections_total")
+        return sock
+
+    def connect(self):
+        started = perf_counter()
+        self._socket_seconds = 0
+        super().connect()
+        if isinstance(self, HTTPSConnection):
+            metrics.observe("fetch_tls_seconds", perf_counter() - started - self._socket_seconds)
+
+class TimedHTTPConnection(TimedConnection, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(TimedConnection, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
 class TimeoutHTTPAdapter(HTTPAdapter):
     def __init__(self, *args, **kwargs):
         self.timeout = DEFAULT_TIMEOUT
@@ -32,6 +125,13 @@ class TimeoutHTTPAdapter(HTTPAdapter):
             del kwargs["timeout"]
         super().__init__(*args, **kwargs)
 
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # urllib3 versions without _new_conn keep their own connections, untimed
+        if hasattr(HTTPConnection, "_new_conn"):
+            self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                       "https": TimedHTTPSConnectionPool}
+
     def send(self, request, **kwargs):
         timeout = kwargs.get("timeout")
         if timeout is None:
@@ -50,51 +150,170 @@ retries = Retry(
     backoff_factor=30 # 15, 30, 60, 120, 240
 )
 
-http = requests.Session()
-http.mount("https://", TimeoutHTTPAdapter(max_retries=retries))
-http.mount("http://", TimeoutHTTPAdapter(max_retries=retries))
+def make_session():
+    """Session with the retry and timeout settings above
+    """
+    session = requests.Session()
+    session.mount("https://", TimeoutHTTPAdapter(max_retries=retries))
+    session.mount("http://", TimeoutHTTPAdapter(max_retries=retries))
+    return session
+
+http = make_session()
+
+def fetch(url, headers=None, session=None):
+    """GET url with the retrying session and report time to the headers (TTFB,
+    including connecting if there was no open connection), time for the body,
+    size, status and retries to the metrics
+    """
+    started = perf_counter()
+    try:
+        source = (session or http).get(url, headers=headers)
+    except requests.exceptions.RetryError:
+        metrics.increment("fetch_errors_total", error="retries_exhausted")
+        raise
+    except requests.exceptions.Timeout:
+        metrics.increment("fetch_errors_total", error="timeout")
+        raise
+    except requests.exceptions.ConnectionError:
+        metrics.increment("fetch_errors_total", error="connection")
+        raise
+    seconds = perf_counter() - started
+    headers_seconds = source.elapsed.total_seconds()
+    metrics.observe("fetch_seconds", seconds)
+    metrics.observe("fetch_ttfb_seconds", headers_seconds)
+    metrics.observe("fetch_body_seconds", max(0.0, seconds - headers_seconds))
+    metrics.observe("fetch_bytes", len(source.content), buckets=BYTES)
+    metrics.increment("fetch_bytes_total", len(source.content))
+    metrics.increment("fetch_responses_total", status=source.status_code)
+    retries = getattr(source.raw, "retries", None)
+    metrics.observe("fetch_retries", len(retries.history) if retries else 0, buckets=COUNTS)
+    return source
+
+def content_hash(text):
+    """sha1 of the page without scripts, styles, comments and whitespace differences
+    """
+    normalized = WHITESPACE.sub(" ", VOLATILE_HTML.sub("", text))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def select_sections(text):
+    """Cut the parts of a page that Word reads out of the html with lxml.
+    Navigation, ads and scripts are dropped before BeautifulSoup sees the page.
+    """
+    root = lxml.html.fromstring(text)
+    sections = []
+    kept = set()
+    for element in WORD_SECTIONS(root):
+        if any(ancestor in kept for ancestor in element.iterancestors()):
+            continue
+        kept.add(element)
+        sections.append(lxml.html.tostring(element, encoding="unicode", with_tail=False))
+        if element.tag == "h3" and not (element.tail or "").strip():
+            # Word.get_next_word reads the element right after this title
+            following = element.getnext()
+            if following is not None and following not in kept:
+                kept.add(following)
+                sections.append(lxml.html.tostring(following, encoding="unicode", with_tail=False))
+    return "".join(sections)
+
+def make_soup(text, parser=None):
+    """BeautifulSoup of a Duden page, see PARSER for the parser options
+    """
+    parser = parser or PARSER
+    if parser == "sections":
+        return BeautifulSoup(select_sections(text), 'lxml')
+    return BeautifulSoup(text, parser)
+
+def parse_word(text, url, headers=None, parser=None):
+    """Build a Word instance from the html of a Duden page.
+    The ETag/Last-Modified response headers are kept for later conditional
+    requests, the content hash is left to recrawl.
+    """
+    headers = CaseInsensitiveDict(headers or {})
+    started = perf_counter()
+    soup = make_soup(text, parser)
+    soup_seconds = perf_counter() - started
+    word = Word(soup, url, etag=headers.get("ETag"), last_modified=headers.get("Last-Modified"))
+    word.timings["soup"] = soup_seconds
+    return word
+
+def find_next_words(text, url):
+    """Get the urls of the following words ("Im Alphabet danach") straight from
+    the html, without building the whole tree. Falls back to Word.get_next_word
+    if the block can't be found.
+    """
+    block = NEXT_WORD_BLOCK.search(text)
+    if block is None:
+        next_word = parse_word(text, url).get_next_word()
+        return [next_word] if next_word else []
+    return [unescape(link) for link in LINK_HREF.findall(block.group(1))]
+
+def find_next_word(text, url):
+    """Get the url of the next word straight from the html, see find_next_words
+    """
+    next_words = find_next_words(text, url)
+    return next_words[0] if next_words else None
 
 def load_word(word_url, base_url="https://www.duden.de",
-              headers=random.choice(HEADERS)):
+              headers=random.choice(HEADERS), archive=None, mode="online", session=None):
     """Get new Word instance from Duden Website
 
     Arguments:
         word_url {String} -- word url of the form "/rechtschreibung/{word}"
+        archive {PageArchive} -- optional archive the raw responses are stored in
+        mode {String} -- "online": always fetch (and archive) the page,
+                         "cache-first": use the archived page if there is one,
+                         "offline": only use the archive
+        session {requests.Session} -- session of the calling thread (see make_session),
+                                      default the shared module session
 
     Returns:
         Word -- returns an instance of the Word Class
     """
     url = base_url + word_url
 
+    if archive is not None and mode in ("cache-first", "offline"):
+        page = archive.get(url)
+        if page is not None:
+            if page.status != 200:
+                raise Exception(f"Unexpected response code: {page.status}")
+            return parse_word(page.text, url, page.headers)
+        if mode == "offline":
+            raise KeyError(f"{url} is not in the archive")
+
     # try:
-    source = http.get(url, headers=headers)
+    source = fetch(url, headers, session)
     # except Exception as errc:
     #         print("There seems to be no internet connection right now. Try again later!", errc)
-                        
+    if archive is not None:
+        archive.put(url, source.text, source.status_code, source.headers)
+
     code = source.status_code
-    if code == 200:
-        soup = BeautifulSoup(source.text, 'lxml')
-    else:
+    if code != 200:
+        logger.error(f"Unexpected response code for {url}: {source.status_code}")
         raise Exception(f"Unexpected response code: {source.status_code}")
-        logger.exception(f"Unexpected response code for {url}: {source.status_code}")
 
-    return Word(soup, url)
+    return parse_word(source.text, url, source.headers)
 
 def add_word_db(word_entry, db, url):
+    """Insert the wort row with its synonyms and antonyms.
+    db can be a DatabaseManager or a Batch of an open transaction.
+    """
     synonyme = word_entry.pop("synonyme") or None
     antonyme = word_entry.pop("antonyme") or None
-    db.add("wort", word_entry)
-    wort_id = db.select("id", "wort", {"url": "https://www.duden.de" + url}).fetchone()[0]
-    
+    wort_id = db.add("wort", word_entry)
+    add_synonyms_db(synonyme, antonyme, db, wort_id)
+    return wort_id
+
+def add_synonyms_db(synonyme, antonyme, db, wort_id):
+    """synonyme, antonyme: the ";" separated lists of the word entry
+    """
     if synonyme:
-        for synonym in synonyme.split(";"):
-            db.add("synonyme", {"synonyme": synonym, "wort_id": wort_id})
+        db.add_many("synonyme", [{"synonyme": synonym.strip(), "wort_id": wort_id}
+                                 for synonym in synonyme.split(";")])
 
     if antonyme:
-        for antonym in antonyme.split(";"):
-            db.add("antonyme", {"antonyme": antonym, "wort_id": wort_id})
-
-    return wort_id
+        db.add_many("antonyme", [{"antonyme": antonym.strip(), "wort_id": wort_id}
+                                 for antonym in antonyme.split(";")])
 
 def add_meanings_db(meanings, db, wort_id):
     for bedeutung in meanings["bedeutungen"]:
@@ -102,34 +321,36 @@ def add_meanings_db(meanings, db, wort_id):
         beispiele = bedeutung.pop("beispiele") or []
         wendungen = bedeutung.pop("wendungen_redensarten_sprichwoerter") or []
         gebrauch = bedeutung.pop("gebrauch") or None
-        db.add("bedeutungen", bedeutung)
-        
-        bedeutung_id = db.select("max(id)", "bedeutungen").fetchone()[0]
+        bedeutung_id = db.add("bedeutungen", bedeutung)
+
+        db.add_many("beispiele", [{"beispiel": beispiel, "bedeutungen_id": bedeutung_id}
+                                  for beispiel in beispiele])
 
-        for beispiel in beispiele:
-            db.add("beispiele", {"beispiel": beispiel, "bedeutungen_id": bedeutung_id})
+        db.add_many("wendungen_redensarten_sprichwoerter",
+                    [{"wendung_redensart_sprichwort": wendung, "bedeutungen_id": bedeutung_id}
+                     for wendung in wendungen])
 
-        for wendung in wendungen:
-            db.add("wendungen_redensarten_sprichwoerter", {"wendung_redensart_sprichwort": wendung,
-            "bedeutungen_id": bedeutung_id})
-        
         if gebrauch:
-            for geb in gebrauch.split(";"):
-                db.add("gebrauch", {"gebrauch": geb, "bedeutungen_id": bedeutung_id})
+            db.add_many("gebrauch", [{"gebrauch": geb.strip(), "bedeutungen_id": bedeutung_id}
+                                     for geb in gebrauch.split(";")])
 
 def add_link_entries_db(link_entries, db, wort_id, table_name, column_link_name):
     if link_entries:
-        for link in link_entries:
-            if link:
-                db.add(table_name, {column_link_name: "https://www.duden.de" + link, "wort_id": wort_id})
+        db.add_many(table_name, [{column_link_name: "https://www.duden.de" + link, "wort_id": wort_id}
+                                 for link in link_entries if link])
 
-def create_tables(db):
+def create_tables(db, normalized=False):
+    """Create the tables and indexes that don't exist yet.
+    normalized: store wortart, artikel, grammatik and gebrauch in lookup tables
+    (see dictionary.normalize), an existing database keeps its storage otherwise
+    """
     word_dict = {"id": "INTEGER PRIMARY KEY", "name": "TEXT", "ganzes_wort": "TEXT", "artikel": "TEXT",
                     "wortart": "TEXT", "haeufigkeit": "INTEGER",
                     "worttrennung": "TEXT", "alternative_worttrennung": "TEXT", "herkunft": "TEXT", "verwandte_form": "TEXT", 
                     "alternative_schreibweise": "TEXT", "zeichen": "TEXT", "kurzform": "TEXT",
                     "kurzform_fuer": "TEXT", "fun_fact": "TEXT",
-                    "url": "TEXT"}
+                    "url": "TEXT", "etag": "TEXT", "last_modified": "TEXT", "content_hash": "TEXT",
+                    "geprueft_am": "TEXT"}
 
     synonyms_dict = {"id": "INTEGER PRIMARY KEY", "synonyme": "TEXT", "wort_id": "INTEGER"}
     synonyms_references = {"wort_id": "wort(id)"}
@@ -158,6 +379,10 @@ def create_tables(db):
 
     typical_connections_url_dict = {"id": "INTEGER PRIMARY KEY", "typische_verbindung_url": "TEXT", "wort_id": "INTEGER"}
     typical_connections_url_references = {"wort_id": "wort(id)"}
+
+    # links resolved to words, filled by graph.resolve_links
+    connections_dict = {"id": "INTEGER PRIMARY KEY", "relation": "TEXT", "wort_id": "INTEGER", "ziel_id": "INTEGER"}
+    connections_references = {"wort_id": "wort(id)", "ziel_id": "wort(id)"}
  
 
 
@@ -171,25 +396,103 @@ def create_tables(db):
     db.create_table(table_name="synonyme_links", columns=synonyms_url_dict, references=synonyms_url_references, cascade_delete=True)
     db.create_table(table_name="antonyme_links", columns=antonyms_url_dict, references=antonyms_url_references, cascade_delete=True)
     db.create_table(table_name="typische_verbindungen_links", columns=typical_connections_url_dict, references=typical_connections_url_references, cascade_delete=True)
+    db.create_table(table_name="wort_verbindungen", columns=connections_dict, references=connections_references, cascade_delete=True)
 
-def add_full_word_db(word, url, db):
-    word_entry = word.return_word_entry()
-    wort_id = add_word_db(word_entry, db, url)
+    migrate_tables(db)
+    if normalized:
+        normalize(db)
 
-    meanings = word.return_meaning()
-    add_meanings_db(meanings, db, wort_id)
+def migrate_tables(db):
+    """Add the indexes to new and existing databases. Safe to run repeatedly.
+    Duplicate urls of older crawls are removed (the newest entry is kept)
+    before the UNIQUE index on wort.url is created.
+    """
+    db.add_columns("wort", {"etag": "TEXT", "last_modified": "TEXT", "content_hash": "TEXT", "geprueft_am": "TEXT"})
+
+    db.delete_duplicates("wort", "url")
+    db.create_index("wort", ["url"], unique=True)
+    db.create_index("wort", ["name"])
+
+    foreign_keys = {"synonyme": "wort_id", "antonyme": "wort_id", "bedeutungen": "wort_id",
+                    "beispiele": "bedeutungen_id", "wendungen_redensarten_sprichwoerter": "bedeutungen_id",
+                    "gebrauch": "bedeutungen_id", "synonyme_links": "wort_id", "antonyme_links": "wort_id",
+                    "typische_verbindungen_links": "wort_id"}
+    for table_name, column_name in foreign_keys.items():
+        db.create_index(table_name, [column_name])
+    db.create_index("wort_verbindungen", ["relation", "wort_id"])
+    db.create_index("wort_verbindungen", ["ziel_id"])
+    create_text_views(db)
+
+def extract_record(word):
+    """Run all extractions of a Word once and return the immutable WordRecord.
+    The record holds no reference to the soup, drop the Word afterwards.
+    """
+    record = word.to_record()
+    metrics.observe_timings("parse_seconds", word.timings, "property")
+    return record
+
+def next_word_url(record, url, last_url=LAST_WORD):
+    """Url of the word after record, None after last_url.
+    Any other word without a next word raises, so the crawl counts it as
+    a failure instead of stopping there as if it was finished.
+    """
+    if url == last_url:
+        return None
+    if record.next_word is None:
+        raise Exception(f"{url} has no next word")
+    return record.next_word
+
+def extract_word(word):
+    """Run all extractions of a Word and return the plain entries
+    (word entry, meanings, links) that are written to the database
+    """
+    return extract_record(word).entries()
 
-    link_entries = word.return_links()
-    add_link_entries_db(link_entries["synonyme_links"], db, wort_id, "synonyme_links", "synonym_url")
-    add_link_entries_db(link_entries.pop("antonyme_links"), db, wort_id, "antonyme_links", "antonym_url")
-    add_link_entries_db(link_entries.pop("typische_verbindungen_links"), db, wort_id,
+def add_word_entries_db(word_entry, meanings, link_entries, batch):
+    """Write extracted entries of one word within an open batch.
+    A word that was scraped before (same url) is replaced.
+    """
+    # ON DELETE CASCADE removes meanings, examples and links of the old entry
+    batch.delete("wort", {"url": word_entry["url"]})
+    wort_id = add_word_db(word_entry, batch, word_entry["url"])
+    add_word_details_db(meanings, link_entries, batch, wort_id)
+    return wort_id
+
+def update_word_entries_db(wort_id, word_entry, meanings, link_entries, batch):
+    """Replace the stored word wort_id with new entries within an open batch.
+    The wort row is updated in place, so wort_verbindungen, the search index
+    and other references to wort_id stay valid; the details are written anew.
+    """
+    word_entry = dict(word_entry)
+    synonyme = word_entry.pop("synonyme") or None
+    antonyme = word_entry.pop("antonyme") or None
+    batch.update("wort", word_entry, {"id": wort_id})
+    # ON DELETE CASCADE removes the examples, idioms and usages of the meanings
+    for table_name in ("synonyme", "antonyme", "bedeutungen", "synonyme_links", "antonyme_links",
+                       "typische_verbindungen_links"):
+        batch.delete(table_name, {"wort_id": wort_id})
+    add_synonyms_db(synonyme, antonyme, batch, wort_id)
+    add_word_details_db(meanings, link_entries, batch, wort_id)
+
+def add_word_details_db(meanings, link_entries, batch, wort_id):
+    """Write the meanings and links of the word wort_id within an open batch
+    """
+    add_meanings_db(meanings, batch, wort_id)
+    add_link_entries_db(link_entries["synonyme_links"], batch, wort_id, "synonyme_links", "synonym_url")
+    add_link_entries_db(link_entries.pop("antonyme_links"), batch, wort_id, "antonyme_links", "antonym_url")
+    add_link_entries_db(link_entries.pop("typische_verbindungen_links"), batch, wort_id,
     "typische_verbindungen_links", "typische_verbindung_url")
 
-    return wort_id, word_entry
+def add_full_word_db(word, url, db):
+    """Write the word with all meanings and links in one transaction,
+    so a word is either stored completely or not at all.
+    """
+    word_entry, meanings, link_entries = extract_record(word).entries()
 
-def increase_variance(variance):
-    variance = (variance+1)*2
-    return variance
+    with db.batch() as batch:
+        wort_id = add_word_entries_db(word_entry, meanings, link_entries, batch)
+
+    return wort_id, word_entry
 
 class RangeDict(dict):
     def __getitem__(self, item):
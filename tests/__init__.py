@@ -1 +1 @@
-from duden_scrape.main import load_word
+from duden_scrape.utils import load_word
@@ -0,0 +1,55 @@
+import os
+import pytest
+from duden_scrape.archive import PageArchive
+from tests.helpers import pages
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_archive_round_trip(tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    archive = PageArchive(str(tmp_path / "archive"), compression, segment_size=5000)
+    for url, text in pages.items():
+        archive.put("https://www.duden.de" + url, text, 200, {"ETag": url})
+    archive.put("https://www.duden.de/rechtschreibung/Haus", "neu", 200)
+    archive.put("https://www.duden.de/rechtschreibung/Fehlt", "", 404)
+
+    assert len(os.listdir(tmp_path / "archive")) > 2
+    page = archive.get("https://www.duden.de/rechtschreibung/Heber")
+    assert page.text == pages["/rechtschreibung/Heber"]
+    assert (page.status, page.headers) == (200, {"ETag": "/rechtschreibung/Heber"})
+    assert archive.get("https://www.duden.de/rechtschreibung/Haus").text == "neu"
+    assert archive.get("https://www.duden.de/rechtschreibung/Gibts_nicht") is None
+    assert archive.urls(404) == ["https://www.duden.de/rechtschreibung/Fehlt"]
+
+    urls = archive.urls()
+    archive.rebuild_index()
+    assert archive.urls() == urls
+    assert archive.get("https://www.duden.de/rechtschreibung/Haus").text == "neu"
+    assert len(archive) == len(pages) + 1
+
+def test_archive_damaged_records(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"), "gzip")
+    archive.put("https://www.duden.de/rechtschreibung/Haus", pages["/rechtschreibung/Haus"], 200)
+    archive.put("https://www.duden.de/rechtschreibung/Heber", pages["/rechtschreibung/Heber"], 200)
+    segment = str(tmp_path / "archive" / "segment-00000.dat")
+    size = os.path.getsize(segment)
+
+    # a put that crashed after writing half of its record
+    with open(segment, "ab") as segment_file:
+        segment_file.write(b"\x00\x00\x00\x20\x00")
+    archive.rebuild_index()
+    assert len(archive) == 2
+    assert os.path.getsize(segment) == size
+    archive.put("https://www.duden.de/rechtschreibung/Hausarrest", "neu", 200)
+    archive.rebuild_index()
+    assert archive.get("https://www.duden.de/rechtschreibung/Hausarrest").text == "neu"
+
+    # damaged bytes within the body of Heber
+    offset, length = archive.index.execute(
+        "SELECT offset, length FROM pages WHERE url = ?", ("https://www.duden.de/rechtschreibung/Heber",)).fetchone()
+    with open(segment, "r+b") as segment_file:
+        segment_file.seek(offset + length - 100)
+        segment_file.write(b"\xff" * 50)
+    assert archive.get("https://www.duden.de/rechtschreibung/Heber") is None
+    assert archive.get("https://www.duden.de/rechtschreibung/Haus").text == pages["/rechtschreibung/Haus"]
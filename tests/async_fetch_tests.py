@@ -0,0 +1,65 @@
+import asyncio
+import numpy as np
+from time import perf_counter
+from duden_scrape.archive import PageArchive
+from duden_scrape.async_fetch import AsyncFetcher, TokenBucket, load_words
+from duden_scrape.mockserver import MockDuden
+from duden_scrape.ratecontrol import RateController
+from duden_scrape.utils import load_word
+
+
+def test_token_bucket_paces_requests(monkeypatch):
+    async def acquire_all(bucket, number):
+        started = perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(number)))
+        return perf_counter() - started
+
+    # 2 tokens at once, the other 4 at 20 per second
+    assert 0.18 < asyncio.run(acquire_all(TokenBucket(20, capacity=2), 6)) < 0.5
+    # the jitter of the requests runs side by side
+    monkeypatch.setattr(np.random, "normal", lambda mean, variance: 0.2)
+    assert asyncio.run(acquire_all(TokenBucket(1000, capacity=5, wait_variance=1), 5)) < 0.5
+
+def test_async_fetcher_starts_without_burst():
+    async def acquire_all(bucket, number):
+        started = perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(number)))
+        return perf_counter() - started
+
+    fetcher = AsyncFetcher(concurrency=4, rate=10)
+    try:
+        # the first request at once, the other 3 at 10 per second
+        assert asyncio.run(acquire_all(fetcher.limiter, 4)) >= 0.28
+    finally:
+        fetcher.close()
+
+def test_async_fetcher_loads_words_concurrently(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"), "gzip")
+    with MockDuden(chain_length=8, latency=0.2, missing=[f"/rechtschreibung/Wort_{3:06d}"]) as server:
+        urls = [server.chain_url(position) for position in range(8)]
+        started = perf_counter()
+        words = load_words(urls, concurrency=4, rate=100, base_url=server.base_url, archive=archive)
+        seconds = perf_counter() - started
+    # 2 rounds of 4 requests instead of 8 requests one after another
+    assert seconds < 1.2
+    assert [url for url, _ in words] == urls
+    assert [word.url for url, word in words if url != urls[3]] == [server.base_url + url for url in urls
+                                                                      if url != urls[3]]
+    assert "404" in str(words[3][1])
+    assert len(archive) == 8
+
+def test_async_fetcher_in_several_event_loops():
+    async def load(fetcher, urls):
+        return await asyncio.gather(*(fetcher.load_word(url) for url in urls))
+
+    with MockDuden(chain_length=6, latency=0.05) as server:
+        urls = [server.chain_url(position) for position in range(6)]
+        fetcher = AsyncFetcher(concurrency=2, rate=100, base_url=server.base_url,
+                               rate_controller=RateController(rate=100, ceilings=None))
+        try:
+            for _ in range(2):
+                assert [word.name for word in asyncio.run(load(fetcher, urls))] == \
+                    [load_word(url, base_url=server.base_url).name for url in urls]
+        finally:
+            fetcher.close()
+        assert fetcher.rate_controller.requests == 12
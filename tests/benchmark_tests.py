@@ -0,0 +1,7 @@
+from duden_scrape.benchmark import compare
+
+
+def test_compare_flags_regressions():
+    baseline = {"meta": {}, "parse": {"Haus": {"lxml": 1.0}}, "crawl": {"pages_per_second": 100.0}}
+    results = {"meta": {}, "parse": {"Haus": {"lxml": 1.1}}, "crawl": {"pages_per_second": 50.0}}
+    assert compare(results, baseline, tolerance=0.25) == [("crawl.pages_per_second", 100.0, 50.0)]
@@ -0,0 +1,10 @@
+import pytest
+from duden_scrape.database import DatabaseManager
+from duden_scrape.utils import create_tables
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "Duden"))
+    create_tables(db)
+    return db
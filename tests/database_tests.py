@@ -0,0 +1,71 @@
+import sqlite3
+import pytest
+from duden_scrape.database import DatabaseManager
+from duden_scrape.metrics import metrics
+from duden_scrape.utils import add_meanings_db, add_word_db, create_tables
+from tests.helpers import word_entry
+
+
+def test_add_returns_lastrowid(db):
+    first = db.add("wort", {"name": "Haus"})
+    second = db.add("wort", {"name": "Hausarrest"})
+    assert second == first + 1
+
+def test_batch_writes_whole_word(db):
+    meanings = {"bedeutungen": [{"Bedeutung": "Familie", "grammatik": None, "gebrauch": "gehoben",
+                                 "beispiele": ["das ganze Haus"], "wendungen_redensarten_sprichwoerter": None}]}
+    with db.batch() as batch:
+        wort_id = add_word_db(word_entry(), batch, "/rechtschreibung/Haus")
+        add_meanings_db(meanings, batch, wort_id)
+
+    assert db.select("count(*)", "synonyme", {"wort_id": wort_id}).fetchone()[0] == 2
+    bedeutung_id = db.select("id", "bedeutungen", {"wort_id": wort_id}).fetchone()[0]
+    assert db.select("beispiel", "beispiele", {"bedeutungen_id": bedeutung_id}).fetchone()[0] == "das ganze Haus"
+
+def test_batch_rolls_back_partial_word(db):
+    with pytest.raises(sqlite3.OperationalError):
+        with db.batch() as batch:
+            batch.add("wort", {"name": "Haus"})
+            batch.add("bedeutungen", {"unknown_column": "x"})
+    assert db.is_empty("wort")
+
+def test_statements_within_batch_roll_back_with_it(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.batch() as batch:
+            batch.add("wort", {"name": "Haus", "url": "https://www.duden.de/rechtschreibung/Haus"})
+            db.execute("UPDATE wort SET name = 'Bau';")
+            db.add("wort", {"name": "Hausarrest"})
+            batch.add("wort", {"name": "Haus", "url": "https://www.duden.de/rechtschreibung/Haus"})
+    assert db.is_empty("wort")
+
+def test_only_crawlers_switch_to_wal(tmp_path):
+    filename = str(tmp_path / "Duden")
+    db = DatabaseManager(filename)
+    assert db.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    crawler = DatabaseManager(filename, profile="crawl")
+    assert crawler.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_migration_is_idempotent(db):
+    db.add("wort", {"name": "Haus", "url": "https://www.duden.de/rechtschreibung/Haus"})
+    create_tables(db)
+    with pytest.raises(sqlite3.IntegrityError):
+        db.add("wort", {"name": "Haus", "url": "https://www.duden.de/rechtschreibung/Haus"})
+
+def test_batch_delete_cascades(db):
+    with db.batch() as batch:
+        add_word_db(word_entry(), batch, "/rechtschreibung/Haus")
+    with db.batch() as batch:
+        batch.delete("wort", {"url": "https://www.duden.de/rechtschreibung/Haus"})
+        add_word_db(word_entry(), batch, "/rechtschreibung/Haus")
+    assert db.select("count(*)", "wort").fetchone()[0] == 1
+    assert db.select("count(*)", "synonyme").fetchone()[0] == 2
+
+def test_batch_reports_write_metrics(db):
+    metrics.reset()
+    with db.batch() as batch:
+        add_word_db(word_entry(), batch, "/rechtschreibung/Haus")
+
+    summary = metrics.summary()["histograms"]
+    assert {entry["table"]: entry["count"] for entry in summary["db_write_seconds"]} == {"wort": 1, "synonyme": 1}
+    assert summary["db_commit_seconds"][0]["count"] == 1
+    assert 'duden_db_write_seconds_count{table="wort"} 1' in metrics.prometheus()
@@ -0,0 +1,45 @@
+import sqlite3
+import pytest
+from duden_scrape.database import DatabaseManager
+from duden_scrape.dictionary import is_normalized, normalize
+from duden_scrape.lookup import WordLookup
+from duden_scrape.utils import add_word_db, create_tables
+from tests.helpers import add_haus, word_entry
+
+
+def test_normalized_storage_reads_like_plain(db, tmp_path):
+    normalized = DatabaseManager(str(tmp_path / "Normalized"))
+    create_tables(normalized, normalized=True)
+    add_haus(db)
+    add_haus(normalized)
+    add_haus(normalized, "https://www.duden.de/rechtschreibung/Haus_Familie")
+
+    assert is_normalized(normalized) and not is_normalized(db)
+    assert "wortart" not in [row[1] for row in normalized.execute("PRAGMA table_info(wort)")]
+    assert normalized.select("count(*)", "wortart_werte").fetchone()[0] == 1
+    assert normalized.select("wert", "gebrauch_werte", order_by="id").fetchall() == [("gehoben",), ("veraltet",)]
+    assert WordLookup(normalized).lookup("Haus")[0] == WordLookup(db).lookup("Haus")[0]
+    assert normalized.execute("SELECT wortart, count(*) FROM wort_text GROUP BY wortart").fetchall() == \
+        [("Substantiv, Neutrum", 2)]
+
+def test_normalize_converts_existing_database(db):
+    add_haus(db)
+    before = WordLookup(db).lookup("Haus")
+    normalize(db)
+    add_haus(db, "https://www.duden.de/rechtschreibung/Haus_Familie", artikel="die")
+
+    assert is_normalized(db)
+    assert WordLookup(db).lookup("Haus")[0] == before[0]
+    assert db.select("wert", "artikel_werte", order_by="id").fetchall() == [("das",), ("die",)]
+    normalize(db)
+    assert db.execute("PRAGMA foreign_key_check").fetchall() == []
+
+def test_rollback_forgets_interned_values(db):
+    normalize(db)
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.batch() as batch:
+            add_word_db(dict(word_entry(), wortart="Verb"), batch, word_entry()["url"])
+            add_word_db(word_entry(), batch, word_entry()["url"])
+    add_haus(db, wortart="Adjektiv")
+    add_haus(db, "https://www.duden.de/rechtschreibung/Haus_Familie", wortart="Verb")
+    assert db.execute("SELECT wortart FROM wort_text ORDER BY id").fetchall() == [("Adjektiv",), ("Verb",)]
@@ -0,0 +1,42 @@
+import json
+import pytest
+from duden_scrape.database import DatabaseManager
+from duden_scrape.export import export_jsonl, export_parquet, iter_records
+from duden_scrape.utils import add_full_word_db, create_tables
+from tests.helpers import word_fussball, word_haus, word_hausarrest, word_haute, word_heber
+
+
+def export_db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "Duden"))
+    create_tables(db)
+    for word in [word_haus, word_heber, word_hausarrest, word_haute, word_fussball]:
+        add_full_word_db(word, word.url, db)
+    return db
+
+def test_export_in_chunks_and_since(tmp_path):
+    db = export_db(tmp_path)
+    records = list(iter_records(db, chunk_size=1000))
+    assert list(iter_records(db, chunk_size=2)) == records
+    assert [record["name"] for record in records] == ["Haus", "Heber", "Hausarrest", "Haute Couture", "Fußball"]
+    haus, heber = records[0], records[1]
+    assert [meaning["bedeutung"] for meaning in heber["bedeutungen"]] == \
+        [meaning["Bedeutung"] for meaning in word_heber.meaning]
+    assert len(haus["synonyme"]) == 3 and len(haus["typische_verbindungen_links"]) == 2
+    assert haus["bedeutungen"][2] == {"bedeutung": "Familie", "grammatik": "ohne Plural",
+                                      "beispiele": haus["bedeutungen"][2]["beispiele"],
+                                      "wendungen_redensarten_sprichwoerter": [], "gebrauch": []}
+    assert len(haus["bedeutungen"][2]["beispiele"]) == 1
+
+    # resume after the second word
+    assert export_jsonl(db, str(tmp_path / "words.jsonl"), since=heber["id"], chunk_size=2) == 3
+    with open(tmp_path / "words.jsonl", encoding="utf-8") as exported:
+        assert [json.loads(line) for line in exported] == records[2:]
+
+def test_export_parquet_row_groups(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    db = export_db(tmp_path)
+    assert export_parquet(db, str(tmp_path / "words.parquet"), row_group_size=2, chunk_size=3) == 5
+    parquet_file = pq.ParquetFile(str(tmp_path / "words.parquet"))
+    assert [parquet_file.metadata.row_group(group).num_rows for group in range(parquet_file.num_row_groups)] == \
+        [2, 2, 1]
+    assert parquet_file.read().to_pylist() == list(iter_records(db))
@@ -0,0 +1,12 @@
+from duden_scrape.fixtures import download_pages, fixture_pages
+from duden_scrape.mockserver import MockDuden
+
+
+def test_download_pages_under_their_url_path(tmp_path):
+    with MockDuden() as server:
+        urls = list(server.pages)[:2]
+        assert download_pages(urls, str(tmp_path), server.base_url, delay=0) == urls
+        assert fixture_pages(str(tmp_path)) == {url: server.pages[url] for url in urls}
+        # pages that are saved already are not requested again
+        assert download_pages(urls, str(tmp_path), server.base_url, delay=0) == []
+        assert server.stats()["requests"] == 2
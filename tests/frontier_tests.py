@@ -0,0 +1,37 @@
+from duden_scrape.database import DatabaseManager
+from duden_scrape.frontier import Frontier, crawl
+from duden_scrape.mockserver import MockDuden
+from duden_scrape.ratecontrol import RateController
+from duden_scrape.utils import create_tables
+
+
+def test_frontier_starts_cursors_away_from_each_other(tmp_path):
+    db = DatabaseManager(str(tmp_path / "Duden"))
+    frontier = Frontier(db, max_attempts=2)
+    urls = [f"/rechtschreibung/Wort_{position}" for position in range(10)]
+    frontier.seed(urls)
+    assert frontier.spread_seeds(2) == [urls[0], urls[5]]
+
+    assert frontier.claim(urls[0], 0) and not frontier.claim(urls[0], 1)
+    assert frontier.next_pending() == urls[5]
+    assert frontier.claim(urls[5], 1)
+    assert frontier.next_pending() == urls[3]
+
+    frontier.mark_failed(urls[5])
+    assert frontier.claim(urls[5], 1)
+    frontier.mark_failed(urls[5])
+    assert not frontier.claim(urls[5], 1)
+    assert frontier.counts() == {"pending": 8, "in-flight": 1, "failed": 1}
+
+def test_frontier_cursors_cover_the_chain(tmp_path):
+    database = str(tmp_path / "Duden")
+    create_tables(DatabaseManager(database))
+    with MockDuden(chain_length=8, missing=[f"/rechtschreibung/Wort_{6:06d}"]) as server:
+        rate_controller = RateController(rate=1000, ceilings=None)
+        crawl([server.chain_url(0), server.chain_url(4)], database, server.base_url, rate_controller)
+    db = DatabaseManager(database)
+    # both cursors report to the one controller
+    assert rate_controller.requests == 6
+    # Wort_000007 is only linked from the missing page
+    assert Frontier(db).counts() == {"done": 6, "failed": 1}
+    assert db.execute("SELECT count(DISTINCT url), count(*) FROM wort").fetchone() == (6, 6)
@@ -0,0 +1,24 @@
+from duden_scrape.graph import build_graph, resolve_links
+from duden_scrape.utils import add_word_db
+from tests.helpers import word_entry
+
+
+def test_links_resolve_to_graph(db, tmp_path):
+    base = "https://www.duden.de/rechtschreibung/"
+    ids = {}
+    with db.batch() as batch:
+        for name, synonyms in (("Haus", ["Gebaeude", "Bau"]), ("Gebaeude", ["Bau"]), ("Bau", []), ("Huette", [])):
+            ids[name] = add_word_db(dict(word_entry(base + name), name=name), batch, base + name)
+            batch.add_many("synonyme_links", [{"synonym_url": base + synonym, "wort_id": ids[name]}
+                                              for synonym in synonyms + ["Gebaeudeteil"]])
+
+    assert resolve_links(db)["synonym"] == (3, 4)
+    graph = build_graph(db, str(tmp_path / "graph"), "synonym")
+    assert graph.neighbors(ids["Haus"]).tolist() == sorted([ids["Gebaeude"], ids["Bau"]])
+    assert graph.shortest_path(ids["Gebaeude"], ids["Bau"]) == [ids["Gebaeude"], ids["Bau"]]
+    assert graph.shortest_path(ids["Bau"], ids["Haus"]) is None
+    assert graph.bfs(ids["Haus"]) == {ids["Haus"]: 0, ids["Gebaeude"]: 1, ids["Bau"]: 1}
+    assert len(set(graph.components().tolist())) == 2
+
+    db.delete("wort", {"id": ids["Bau"]})
+    assert db.select("count(*)", "wort_verbindungen").fetchone()[0] == 1
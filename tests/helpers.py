@@ -0,0 +1,31 @@
+from duden_scrape.fixtures import fixture_pages
+from duden_scrape.utils import add_meanings_db, add_word_db, parse_word
+
+pages = fixture_pages()
+
+
+def load_fixture(name, parser=None):
+    url = "/rechtschreibung/" + name
+    return parse_word(pages[url], "https://www.duden.de" + url, parser=parser)
+
+word_haus = load_fixture("Haus")
+word_heber = load_fixture("Heber")
+word_hausarrest = load_fixture("Hausarrest")
+word_haute = load_fixture("Haute_Couture")
+word_korrekturzeichen = load_fixture("d_Korrekturzeichen_fuer_tilgen")
+word_fussball = load_fixture("Fuszball")
+
+def word_entry(url="https://www.duden.de/rechtschreibung/Haus"):
+    return {"name": "Haus", "ganzes_wort": "Haus, das", "artikel": "das", "wortart": "Substantiv, Neutrum",
+            "haeufigkeit": 4, "worttrennung": "Haus", "alternative_worttrennung": "Haus",
+            "herkunft": None, "verwandte_form": None, "alternative_schreibweise": None, "zeichen": None,
+            "kurzform": None, "kurzform_fuer": None, "synonyme": "Bau; Gebäude", "antonyme": None,
+            "fun_fact": None, "url": url}
+
+def add_haus(db, url="https://www.duden.de/rechtschreibung/Haus", **changes):
+    meanings = {"bedeutungen": [{"Bedeutung": "Familie", "grammatik": "ohne Plural", "gebrauch": "gehoben; veraltet",
+                                 "beispiele": ["das ganze Haus"], "wendungen_redensarten_sprichwoerter": None}]}
+    with db.batch() as batch:
+        wort_id = add_word_db(dict(word_entry(url), **changes), batch, url)
+        add_meanings_db(meanings, batch, wort_id)
+    return wort_id
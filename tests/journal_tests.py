@@ -0,0 +1,29 @@
+from duden_scrape.journal import CrawlJournal
+from duden_scrape.utils import add_word_entries_db
+from tests.helpers import word_haus
+
+
+def test_journal_resumes_and_retries(db):
+    journal = CrawlJournal(db, max_attempts=2)
+    record = word_haus.to_record()
+    with db.batch() as batch:
+        add_word_entries_db(*record.entries(), batch)
+        journal.advance(batch, record.next_word)
+    assert CrawlJournal(db).next_url() == "/rechtschreibung/Hausarrest"
+
+    assert journal.record_failure("/rechtschreibung/Heber", "timeout")
+    assert journal.record_failure("/rechtschreibung/Bau", "timeout")
+    assert not journal.record_failure("/rechtschreibung/Bau", "timeout")
+    assert journal.record_failure("/rechtschreibung/Haus", "timeout")
+    assert journal.retry_urls() == ["/rechtschreibung/Heber", "/rechtschreibung/Haus"]
+
+    def load_record(url):
+        if url == "/rechtschreibung/Heber":
+            raise Exception("still failing")
+        return record
+    assert journal.retry_failed(load_record) == {"scraped": 1, "dead": 1}
+    assert journal.retry_urls() == []
+    assert db.select("url, attempts, state", "failed_urls", order_by="url").fetchall() == \
+        [("/rechtschreibung/Bau", 2, "dead"), ("/rechtschreibung/Heber", 2, "dead")]
+    assert db.select("count(*)", "wort").fetchone()[0] == 1
+    assert journal.next_url() == "/rechtschreibung/Hausarrest"
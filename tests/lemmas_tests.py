@@ -0,0 +1,29 @@
+from duden_scrape.lemmas import LemmaIndex, build_index, edit_distance, fold
+from duden_scrape.utils import add_word_db
+from tests.helpers import word_entry
+
+
+def test_lemma_index_folds_and_finds_near_words(db, tmp_path):
+    base = "https://www.duden.de/rechtschreibung/"
+    ids = {}
+    with db.batch() as batch:
+        for name, haeufigkeit in (("Haus", 4), ("Hausarrest", 2), ("Haute Couture", None), ("Heber", 1),
+                                  ("Fußball", 4), ("fußballerisch", 1), ("Bank", 3), ("Bank_Sitz", None)):
+            url = base + name
+            ids[name] = add_word_db(dict(word_entry(url), name=name.split("_")[0], haeufigkeit=haeufigkeit),
+                                    batch, url)
+    build_index(db, str(tmp_path / "lemmas"))
+    index = LemmaIndex.load(str(tmp_path / "lemmas"))
+
+    assert fold("Fußball") == "fussball" and edit_distance("Hasu", "Haus") == 1
+    assert len(index) == 8
+    assert sorted(index.lookup("bank")) == [("Bank", ids["Bank"]), ("Bank", ids["Bank_Sitz"])]
+    assert index.lookup("FUSSBALL") == [("Fußball", ids["Fußball"])]
+    assert index.lookup("fussball", fold_umlauts=False) == []
+    assert index.lookup("fußball", fold_case=False) == []
+    assert [name for name, _ in index.complete("hau")] == ["Haus", "Hausarrest", "Haute Couture"]
+    assert [name for name, _ in index.complete("fuss", limit=1)] == ["Fußball"]
+    assert index.fuzzy("Hasu") == [("Haus", ids["Haus"], 1)]
+    assert index.fuzzy("Heberr") == [("Heber", ids["Heber"], 1)]
+    assert index.fuzzy("Fusball", fold_umlauts=False) == [("Fußball", ids["Fußball"], 1)]
+    assert index.fuzzy("Hus", max_distance=2)[0] == ("Haus", ids["Haus"], 1)
@@ -0,0 +1,23 @@
+from duden_scrape.lookup import WordLookup
+from duden_scrape.utils import add_meanings_db, add_word_db
+from tests.helpers import word_entry
+
+
+def test_lookup_assembles_and_caches_word(db):
+    meanings = {"bedeutungen": [{"Bedeutung": "Familie", "grammatik": None, "gebrauch": "gehoben",
+                                 "beispiele": ["das ganze Haus", "ein offenes Haus"],
+                                 "wendungen_redensarten_sprichwoerter": None}]}
+    with db.batch() as batch:
+        wort_id = add_word_db(word_entry(), batch, "/rechtschreibung/Haus")
+        add_meanings_db(meanings, batch, wort_id)
+    word_lookup = WordLookup(db, cache_size=2)
+
+    word, = word_lookup.lookup("Haus")
+    assert word["synonyme"] == ["Bau", "Gebäude"]
+    assert word["bedeutungen"][0]["beispiele"] == ["das ganze Haus", "ein offenes Haus"]
+    assert word["bedeutungen"][0]["gebrauch"] == ["gehoben"]
+    assert word_lookup.lookup_url(word_entry()["url"]) == word
+    assert word_lookup.lookup("Haus")[0] is word
+    assert word_lookup.lookup("Hau") == ()
+    stats = word_lookup.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 3, 2)
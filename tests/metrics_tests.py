@@ -0,0 +1,10 @@
+from duden_scrape.metrics import Histogram
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == 1.75
+    assert histogram.quantile(1) == 10
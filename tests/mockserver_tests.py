@@ -0,0 +1,26 @@
+import requests
+from duden_scrape.mockserver import MockDuden
+from duden_scrape.utils import load_word
+
+
+def test_mock_server_chain():
+    with MockDuden(chain_length=3) as server:
+        url, urls = server.first_url, []
+        while url:
+            urls.append(url)
+            url = load_word(url, base_url=server.base_url).get_next_word()
+        assert urls == [server.chain_url(0), server.chain_url(1), server.last_url]
+        assert load_word("/rechtschreibung/Haus", base_url=server.base_url).name == "Haus"
+
+def test_mock_server_faults():
+    with MockDuden(throttle_rate=0.5, reset_rate=0.5, seed=1) as server:
+        outcomes = []
+        for _ in range(6):
+            try:
+                response = requests.get(server.base_url + "/rechtschreibung/Haus")
+                outcomes.append((response.status_code, response.headers["Retry-After"]))
+            except requests.exceptions.ConnectionError:
+                outcomes.append("reset")
+        stats = server.stats()
+    assert set(outcomes) == {(429, "1"), "reset"}
+    assert stats["requests"] == 6 and stats["throttled"] + stats["reset"] == 6
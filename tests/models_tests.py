@@ -0,0 +1,69 @@
+import pickle
+import pytest
+from duden_scrape.database import DatabaseManager
+from duden_scrape.utils import add_word_entries_db, create_tables, next_word_url, parse_word
+from tests.helpers import (load_fixture, pages, word_fussball, word_haus, word_hausarrest, word_heber,
+                           word_korrekturzeichen)
+
+
+def test_meaning_haus():
+    assert word_haus.meaning[0]["wendungen_redensarten_sprichwoerter"] == ["Haus und Hof"]
+
+def test_meaning_heber():
+    assert len(word_heber.meaning) == 4
+    assert word_heber.meaning[1]["beispiele"] == ["das Auto mit dem Heber anheben", "ein hydraulischer Heber"]
+    assert word_heber.meaning[3]["gebrauch"] == "Sport, Jargon"
+
+def test_meaning_single():
+    assert word_hausarrest.meaning == [{"Bedeutung": "Strafe, bei der dem Bestraften verboten ist, das Haus zu verlassen",
+                                        "beispiele": ["jemanden unter Hausarrest stellen", "er steht unter Hausarrest"],
+                                        "wendungen_redensarten_sprichwoerter": None, "gebrauch": None,
+                                        "grammatik": None}]
+
+def test_special_characters():
+    assert word_fussball.name == "Fußball"
+    assert word_fussball.hyphenation == "Fuß|ball"
+    assert word_fussball.typical_connections == "spielen; Größenwahn"
+    assert word_fussball.meaning[0]["beispiele"][1] == "„König Fußball“ regiert die Straße"
+
+def test_links():
+    assert word_haus.synonym_links == ["/rechtschreibung/Bau", "/rechtschreibung/Gebaeude"]
+    assert word_hausarrest.antonym_links == ["/rechtschreibung/Freiheit"]
+
+def test_sign():
+    # the part of speech tuple of this page reads "Wortart: Zeichen"
+    assert word_korrekturzeichen.part_of_speech == "Zeichen"
+    assert word_korrekturzeichen.sign == "₰"
+
+@pytest.mark.parametrize("url", list(pages))
+def test_record_entries(url):
+    name = url.rsplit("/", 1)[1]
+    word = load_fixture(name)
+    expected = word.return_word_entry(), word.return_meaning(), word.return_links()
+    record = load_fixture(name).to_record()
+    assert record.entries() == expected
+    assert record.next_word == word.get_next_word()
+    assert pickle.loads(pickle.dumps(record)) == record
+
+def test_record_is_immutable():
+    record = word_hausarrest.to_record()
+    with pytest.raises(AttributeError):
+        record.name = "Haus"
+    with pytest.raises(AttributeError):
+        record.extra = 1
+    assert record.meanings[0].examples == ("jemanden unter Hausarrest stellen", "er steht unter Hausarrest")
+    entries = record.entries()
+    entries[0]["name"] = "Haus"
+    assert record.entries()[0]["name"] == "Hausarrest"
+
+def test_record_without_next_word(tmp_path):
+    # a page without "Im Alphabet danach" is still a word, only the crawl loop fails on it
+    record = parse_word(pages["/rechtschreibung/Haus"].replace("Im Alphabet danach", "Im Alphabet davor"),
+                        "https://www.duden.de/rechtschreibung/Haus").to_record()
+    assert record.next_word is None
+    db = DatabaseManager(str(tmp_path / "Duden"))
+    create_tables(db)
+    add_word_entries_db(*record.entries(), db)
+    assert db.select("name", "wort", {"url": record.url}).fetchone()[0] == "Haus"
+    with pytest.raises(Exception, match="has no next word"):
+        next_word_url(record, "/rechtschreibung/Haus")
@@ -0,0 +1,38 @@
+import sqlite3
+import pytest
+from duden_scrape.database import DatabaseManager
+from duden_scrape.mockserver import MockDuden
+from duden_scrape.pipeline import CrawlPipeline
+from duden_scrape.ratecontrol import RateController
+from duden_scrape.utils import RangeDict
+
+
+def fast_pipeline(database, server, **options):
+    return CrawlPipeline(database, server.base_url, parse_workers=3, commit_every=4, max_retries=2,
+                         rate_controller=RateController(ceilings=RangeDict({range(0, 24): 1000})), **options)
+
+def test_pipeline_writes_in_chain_order(tmp_path):
+    database = str(tmp_path / "Duden")
+    with MockDuden(chain_length=12, latency=0.001, latency_jitter=0.001, seed=2) as server:
+        result = fast_pipeline(database, server).run(server.first_url, server.last_url)
+    assert (result["fetched"], result["written"], result["failed"]) == (12, 12, 0)
+    db = DatabaseManager(database)
+    urls = [url for url, in db.execute("SELECT url FROM wort ORDER BY id")]
+    assert urls == [server.base_url + server.chain_url(position) for position in range(12)]
+
+def test_pipeline_skips_a_failing_url(tmp_path):
+    database = str(tmp_path / "Duden")
+    with MockDuden(chain_length=6, missing=[f"/rechtschreibung/Wort_{2:06d}"]) as server:
+        result = fast_pipeline(database, server).run(server.first_url, server.last_url)
+    assert (result["fetched"], result["written"], result["failed"]) == (5, 5, 1)
+    db = DatabaseManager(database)
+    assert db.select("url", "failed_urls").fetchall() == [(server.chain_url(2),)]
+    assert db.select("count(*)", "wort").fetchone()[0] == 5
+
+def test_pipeline_reports_a_writer_error(tmp_path):
+    # a directory can't be opened as database
+    with MockDuden(chain_length=50) as server:
+        pipeline = fast_pipeline(str(tmp_path), server, queue_size=2)
+        with pytest.raises(sqlite3.OperationalError):
+            pipeline.run(server.first_url, server.last_url)
+    assert pipeline.written == 0 and pipeline.fetched < 50
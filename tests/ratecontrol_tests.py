@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from duden_scrape.ratecontrol import RateController
+from duden_scrape.utils import RangeDict
+
+
+def test_rate_controller_increases_and_decreases():
+    controller = RateController(rate=1, increase=0.1, decrease=0.5, latency_target=2,
+                                ceilings=RangeDict({range(0, 24): 1.25}))
+    controller.record(latency=0.1)
+    controller.record(latency=0.1, status=304)
+    assert controller.rate == pytest.approx(1.2)
+    controller.record(status=404)
+    controller.record(latency=0.1)
+    assert controller.rate == 1.25
+
+    controller.record(status=429)
+    assert controller.rate == pytest.approx(0.625)
+    # failures of requests that were in flight together count once
+    controller.record(timeout=True)
+    assert controller.rate == pytest.approx(0.625)
+    controller._last_decrease -= 10
+    controller.record(latency=3)
+    assert controller.rate == pytest.approx(0.3125)
+    assert controller.stats()["throttled"] == 1 and controller.stats()["timeouts"] == 1
+
+def test_rate_controller_ceilings_and_delay():
+    controller = RateController(ceilings=RangeDict({range(0, 12): 0.5, range(12, 24): 2}))
+    assert (controller.ceiling(3), controller.ceiling(15)) == (0.5, 2)
+    assert controller.rate == controller.ceiling()
+    for _ in range(1000):
+        controller.record(latency=0.1)
+    assert controller.rate == controller.ceiling()
+
+    np.random.seed(0)
+    delays = [controller.delay() for _ in range(20000)]
+    assert min(delays) >= 0
+    assert np.mean(delays) == pytest.approx(1 / controller.rate, rel=0.05)
+    # each of 4 crawlers sharing the controller waits 4 times as long
+    assert np.mean([controller.delay(shares=4) for _ in range(20000)]) == \
+        pytest.approx(4 / controller.rate, rel=0.05)
@@ -0,0 +1,37 @@
+from duden_scrape.database import DatabaseManager
+from duden_scrape.mockserver import MockDuden
+from duden_scrape.ratecontrol import RateController
+from duden_scrape.recrawl import recrawl
+from duden_scrape.utils import RangeDict, add_full_word_db, create_tables, load_word
+
+
+def test_recrawl_refreshes_validators_and_keeps_ids(tmp_path):
+    database = str(tmp_path / "Duden")
+    db = DatabaseManager(database)
+    create_tables(db)
+    fast = RateController(ceilings=RangeDict({range(0, 24): 1000}))
+    with MockDuden() as server:
+        for name in ("Haus", "Heber"):
+            word = load_word("/rechtschreibung/" + name, base_url=server.base_url)
+            add_full_word_db(word, word.url, db)
+        ids = dict(db.execute("SELECT name, id FROM wort").fetchall())
+        meanings = db.select("count(*)", "bedeutungen").fetchone()[0]
+        db.execute("UPDATE wort SET etag = '\"rotated\"' WHERE name = 'Heber'")
+
+        # the crawl stored no content hash, so Heber counts as changed once
+        assert db.execute("SELECT count(*) FROM wort WHERE content_hash IS NULL").fetchone()[0] == 2
+        assert recrawl(database, fast) == {"unchanged": 1, "changed": 1, "failed": 0}
+        assert server.stats()["not_modified"] == 1
+        db.execute("UPDATE wort SET etag = '\"rotated\"' WHERE name = 'Heber'")
+        assert recrawl(database, fast) == {"unchanged": 2, "changed": 0, "failed": 0}
+        assert server.stats()["not_modified"] == 2
+        assert db.execute("SELECT count(*) FROM wort WHERE etag != '\"rotated\"' AND geprueft_am IS NOT NULL"
+                          ).fetchone()[0] == 2
+
+        server.pages["/rechtschreibung/Haus"] = server.pages["/rechtschreibung/Haus"].replace("Familie", "Sippe")
+        assert recrawl(database, fast) == {"unchanged": 1, "changed": 1, "failed": 0}
+        assert server.stats()["not_modified"] == 3
+    assert dict(db.execute("SELECT name, id FROM wort").fetchall()) == ids
+    assert db.select("count(*)", "bedeutungen").fetchone()[0] == meanings
+    assert db.select("count(*)", "bedeutungen", {"wort_id": ids["Haus"], "bedeutung": "Sippe"}).fetchone()[0] == 1
+    assert db.execute("PRAGMA foreign_key_check").fetchall() == []
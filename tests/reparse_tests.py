@@ -0,0 +1,36 @@
+import os
+import pytest
+from duden_scrape.archive import PageArchive
+from duden_scrape.database import DatabaseManager
+from duden_scrape.reparse import rebuild_database
+from duden_scrape.utils import add_full_word_db, create_tables, parse_word
+from tests.helpers import pages, word_haus, word_heber
+
+
+def test_rebuild_database_from_archive(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"), "gzip")
+    for url, text in pages.items():
+        archive.put("https://www.duden.de" + url, text, 200)
+    archive.put("https://www.duden.de/rechtschreibung/Kaputt", "<html><body></body></html>", 200)
+    archive.put("https://www.duden.de/rechtschreibung/Fehlt", "", 404)
+    database_filename = str(tmp_path / "Duden")
+    crawler = DatabaseManager(database_filename, profile="crawl")
+    create_tables(crawler)
+    add_full_word_db(word_haus, word_haus.url, crawler)
+
+    # the crawler's connection is still open, its database stays
+    with pytest.raises(Exception, match="still in use"):
+        rebuild_database(str(tmp_path / "archive"), database_filename, processes=2)
+    assert crawler.select("count(*)", "wort").fetchone()[0] == 1
+    crawler.connection.close()
+
+    stats = rebuild_database(str(tmp_path / "archive"), database_filename, processes=2, commit_every=3)
+    assert (stats["words"], stats["failed"]) == (len(pages), 1)
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("Duden")) == ["Duden"]
+
+    db = DatabaseManager(database_filename)
+    # the words are written in archive order
+    assert [name for name, in db.execute("SELECT name FROM wort ORDER BY id")] == \
+        [parse_word(text, "https://www.duden.de" + url).name for url, text in pages.items()]
+    heber = db.select("id", "wort", {"url": word_heber.url}).fetchone()[0]
+    assert db.select("count(*)", "bedeutungen", {"wort_id": heber}).fetchone()[0] == len(word_heber.meaning)
@@ -1,15 +1,30 @@
-from time import sleep
+import pytest
+from duden_scrape.fixtures import SAVED_DIRECTORY, SAVED_PAGES, saved_pages
+from duden_scrape.mockserver import MockDuden
 from duden_scrape.utils import load_word
 
+# pages downloaded from duden.de, served over HTTP by a local stand-in for the site
+pages = saved_pages()
+missing = [url for url in SAVED_PAGES if url not in pages]
+if missing:
+    pytest.skip(f"{len(missing)} pages are not saved in {SAVED_DIRECTORY}, "
+                "download them with python -m duden_scrape.fixtures", allow_module_level=True)
+server = MockDuden(pages=pages).start()
+
+def teardown_module():
+    server.stop()
+
+def load(url):
+    return load_word(url, base_url=server.base_url)
+
 
 def test_load_word():
     url = "/rechtschreibung/Haus"
-    word_haus = load_word(url)
+    word_haus = load(url)
     assert word_haus is not None
 
 url = "/rechtschreibung/Haus"
-word_haus = load_word(url)
-sleep(0.5)
+word_haus = load(url)
 
 def test_name():
     assert word_haus.name == "Haus"
@@ -36,14 +51,13 @@ def test_fun_fact():
     assert word_haus.fun_fact == "Dieses Wort gehört zum Wortschatz des Goethe-Zertifikats B1."
 
 url = "/rechtschreibung/Heber"
-word_heber = load_word(url)
+word_heber = load(url)
 
 def test_meaning_heber():
     assert word_heber.meaning != []
 
 url = "/rechtschreibung/Hausflur"
-word_hausflur = load_word(url)
-sleep(0.5)
+word_hausflur = load(url)
 
 def test_frequency():
     assert word_hausflur.frequency == 2
@@ -53,8 +67,7 @@ def test_hyphenation():
 
 url = "/rechtschreibung/Hausarrest"
 
-word_hausarrest = load_word(url)
-sleep(1)
+word_hausarrest = load(url)
 
 def test_meaning_hausarrest():
     # assert word_hausarrest.meaning == [{'Bedeutung': 'Strafe, bei der dem Bestraften verboten ist, das Haus zu verlassen',
@@ -64,8 +77,7 @@ def test_meaning_hausarrest():
 
 
 url = "/rechtschreibung/Hausbibliothek"
-word_hausbibliothek = load_word(url)
-sleep(0.5)
+word_hausbibliothek = load(url)
 
 def test_hyphenation_edge():
     assert word_hausbibliothek.hyphenation == "Haus|bi|blio|thek"
@@ -74,54 +86,50 @@ def test_alt_hyphenation():
     assert word_hausbibliothek.alt_hyphenation == "Haus|bi|blio|thek"
 
 url = "/rechtschreibung/Hauserin"
-word_hauserin = load_word(url)
-sleep(1)
+word_hauserin = load(url)
 
 def test_related_form():
     assert word_hauserin.related_form == "Häuserin"
 
 url = "/rechtschreibung/Haussa_Sprache_Afrika"
-word_hussa = load_word(url)
+word_hussa = load(url)
 
 def test_alternative_spelling():
     assert word_hussa.alternative_spelling == "Hausa"
 
 url = "/rechtschreibung/H_Dur"
-word_hdur = load_word(url)
-sleep(1)
+word_hdur = load(url)
 
 def test_sign():
     assert "H" == word_hdur.sign
 
 url = "/rechtschreibung/Haute_Couture"
-word_haute = load_word(url)
-sleep(1)
+word_haute = load(url)
 
 def test_short_form():
     assert word_haute.short_form == "Couture"
 
 url = "/rechtschreibung/Abbau"
-word_abbau = load_word(url)
+word_abbau = load(url)
 
 def test_typical_connections():
     assert word_abbau.typical_connections is not None
 
 
 url = "/rechtschreibung/d_Korrekturzeichen_fuer_tilgen"
-sleep(1)
-word_korrekturzeichen = load_word(url)
+word_korrekturzeichen = load(url)
 
 def test_meaning_empty():
     assert word_korrekturzeichen.meaning[0]["Bedeutung"] == None
 
 url = "/rechtschreibung/Hebewerk"
-word_hebewerk = load_word(url)
+word_hebewerk = load(url)
 
 def test_short_form_vs_short_form_of():
     assert word_hebewerk.short_form == None and word_hebewerk.short_form_of == "Schiffshebewerk"
 
 url = "/rechtschreibung/billig"
-word_billig = load_word(url)
+word_billig = load(url)
 
 def test_antonym():
-    assert word_billig.antonyms == "teuer"
\ No newline at end of file
+    assert word_billig.antonyms == "teuer"
@@ -0,0 +1,18 @@
+from duden_scrape.search import enable_search, search
+from duden_scrape.utils import add_meanings_db, add_word_db
+from tests.helpers import word_entry
+
+
+def test_search_follows_inserts_and_deletes(db):
+    enable_search(db)
+    meanings = {"bedeutungen": [{"Bedeutung": "an einer großen Straße gelegenes Gebäude", "grammatik": None,
+                                 "gebrauch": None, "beispiele": ["ein schönes Haus"],
+                                 "wendungen_redensarten_sprichwoerter": None}]}
+    with db.batch() as batch:
+        wort_id = add_word_db(word_entry(), batch, "/rechtschreibung/Haus")
+        add_meanings_db(meanings, batch, wort_id)
+
+    assert [result["wort_id"] for result in search(db, "STRASSE")] == [wort_id]
+    assert search(db, "schon*")[0]["snippets"] == [("beispiel", "ein [schönes] Haus")]
+    db.delete("wort", {"id": wort_id})
+    assert search(db, "Straße") == []
@@ -0,0 +1,100 @@
+from duden_scrape.database import DatabaseManager
+from duden_scrape.journal import CrawlJournal
+from duden_scrape.mockserver import MockDuden
+from duden_scrape.ratecontrol import MAX_RATE_BY_HOUR
+from duden_scrape.shard import crawl_shard, merge_shards, shard_ceilings, shard_filename
+from duden_scrape.utils import add_full_word_db, create_tables
+from tests.helpers import word_fussball, word_haus, word_hausarrest, word_heber
+
+
+def test_merge_shards_remaps_ids(tmp_path):
+    database = str(tmp_path / "Duden")
+    main = DatabaseManager(database)
+    create_tables(main)
+    add_full_word_db(word_heber, word_heber.url, main)
+    for shard, words in enumerate([[word_haus, word_hausarrest], [word_fussball, word_heber]]):
+        db = DatabaseManager(shard_filename(database, shard))
+        create_tables(db)
+        for word in words:
+            add_full_word_db(word, word.url, db)
+        db.connection.close()
+    main.connection.close()
+
+    result = merge_shards(database, [shard_filename(database, 0), shard_filename(database, 1)])
+    assert (result["words"], result["replaced"]) == (4, 1)
+    db = DatabaseManager(database)
+    assert [name for name, in db.execute("SELECT name FROM wort ORDER BY id")] == \
+        ["Haus", "Hausarrest", "Fußball", "Heber"]
+    assert db.execute("SELECT count(*) FROM bedeutungen b JOIN wort w ON w.id = b.wort_id "
+                      "WHERE w.name = 'Heber'").fetchone()[0] == 4
+    assert db.execute("SELECT b.beispiel FROM beispiele b JOIN bedeutungen m ON m.id = b.bedeutungen_id "
+                      "JOIN wort w ON w.id = m.wort_id WHERE w.name = 'Hausarrest' ORDER BY b.id").fetchall() == \
+        [("jemanden unter Hausarrest stellen",), ("er steht unter Hausarrest",)]
+    assert db.execute("SELECT l.synonym_url FROM synonyme_links l JOIN wort w ON w.id = l.wort_id "
+                      "WHERE w.name = 'Haus' ORDER BY l.id").fetchall() == \
+        [("https://www.duden.de/rechtschreibung/Bau",), ("https://www.duden.de/rechtschreibung/Gebaeude",)]
+    assert db.execute("PRAGMA foreign_key_check").fetchall() == []
+
+def test_crawl_shards_cover_the_chain(tmp_path):
+    database = str(tmp_path / "Duden")
+    with MockDuden(chain_length=6) as server:
+        starts = [server.chain_url(0), server.chain_url(4)]
+        results = [crawl_shard(shard, start, starts, database, server.base_url, max_rate=1000,
+                               last_url=server.last_url)
+                   for shard, start in enumerate(starts)]
+        # a finished shard does not crawl again
+        assert crawl_shard(0, starts[0], starts, database, server.base_url, max_rate=1000,
+                           last_url=server.last_url)["words"] == 0
+    assert [result["words"] for result in results] == [4, 2]
+    merge_shards(database, [result["filename"] for result in results])
+    db = DatabaseManager(database)
+    assert db.execute("SELECT count(DISTINCT url) FROM wort").fetchone()[0] == 6
+
+def test_shards_share_the_rate():
+    assert shard_ceilings(None, 4)[8] == MAX_RATE_BY_HOUR[8] / 4
+    assert shard_ceilings(2.0, 4)[20] == 0.5
+
+def test_missing_next_word_is_a_failure(tmp_path):
+    database = str(tmp_path / "Duden")
+    with MockDuden(chain_length=3) as server:
+        # the chain ends before the last word of the crawl
+        result = crawl_shard(0, server.first_url, (), database, server.base_url, max_rate=1000)
+    assert (result["words"], result["failed"]) == (2, 1)
+    db = DatabaseManager(shard_filename(database, 0))
+    assert CrawlJournal(db).next_url() == server.last_url
+    assert db.select("state", "failed_urls", {"url": server.last_url}).fetchone()[0] == "dead"
+    db.connection.close()
+    assert merge_shards(database, [shard_filename(database, 0)])["failed"] == 1
+    assert DatabaseManager(database).select("url, state", "failed_urls").fetchall() == [(server.last_url, "dead")]
+
+def test_shard_skips_a_missing_page(tmp_path):
+    database = str(tmp_path / "Duden")
+    with MockDuden(chain_length=6, missing=[f"/rechtschreibung/Wort_{2:06d}"]) as server:
+        result = crawl_shard(0, server.first_url, (), database, server.base_url, max_rate=1000,
+                             last_url=server.last_url)
+    assert (result["words"], result["failed"]) == (5, 1)
+    db = DatabaseManager(shard_filename(database, 0))
+    assert db.select("url", "wort", order_by="id").fetchall()[-1] == (server.base_url + server.last_url,)
+    assert db.select("url, state", "failed_urls").fetchall() == [(server.chain_url(2), "dead")]
+
+def test_merge_plain_shard_into_normalized_database(tmp_path):
+    database = str(tmp_path / "Duden")
+    main = DatabaseManager(database)
+    create_tables(main, normalized=True)
+    add_full_word_db(word_haus, word_haus.url, main)
+    shard = DatabaseManager(shard_filename(database, 0))
+    create_tables(shard)
+    for word in [word_heber, word_hausarrest]:
+        add_full_word_db(word, word.url, shard)
+    shard.connection.close()
+    main.connection.close()
+
+    merge_shards(database, [shard_filename(database, 0)])
+    db = DatabaseManager(database)
+    assert db.execute("SELECT name, artikel, wortart FROM wort_text ORDER BY id").fetchall() == \
+        [("Haus", "das", "Substantiv, Neutrum"), ("Heber", "der", "Substantiv, maskulin"),
+         ("Hausarrest", "der", "Substantiv, maskulin")]
+    assert db.execute("SELECT gebrauch FROM gebrauch_text g JOIN bedeutungen b ON b.id = g.bedeutungen_id "
+                      "JOIN wort w ON w.id = b.wort_id WHERE w.name = 'Heber' ORDER BY g.id").fetchall() == \
+        [("Anatomie",), ("Sport, Jargon",)]
+    assert db.select("count(*)", "wortart_werte").fetchone()[0] == 2
@@ -0,0 +1,46 @@
+import os
+import numpy as np
+from duden_scrape.database import DatabaseManager
+from duden_scrape.snapshot import Snapshot, write_snapshot
+from duden_scrape.utils import add_full_word_db, create_tables
+from tests.helpers import word_fussball, word_haus, word_hausarrest, word_haute, word_heber
+
+
+def test_snapshot_columns_and_queries(tmp_path):
+    db = DatabaseManager(str(tmp_path / "Duden"))
+    create_tables(db)
+    for word in [word_haus, word_heber, word_hausarrest, word_haute, word_fussball]:
+        add_full_word_db(word, word.url, db)
+    write_snapshot(db, str(tmp_path / "snapshot"))
+    snapshot = Snapshot.load(str(tmp_path / "snapshot"))
+    wort = snapshot.wort
+
+    assert isinstance(wort["id"], np.memmap)
+    assert wort["name"].decode(range(len(wort))) == ["Haus", "Heber", "Hausarrest", "Haute Couture", "Fußball"]
+    assert wort["name"].lengths().tolist() == [4, 5, 10, 13, 7]
+    assert wort.count_by("haeufigkeit") == {4: 2, 2: 1, 1: 1, None: 1}
+    assert wort.count_by("artikel", wort["wortart"].equals("Substantiv, maskulin")) == {"der": 3}
+    assert snapshot.meanings_per_word().tolist() == [len(word.meaning) for word in
+                                                     [word_haus, word_heber, word_hausarrest, word_haute,
+                                                      word_fussball]]
+    assert snapshot.syllables()[wort["name"].equals("Hausarrest")].tolist() == [3]
+    assert wort.select(wort["name"].equals("Fußball"), ["name", "haeufigkeit"]) == \
+        [{"name": "Fußball", "haeufigkeit": word_fussball.frequency}]
+    assert wort["name"].equals("Haus").tolist() == [True, False, False, False, False]
+    assert not wort["name"].equals("Hau").any()
+
+def test_snapshot_is_replaced_as_a_whole(tmp_path):
+    db = DatabaseManager(str(tmp_path / "Duden"))
+    create_tables(db)
+    add_full_word_db(word_haus, word_haus.url, db)
+    old = write_snapshot(db, str(tmp_path / "snapshot"))
+    add_full_word_db(word_heber, word_heber.url, db)
+    new = write_snapshot(db, str(tmp_path / "snapshot"))
+
+    assert os.path.islink(tmp_path / "snapshot")
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("snapshot")) == \
+        ["snapshot", os.readlink(tmp_path / "snapshot")]
+    # the old arrays stay readable after their directory was removed
+    assert old.wort["name"].decode(range(len(old.wort))) == ["Haus"]
+    assert new.wort["name"].decode(range(len(new.wort))) == ["Haus", "Heber"]
+    assert new.bedeutungen["wort_row"].tolist() == [0] * len(word_haus.meaning) + [1] * len(word_heber.meaning)
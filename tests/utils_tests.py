@@ -0,0 +1,17 @@
+import pytest
+from duden_scrape.utils import find_next_word, parse_word
+from tests.helpers import load_fixture, pages
+
+
+def word_output(word):
+    return word.return_word_entry(), word.return_meaning(), word.return_links(), word.get_next_word()
+
+@pytest.mark.parametrize("url", list(pages))
+def test_parsers_give_the_same_output(url):
+    name = url.rsplit("/", 1)[1]
+    assert word_output(load_fixture(name, "sections")) == word_output(load_fixture(name, "lxml"))
+
+@pytest.mark.parametrize("url", list(pages))
+def test_next_word(url):
+    word = parse_word(pages[url], "https://www.duden.de" + url)
+    assert find_next_word(pages[url], url) == word.get_next_word()